@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# Benchmark summarize_results.py on synthetic scenarios of increasing size.
+# For each size, a scenario is generated with switch_summary/synthetic.py (and kept for later runs),
+# then summarize_results.py is run on it in a fresh python process. The process reports the seconds
+# spent in each stage of the summarizer (see switch_summary/stages.py) and its peak resident memory.
+# With --compressed_inputs, the summarizer is also run on copies of each scenario whose results files
+# are compressed (see switch_summary/compressed.py), to compare with the plain text results.
+#   ./benchmark_summarize.py --sizes small,medium
+#   ./benchmark_summarize.py --sizes large --summarize_args "--engine numpy --streaming"
+#   ./benchmark_summarize.py --sizes medium --compressed_inputs gz,zst
+import os
+import sys
+import time
+import glob
+import shutil
+import argparse
+import subprocess
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, script_dir)
+from switch_summary import synthetic
+from switch_summary import compressed
+
+stage_names = ['input parse', 'dispatch aggregation', 'percentiles', 'ramps', 'output']
+
+
+def run_child(scenario_dir, summarize_args):
+  """Run summarize_results.py in this process from scenario_dir, then print the stage timings and
+  peak memory as tab-delimited stage/value lines. Used in the child process of each benchmark run."""
+  from switch_summary import stages
+  os.chdir(scenario_dir)
+  sys.argv = [os.path.join(script_dir, 'summarize_results.py')] + summarize_args
+  start_time = time.time()
+  execfile(sys.argv[0], {'__name__': '__main__', '__file__': sys.argv[0]})
+  stages.add('total', time.time() - start_time)
+  sys.stdout.write('benchmark\tpeak_rss_mb\t%s\n' % stages.peak_rss_mb())
+  for stage in stages.stage_order:
+    sys.stdout.write('benchmark\t%s\t%s\n' % (stage, stages.stage_seconds[stage]))
+
+
+def compressed_scenario(scenario_dir, compression):
+  """Make a copy of a scenario with compressed results files, unless it was made before.
+  Returns the directory of the copy."""
+  compressed_dir = scenario_dir + '_' + compression
+  if not os.path.isdir(compressed_dir):
+    shutil.copytree(scenario_dir, compressed_dir + '.tmp')
+    for path in glob.glob(os.path.join(compressed_dir + '.tmp', 'results', '*.txt')):
+      compressed.compress_file(path, compression)
+    os.rename(compressed_dir + '.tmp', compressed_dir)
+  return compressed_dir
+
+
+def benchmark(scenario_dir, summarize_args, warm_cache=False):
+  """Run the summarizer on a scenario in a child process. Returns a dict of stage: seconds, plus
+  the peak resident memory of the child in 'peak_rss_mb'."""
+  if not warm_cache:
+    for cache_dir in glob.glob(os.path.join(scenario_dir, 'inputs', '*.cache')):
+      shutil.rmtree(cache_dir)
+  child = subprocess.Popen(
+    [sys.executable, os.path.abspath(__file__), '--child', scenario_dir, '--summarize_args', ' '.join(summarize_args)],
+    stdout=subprocess.PIPE)
+  output = child.communicate()[0]
+  if child.returncode != 0:
+    raise RuntimeError("summarize_results.py failed on " + scenario_dir)
+  results = {}
+  for line in output.splitlines():
+    fields = line.split('\t')
+    if len(fields) == 3 and fields[0] == 'benchmark':
+      results[fields[1]] = None if fields[2] == 'None' else float(fields[2])
+  return results
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Benchmark summarize_results.py on synthetic scenarios.')
+  parser.add_argument('--sizes', default='small,medium',
+    help='Comma separated list of sizes to run, from ' + ', '.join(synthetic.size_order) + '.')
+  parser.add_argument('--bench_dir', default=os.path.join(script_dir, 'benchmark_scenarios'),
+    help='Directory for the synthetic scenarios. Scenarios are generated once and reused.')
+  parser.add_argument('--summarize_args', default='',
+    help='Options to pass to summarize_results.py, e.g. "--engine numpy".')
+  parser.add_argument('--repeat', type=int, default=1, help='Number of runs of each size. The fastest run is reported.')
+  parser.add_argument('--warm_cache', action='store_true',
+    help='Keep the binary caches of the .tab inputs between runs instead of timing a cold parse.')
+  parser.add_argument('--compressed_inputs', default='',
+    help='Comma separated list of compressions (' + ', '.join(compressed.compressions) + ') of the results files to compare with plain text.')
+  parser.add_argument('--output', default=None, help='Also write the results to this tab-delimited file.')
+  parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+  args = parser.parse_args()
+  summarize_args = args.summarize_args.split()
+
+  if args.child is not None:
+    run_child(args.child, summarize_args)
+    sys.exit(0)
+
+  columns = ['size', 'inputs', 'dispatch_records'] + stage_names + ['total', 'peak_rss_mb']
+  input_formats = ['txt'] + [ c for c in args.compressed_inputs.split(',') if c != '' ]
+  rows = []
+  print '\t'.join(columns)
+  for size in args.sizes.split(','):
+    scenario_dir = os.path.join(args.bench_dir, size)
+    records_path = os.path.join(scenario_dir, 'dispatch_records.txt')
+    if not os.path.isfile(records_path):
+      dispatch_records = synthetic.make_scenario(scenario_dir, **synthetic.sizes[size])
+      open(records_path, 'wb').write('%d\n' % dispatch_records)
+    dispatch_records = int(open(records_path).read())
+    for input_format in input_formats:
+      if input_format == 'txt': run_dir = scenario_dir
+      else: run_dir = compressed_scenario(scenario_dir, input_format)
+      runs = [ benchmark(run_dir, summarize_args, args.warm_cache) for i in range(args.repeat) ]
+      best = min(runs, key=lambda r: r['total'])
+      row = [size, input_format, str(dispatch_records)] + [ '%.3f' % best.get(stage, 0) for stage in stage_names + ['total'] ] \
+        + [ '%.1f' % best['peak_rss_mb'] if best['peak_rss_mb'] is not None else 'None' ]
+      rows.append(row)
+      print '\t'.join(row)
+      sys.stdout.flush()
+
+  if args.output is not None:
+    f = open(args.output, 'wb')
+    f.write('\t'.join(columns) + '\n')
+    for row in rows: f.write('\t'.join(row) + '\n')
+    f.close()
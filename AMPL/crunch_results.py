@@ -0,0 +1,26 @@
+#!/usr/bin/env python
+# Compute the rollups of crunch_results.sql from the results files and write them to results/crunch/,
+# so import_results_to_mysql.sh --LocalCrunch can load them instead of running the rollups on the
+# database server. The rollups are computed by switch_summary/crunch.py.
+# Run this from the scenario directory after the results have been exported:
+#   ./crunch_results.py
+import os
+import sys
+import time
+import argparse
+from switch_summary import crunch
+
+parser = argparse.ArgumentParser(description='Compute the rollups of crunch_results.sql from the SWITCH results files.')
+parser.add_argument('--results_dir', default='results',
+  help='Directory of the results files. The rollups are written to its crunch subdirectory.')
+args = parser.parse_args()
+
+# Set the umask to give group read & write permissions to all files & directories made by this script.
+os.umask(0002)
+
+start_time = time.time()
+row_counts = crunch.crunch(args.results_dir)
+if row_counts is None: sys.exit(1)
+for (table, rows) in row_counts:
+  print "%40s: %d rows" % (table, rows)
+print "%.1f seconds to crunch the results into %s." % (time.time() - start_time, os.path.join(args.results_dir, crunch.crunch_dir_name))
@@ -4,6 +4,9 @@
 -- GENERATION AND STORAGE SUMMARIES--------
 select 'Creating generation summaries' as progress;
 -- total generation each hour by carbon cost, technology and load area
+-- The statements between the 'rollups computed by crunch_results.py' markers are skipped by
+-- import_results_to_mysql.sh --LocalCrunch, which loads the same tables from results/crunch instead.
+-- begin rollups computed by crunch_results.py
 -- this table will be used extensively below to create summaries dependent on generator dispatch
 -- note: technology_id and fuel are not quite redundant here as energy stored or released from storage comes in as fuel = 'storage'
 insert into _gen_hourly_summary_tech_la
@@ -224,6 +227,7 @@ insert into gen_cap_summary_fuel
     where scenario_id = @scenario_id
     group by 1, 2, 3, 4
     order by 1, 2, 3, 4;
+-- end rollups computed by crunch_results.py
 
 
 -- TRANSMISSION ----------------
@@ -236,6 +240,7 @@ set	month = convert(left(right(study_hour, 6),2), decimal),
 	where scenario_id = @scenario_id;
 
 
+-- begin rollups computed by crunch_results.py
 -- Transmission summary: net transmission for each zone in each hour
 -- First add imports, then subtract exports
 insert into _trans_summary (scenario_id, carbon_cost, period, area_id, study_date, study_hour, month, hour_of_day_UTC, hours_in_sample, net_power)
@@ -269,6 +274,7 @@ insert into _trans_summary (scenario_id, carbon_cost, period, area_id, study_dat
     group by 1, 2, 3, 4, 5, 6, 7, 8, 9
     order by 1, 2, 3, 4, 5, 6, 7, 8, 9
   on duplicate key update net_power = net_power + VALUES(net_power);
+-- end rollups computed by crunch_results.py
 
 -- Tally transmission losses using a similar method
 insert into _trans_loss (scenario_id, carbon_cost, period, area_id, study_date, study_hour, month, hour_of_day_UTC, hours_in_sample, power)
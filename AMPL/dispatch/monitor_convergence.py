@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# Estimate the dispatch summaries of this scenario from the test sets that are solved so far, with
+# confidence intervals, and write them to convergence_summary.txt. The estimates are made by
+# switch_summary/convergence.py. With --queue_dir, the pending test sets of a schedule_jobs.py queue
+# are reordered so the most informative ones are solved next, and the queue is stopped once every
+# estimate is within tolerance, and convergence_stopped.txt is written so summarize_results.py knows
+# the sweep was stopped. With --follow, this repeats until then or until every test set is solved.
+#   ./monitor_convergence.py --follow --queue_dir tmp/dispatch_all-XXX.queue
+import os
+import sys
+import time
+import argparse
+
+# The switch_summary helper package lives in the scenario directory, one level up
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from switch_summary import convergence
+from switch_summary import dispatch
+from switch_summary import scheduler
+
+parser = argparse.ArgumentParser(description='Estimate the dispatch summaries from the solved test sets and stop the dispatch jobs once the estimates are precise enough.')
+parser.add_argument('--tolerance', type=float, default=0.02,
+  help='Half width of the confidence intervals of emissions & fuel consumption, relative to their targets & projections. Defaults to 0.02.')
+parser.add_argument('--shortfall_tolerance_mw', type=float, default=100,
+  help='Half width of the confidence intervals of the average capacity shortfall of a test set, in MW. Defaults to 100.')
+parser.add_argument('--confidence', type=float, default=0.95,
+  help='Confidence level of the intervals. Defaults to 0.95.')
+parser.add_argument('--min_test_sets', type=int, default=10,
+  help='Number of test sets to solve before stopping. Defaults to 10.')
+parser.add_argument('--strata', type=int, default=4,
+  help='Number of groups of test sets by peak load. Defaults to 4.')
+parser.add_argument('--queue_dir', default=None,
+  help='Queue of the dispatch jobs from schedule_jobs.py to reorder & stop.')
+parser.add_argument('--follow', action='store_true',
+  help='Update the estimates until they converge or every test set is solved.')
+parser.add_argument('--poll_seconds', type=float, default=300,
+  help='Seconds between updates with --follow. Defaults to 300.')
+parser.add_argument('--workers', type=int, default=1,
+  help='Number of worker processes for scanning test sets. Defaults to 1, to leave the cpus to the dispatch jobs.')
+args = parser.parse_args()
+
+# Set the umask to give group read & write permissions to all files & directories made by this script.
+os.umask(0002)
+
+monitor = convergence.Monitor('.', args.tolerance, args.shortfall_tolerance_mw, args.confidence,
+  args.min_test_sets, args.strata, args.workers)
+queue = scheduler.JobQueue(args.queue_dir) if args.queue_dir is not None else None
+while True:
+  status = monitor.update()
+  monitor.write_summary(status)
+  unconverged = [ estimate for estimate in status['estimates'] if not estimate['converged'] ]
+  print "%s: %d of %d test sets solved, %d of %d estimates within tolerance." % (time.strftime('%Y-%m-%d %H:%M:%S'),
+    status['solved_test_sets'], status['test_sets'], len(status['estimates']) - len(unconverged), len(status['estimates']))
+  for estimate in unconverged:
+    print "  %s %s %s: %s +/- %s, tolerance %s" % (estimate['measure'], estimate['carbon_cost'], estimate['period'],
+      estimate['estimate'], estimate['half_width'] if estimate['half_width'] is not None else '?', estimate['tolerance'])
+  if queue is not None:
+    if status['converged'] and status['solved_test_sets'] < status['test_sets']:
+      reason = "Converged after %d of %d test sets at %s." % (status['solved_test_sets'], status['test_sets'], time.ctime())
+      queue.stop(reason)
+      open(dispatch.stopped_name, 'w').write(reason + '\n')
+      print "Stopped the queue in %s. The dispatch summaries of the solved test sets are partial; summarize them with ./summarize_results.py --partial." % args.queue_dir
+    elif not status['converged']:
+      queue.prioritize(convergence.dispatch_job_names('.', status['recommendations']))
+  if not args.follow or status['converged'] or status['solved_test_sets'] == status['test_sets']: break
+  time.sleep(args.poll_seconds)
@@ -12,6 +12,8 @@ OPTIONAL INPUTS
   --single_task_mode | -s    Execute the steps of dispatch as a single task and delete
                              problem files as execution progresses. 
   --multiple_task_mode | -m  Execute the steps of dispatch as a separate tasks
+  --convergence_tolerance X  In single task mode, stop solving test sets once the dispatch
+                             summaries are estimated within X of their targets, e.g. 0.02.
 END_HELP
 }
 
@@ -28,6 +30,8 @@ case $1 in
 		single_task_mode=1; shift 1 ;;
 	-m | --multiple_task_mode)
 		single_task_mode=0; shift 1 ;;
+	--convergence_tolerance)
+		convergence_tolerance=$2; shift 2 ;;
 	*)
     echo "Unknown option $1"; print_help; exit ;;
 esac
@@ -151,6 +155,7 @@ for f in dispatch_compile.qsub dispatch_optimize.qsub dispatch_recompile.qsub di
   echo "NUM_WORKERS=$num_workers" >> $f
   echo 'cd $PBS_O_WORKDIR'          >> $f
   echo "cluster_name=$cluster_name" >> $f
+  if [ -n "$convergence_tolerance" ]; then echo "convergence_tolerance=$convergence_tolerance" >> $f; fi
   # Load modules
   case "$cluster_name" in
     citris) printf 'module load ampl-cplex\nmodule load openmpi\n' >> $f ;;
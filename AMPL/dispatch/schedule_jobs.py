@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# Run the commands of a jobs file, one per line, with workers that claim them longest first from a
+# shared queue instead of the fixed round-robin of execute_jobs.pl. The scheduling is done by
+# switch_summary/scheduler.py, and each run of a job is recorded in logs/job_runtimes.txt.
+#   ./schedule_jobs.py --workers 8 tmp/dispatch_all-XXX
+# Under mpirun, each MPI process is one worker, and the workers share a queue in the directory of
+# the jobs file, which needs to be on disk that all of the nodes share.
+#   mpirun -np 16 ./schedule_jobs.py tmp/dispatch_all-XXX
+import os
+import sys
+import socket
+import argparse
+
+# The switch_summary helper package lives in the scenario directory, one level up
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from switch_summary import scheduler
+
+parser = argparse.ArgumentParser(description='Run the commands of a jobs file with workers that share a queue, longest jobs first.')
+parser.add_argument('jobs_file', help='File with one shell command per line.')
+parser.add_argument('--workers', type=int, default=None,
+  help='Number of worker processes on this node. Defaults to the number of cpus. Under mpirun, each MPI process is one worker instead.')
+parser.add_argument('--queue_dir', default=None,
+  help='Directory of the shared queue. Defaults to the jobs file with a .queue suffix. Reusing a queue resumes its pending jobs and the jobs whose workers died.')
+parser.add_argument('--attempts', type=int, default=2,
+  help='Number of times to try a job that exits with an error. Defaults to 2.')
+parser.add_argument('--worker_exit', default=None,
+  help='Command that each worker runs once the queue is empty, e.g. "ampl_lic return ampl; ampl_lic stop;".')
+args = parser.parse_args()
+
+# Set the umask to give group read & write permissions to all files & directories made by this script.
+os.umask(0002)
+
+queue_dir = args.queue_dir if args.queue_dir is not None else args.jobs_file + '.queue'
+rank = scheduler.mpi_rank()
+if rank is None:
+  failed = scheduler.run_local(args.jobs_file, queue_dir, args.workers, args.attempts, args.worker_exit)
+else:
+  queue = scheduler.JobQueue(queue_dir)
+  queue.create(args.jobs_file, max_attempts=args.attempts)
+  failed = scheduler.run_worker(queue, socket.gethostname() + ':' + rank, args.attempts, args.worker_exit)
+# Jobs that failed on other workers, or that lost their workers on their last attempt
+unfinished = scheduler.JobQueue(queue_dir).unfinished()
+if len(unfinished) > 0:
+  print "Error! %d jobs were not done: %s" % (len(unfinished), ', '.join( '# %d (%s)' % (job['index'], job['status']) for job in unfinished ))
+sys.exit(1 if failed > 0 or len(unfinished) > 0 else 0)
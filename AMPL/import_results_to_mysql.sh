@@ -16,6 +16,8 @@ INPUTS
   -P/--port [port number]
   -h [DB server]
   --ExportOnly             Only export summaries of the results, don't import or crunch data in the DB
+  --LocalCrunch            Compute the rollups of crunch_results.sql with crunch_results.py and load them,
+                           instead of computing them in the DB
 All arguments are optional.
 END_HELP
 }
@@ -36,6 +38,7 @@ umask 0002
 ###################################################
 # Detect optional command-line arguments
 ExportOnly=0
+LocalCrunch=0
 while [ -n "$1" ]; do
 case $1 in
   -n | --no-tunnel)
@@ -52,6 +55,8 @@ case $1 in
     db_server=$2; shift 2 ;;
   --ExportOnly) 
     ExportOnly=1; shift 1 ;;
+  --LocalCrunch)
+    LocalCrunch=1; shift 1 ;;
   --help)
     print_help; exit 0 ;;
   *)
@@ -256,10 +261,37 @@ if [ $ExportOnly = 0 ]; then
 
 ####################################################
 # Crunch through the data
-  echo 'Crunching the data...'
   data_crunch_path=tmp_data_crunch$$.sql
   echo "set @scenario_id := ${SCENARIO_ID};" >> $data_crunch_path
-  cat crunch_results.sql >> $data_crunch_path
+  if [ $LocalCrunch = 1 ]; then
+    # Compute the rollups from the results files and load them, then skip their statements in crunch_results.sql
+    echo 'Crunching the rollups locally...'
+    ./crunch_results.py --results_dir "$results_dir" || exit 1
+    for file_path in $(pwd)/$results_dir/crunch/*.txt; do
+      table_name=$(basename "$file_path" .txt)
+      echo "    ${file_path}  ->  ${DB_name}.${table_name}"
+      start_time=$(date +%s)
+      file_row_count=$(wc -l "$file_path" | awk '{print ($1-1)}')
+      # The header of each file lists the columns of its table
+      column_list=$(head -n 1 "$file_path" | sed -e 's/\t/, /g')
+      db_row_count=$(
+        mysql $connection_string --column-names=false -e "load data local infile \"$file_path\" \
+          into table ${table_name} ignore 1 lines (${column_list});\
+          select count(*) from ${table_name} where scenario_id=$SCENARIO_ID;"
+      )
+      end_time=$(date +%s)
+      if [ $db_row_count -eq $file_row_count ]; then
+        printf "%20s seconds to import %s rows\n" $(($end_time - $start_time)) $file_row_count
+      else
+        printf " -------------\n -- ERROR! Imported %d rows, but expected %d. (%d seconds.) --\n -------------\n" $db_row_count $file_row_count $(($end_time - $start_time))
+      fi
+    done
+    echo 'Crunching the data...'
+    sed -e '/^-- begin rollups computed by crunch_results.py/,/^-- end rollups computed by crunch_results.py/d' crunch_results.sql >> $data_crunch_path
+  else
+    echo 'Crunching the data...'
+    cat crunch_results.sql >> $data_crunch_path
+  fi
   mysql $connection_string < $data_crunch_path
   rm $data_crunch_path
 else
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# Load the summaries written by summarize_results.py and dispatch/summarize_results.py into the
+# results database over a single connection, in one transaction for the scenario.
+# Run this from the scenario directory after the summaries have been written:
+#   ./import_summaries.py -h 127.0.0.1 -P 3307   # For connecting through an ssh tunnel
+#   ./import_summaries.py --sqlite summaries.db  # Load into a local SQLite database instead
+# Partial dispatch summaries, of only the solved test sets, are refused unless --partial is given.
+import os
+import sys
+import argparse
+import getpass
+from switch_summary import bulk_load
+from switch_summary import compressed
+
+parser = argparse.ArgumentParser(description='Import the summaries of SWITCH results into MySQL.', add_help=False)
+parser.add_argument('--help', action='help', help='Print this message')
+parser.add_argument('-u', dest='user', default=getpass.getuser(), help='DB user name')
+parser.add_argument('-p', dest='password', default=None, help='DB password. You will be asked for it if it is not given.')
+parser.add_argument('-D', dest='DB_name', default='switch_results_wecc_v2_2', help='DB name')
+parser.add_argument('-P', '--port', type=int, default=3306, help='DB port number')
+parser.add_argument('-h', dest='db_server', default='switch-db2.erg.berkeley.edu', help='DB server')
+parser.add_argument('--sqlite', default=None,
+  help='Load the summaries into this SQLite database file instead of MySQL, e.g. for testing.')
+parser.add_argument('--batch_size', type=int, default=bulk_load.batch_size,
+  help='Number of rows to send to the database at a time.')
+parser.add_argument('--results_dir', default='results', help='Directory of the summarize_results.py outputs.')
+parser.add_argument('--dispatch_dir', default='dispatch', help='Directory of the dispatch/summarize_results.py outputs.')
+parser.add_argument('--partial', action='store_true',
+  help='Import dispatch summaries of only some of the test sets, which dispatch/summarize_results.py --partial wrote.')
+args = parser.parse_args()
+
+scenario_id = int(open("scenario_id.txt").read())
+bulk_load.batch_size = args.batch_size
+
+# The summaries may have been written compressed with --compress
+summary_files = [ compressed.find(os.path.join(args.results_dir, name + '.txt'))
+  for name in ['gen_summary', 'gen_hourly_summary', 'trans_summary', 'ramp_summary'] ]
+summary_files += [ compressed.find(os.path.join(args.dispatch_dir, name + '.txt'))
+  for name in ['emissions_summary', 'ng_consumption_summary', 'biomass_consumption_summary', 'cap_shortfall_summary'] ]
+for path in summary_files:
+  if not os.path.isfile(path):
+    print "Skipping " + path + ", which was not found."
+summary_files = filter(os.path.isfile, summary_files)
+
+# The summaries of only the solved test sets have solved_test_sets & test_sets columns
+partial_files = [ path for path in summary_files if 'solved_test_sets' in bulk_load.read_summary(path)[0] ]
+if partial_files and not args.partial:
+  print "Error! %s only summarize some of the test sets. Import them with --partial." % ", ".join(partial_files)
+  sys.exit(1)
+
+if args.sqlite is not None:
+  import sqlite3
+  connection = sqlite3.connect(args.sqlite)
+  placeholder = '?'
+else:
+  import MySQLdb
+  if args.password is None:
+    args.password = getpass.getpass("Password for MySQL %s on %s? " % (args.DB_name, args.db_server))
+  connection = MySQLdb.connect(host=args.db_server, port=args.port, user=args.user, passwd=args.password, db=args.DB_name)
+  placeholder = '%s'
+
+def log(message):
+  print message
+  sys.stdout.flush()
+
+print "Importing summaries of scenario %d..." % scenario_id
+try:
+  timings = bulk_load.import_scenario(connection, placeholder, scenario_id, summary_files, log=log)
+finally:
+  connection.close()
+total_rows = sum( row_count for (table, row_count, seconds) in timings )
+total_seconds = sum( seconds for (table, row_count, seconds) in timings )
+print "Imported %d rows in %.2f seconds (%.0f rows/sec)." % (total_rows, total_seconds, total_rows / max(total_seconds, 1e-6))
@@ -0,0 +1 @@
+# Helper modules for summarize_results.py and dispatch/summarize_results.py.
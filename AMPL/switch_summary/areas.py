@@ -0,0 +1,174 @@
+# Net load & residual load of each load area & balancing area for summarize_results.py
+# net_load_hourly_summary.txt only has the net load of the whole system. To study local flexibility
+# needs, this keeps the load area detail of system_load.tab and of the dispatch files:
+#   net_load = load - intermittent output
+#   residual_load = net_load - net transmission imports, which local dispatchable generation &
+#     storage have to serve
+# Intermittent output is summed by (load_area, tech_group, timepoint) into an encoding.Grid with a row
+# per (load_area, tech_group) that has output, a sparse 3-D array whose columns are the timepoints of
+# switch_summary/calendar_index.py, and net imports are summed by (load_area, timepoint). The sums are
+# added while the dispatch files are aggregated, so they aren't read again: the load area of each
+# project comes from the gen_cap file, and the columnar engine adds its records with bincount.
+# Balancing areas are the sums of their load areas in inputs/load_areas.tab. With numpy, the areas are
+# summed as load area x timepoint matrices.
+#
+# The distribution of each measure in each (period, area) is summarized by weighted percentiles and a
+# duration curve. The duration of a value is the hours per year in which the measure is at least that
+# value, so the hourly records sorted by duration trace the load duration curve. Ties are ordered
+# chronologically, as in switch_summary/percentiles.py.
+from switch_summary import encoding
+from switch_summary import percentiles
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+# The hourly values of each area
+hourly_columns = ['load', 'intermittent_output', 'net_imports', 'net_load', 'residual_load']
+# The values whose distributions are summarized
+measures = ['load', 'net_load', 'residual_load']
+
+
+class AreaNetLoad(object):
+  """The hourly load, intermittent output & net imports of each load area of one carbon cost. area_load
+  is an encoding.Grid of the load of each load area, from Inputs, and balancing_areas gives the
+  balancing area of each load area."""
+
+  def __init__(self, calendar, area_load, balancing_areas, tech_to_group):
+    self.calendar = calendar
+    self.area_load = area_load
+    self.balancing_areas = balancing_areas
+    self.tech_to_group = tech_to_group
+    self.load_area_of_project = {} # Indexed by (project_id, technology)
+    self.intermittent_output = encoding.Grid(len(calendar), ['power']) # Rows are (load_area, tech_group)
+    self.net_imports = encoding.Grid(len(calendar), ['power']) # Rows are load areas
+
+  def add_project(self, project_id, tech, load_area):
+    self.load_area_of_project[(project_id, tech)] = load_area
+
+  def add_output(self, project_id, tech, tech_group, column, power):
+    """Add a dispatch record of an intermittent project. Projects without capacity are skipped."""
+    load_area = self.load_area_of_project.get((project_id, tech))
+    if load_area is None: return
+    intermittent_output = self.intermittent_output
+    intermittent_output.add(intermittent_output.row((load_area, tech_group)), column, 'power', power)
+
+  def add_output_columns(self, project_ids, techs, columns, power):
+    """Add the dispatch records of intermittent projects, given as numpy arrays, as the columnar
+    engine reads them. The sums are added in file order, as add_output() adds them."""
+    from switch_summary import columnar
+    if len(power) == 0: return
+    project_list, project_idx = numpy.unique(project_ids, return_inverse=True)
+    tech_list, tech_idx = numpy.unique(techs, return_inverse=True)
+    keys, key_idx = numpy.unique(project_idx * len(tech_list) + tech_idx, return_inverse=True)
+    project_list, tech_list = project_list.tolist(), tech_list.tolist()
+    # Rows are added before the arrays are viewed. -1 for projects without capacity.
+    rows = []
+    for key in keys.tolist():
+      (project_id, tech) = (project_list[key // len(tech_list)], tech_list[key % len(tech_list)])
+      load_area = self.load_area_of_project.get((project_id, tech))
+      rows.append(-1 if load_area is None else self.intermittent_output.row((load_area, self.tech_to_group[tech])))
+    row_of_record = numpy.array(rows, dtype=numpy.int64)[key_idx]
+    found = row_of_record >= 0
+    cells = row_of_record[found] * self.intermittent_output.num_columns + columns[found]
+    cell_idx, first_record = columnar.first_appearance(cells)
+    sums, counts = columnar.grouped_sum(cell_idx, power[found], len(first_record))
+    columnar.add_to_cells(self.intermittent_output, 'power', cells[first_record], sums)
+
+  def add_flow(self, load_area_from, load_area_receive, column, power_sent, power_received):
+    """Add a transmission dispatch record to the net imports of the two load areas: the power received
+    minus the power sent."""
+    net_imports = self.net_imports
+    net_imports.add(net_imports.row(load_area_from), column, 'power', -power_sent)
+    net_imports.add(net_imports.row(load_area_receive), column, 'power', power_received)
+
+  def area_values(self, periods):
+    """The hourly values of each area, one period at a time. Yields a list of (period, area_type, area,
+    columns, values) for each of these periods, where columns are the calendar columns of the period
+    and values is a dict of the list of values in those columns for each of hourly_columns. Load areas
+    come before balancing areas, and areas are sorted by name."""
+    load_areas = sorted(set(self.area_load.rows.names) |
+      set( load_area for (load_area, tech_group) in self.intermittent_output.rows.names ) |
+      set(self.net_imports.rows.names))
+    balancing_areas = sorted(set( self.balancing_areas[load_area] for load_area in load_areas if load_area in self.balancing_areas ))
+    load_area_sums = [ self._load_area_sums(load_areas, column) for column in ['load', 'intermittent_output', 'net_imports'] ]
+    # A balancing area is the sum of its load areas
+    members = [ [ i for (i, load_area) in enumerate(load_areas) if self.balancing_areas.get(load_area) == balancing_area ]
+      for balancing_area in balancing_areas ]
+    if numpy is not None:
+      balancing_area_sums = [ numpy.array([ sums[m].sum(axis=0) for m in members ]).reshape(len(members), len(self.calendar)).tolist()
+        for sums in load_area_sums ]
+      load_area_sums = [ sums.tolist() for sums in load_area_sums ]
+    else:
+      balancing_area_sums = [ [ [ sum(sums[i][column] for i in m) for column in xrange(len(self.calendar)) ] for m in members ]
+        for sums in load_area_sums ]
+
+    for period in periods:
+      if period not in self.calendar.columns_by_period: continue
+      columns = self.calendar.columns_by_period[period]
+      results = []
+      for (area_type, areas, (load, intermittent_output, net_imports)) in [
+          ('load_area', load_areas, load_area_sums), ('balancing_area', balancing_areas, balancing_area_sums) ]:
+        for (i, area) in enumerate(areas):
+          values = {
+            'load': [ load[i][column] for column in columns ],
+            'intermittent_output': [ intermittent_output[i][column] for column in columns ],
+            'net_imports': [ net_imports[i][column] for column in columns ] }
+          values['net_load'] = [ l - o for (l, o) in zip(values['load'], values['intermittent_output']) ]
+          values['residual_load'] = [ n - m for (n, m) in zip(values['net_load'], values['net_imports']) ]
+          results.append( (period, area_type, area, columns, values) )
+      yield results
+
+  def _load_area_sums(self, load_areas, column):
+    """A row of values per load area for one of load, intermittent_output & net_imports, summing the
+    tech groups of intermittent_output. With numpy, this is a load area x timepoint matrix."""
+    num_columns = len(self.calendar)
+    if column == 'load': (grid, field, area_of_row) = (self.area_load, 'load', self.area_load.rows.names)
+    elif column == 'net_imports': (grid, field, area_of_row) = (self.net_imports, 'power', self.net_imports.rows.names)
+    else:
+      (grid, field) = (self.intermittent_output, 'power')
+      area_of_row = [ load_area for (load_area, tech_group) in grid.rows.names ]
+    index_of_area = dict( (load_area, i) for (i, load_area) in enumerate(load_areas) )
+    if numpy is not None:
+      sums = numpy.zeros((len(load_areas), num_columns))
+      if len(grid.rows) > 0:
+        values = numpy.frombuffer(grid.fields[field], dtype=float).reshape(len(grid.rows), num_columns)
+        numpy.add.at(sums, [ index_of_area[load_area] for load_area in area_of_row ], values)
+      return sums
+    sums = [ [0.0] * num_columns for load_area in load_areas ]
+    values = grid.fields[field]
+    for (row, load_area) in enumerate(area_of_row):
+      area_sums = sums[index_of_area[load_area]]
+      for column in xrange(num_columns):
+        area_sums[column] += values[grid.cell(row, column)]
+    return sums
+
+
+def distributions(area_values, calendar, calculate_percentiles):
+  """Summarize the distribution of each measure in each (period, area) of area_values, as returned by
+  AreaNetLoad.area_values(). Returns (durations, summaries): durations[i][measure] is the list of
+  durations of the hourly values of area_values[i], and summaries[i][measure] is a dict with the
+  weighted 'average' and the value at each percentile."""
+  groups = []
+  for (period, area_type, area, columns, values) in area_values:
+    hours_per_year = [ calendar.hours_per_year[column] for column in columns ]
+    for measure in measures:
+      groups.append( (values[measure], hours_per_year) )
+  # Weighting by hours per year makes the rank of a value the hours per year spent below it
+  ranked = percentiles.weighted_percentiles(groups, calculate_percentiles)
+  durations = []
+  summaries = []
+  for (i, (period, area_type, area, columns, values)) in enumerate(area_values):
+    durations.append({})
+    summaries.append({})
+    for (m, measure) in enumerate(measures):
+      (measure_values, hours_per_year) = groups[i * len(measures) + m]
+      (ranks, cut_points) = ranked[i * len(measures) + m]
+      total_hours = sum(hours_per_year)
+      durations[i][measure] = [ total_hours - rank for rank in ranks ]
+      summary = { 'average': sum( v * h for (v, h) in zip(measure_values, hours_per_year) ) / total_hours if total_hours else 0 }
+      for p in calculate_percentiles:
+        summary[p] = measure_values[cut_points[p]] if cut_points else None
+      summaries[i][measure] = summary
+  return (durations, summaries)
@@ -0,0 +1,147 @@
+# Bulk loading of summary files into MySQL (or a stand-in database such as SQLite)
+# import_results_to_mysql.sh and dispatch/import.sh start a separate mysql process, and so a new
+# connection, for each file they load. This module loads the summaries of a scenario over a single
+# DB-API connection. Rows are inserted with executemany in batches, and everything for a scenario is
+# done in one transaction: the scenario's prior rows are deleted, the files are loaded and the
+# transaction is committed only if every file loaded completely.
+#
+# Each file is loaded into a table named after it with table_prefix in front, e.g. gen_summary.txt
+# goes into summary_gen_summary. Tables are created from the header of the file, and columns that the
+# table lacks (e.g. from a different --percentiles setting) are added. Column names are stripped of
+# quotes with other non-word characters replaced by _, so up_ramp_% becomes up_ramp__. The quotes that
+# summarize_results.py puts around technology names are removed from values like LOAD DATA's
+# ENCLOSED BY '"', and None becomes NULL. Tables are created & altered before the transaction starts
+# because MySQL commits implicitly after those statements. Summary files may be compressed, e.g.
+# gen_hourly_summary.txt.gz also goes into summary_gen_hourly_summary.
+import re
+import csv
+import time
+import itertools
+from switch_summary import compressed
+
+table_prefix = 'summary_'
+
+# Number of rows to send to the database with each executemany
+batch_size = 10000
+
+# Number of rows to look at when picking the type of a new column
+type_sample_size = 100000
+
+
+def column_name(field):
+  return re.sub(r'\W', '_', field.strip('"'))
+
+
+def table_name(path):
+  return table_prefix + re.sub(r'^.*/|\.txt$', '', compressed.base_name(path))
+
+
+def read_summary(path):
+  """Return the column names of a tab-delimited summary file and a generator of its records."""
+  f = compressed.open_file(path)
+  file_dat = csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE)
+  columns = [ column_name(field) for field in file_dat.next() ]
+  def records():
+    for row in file_dat:
+      yield [ None if value == 'None' else value.strip('"') for value in row ]
+    f.close()
+  return columns, records()
+
+
+def column_types(path):
+  """Pick a SQL type for each column of a file from its first type_sample_size records."""
+  columns, records = read_summary(path)
+  types = ['BIGINT'] * len(columns)
+  for row in itertools.islice(records, type_sample_size):
+    for (i, value) in enumerate(row):
+      if value is None or types[i] == 'VARCHAR(255)': continue
+      # Ids with leading zeros such as test_set_id 041 are kept as text
+      if re.match(r'-?0\d', value):
+        types[i] = 'VARCHAR(255)'
+        continue
+      if types[i] == 'BIGINT':
+        try:
+          int(value)
+          continue
+        except ValueError:
+          types[i] = 'DOUBLE'
+      try:
+        float(value)
+      except ValueError:
+        types[i] = 'VARCHAR(255)'
+  return dict(zip(columns, types))
+
+
+def existing_columns(cursor, table):
+  """Column names of a table, or None if it doesn't exist."""
+  try:
+    cursor.execute("select * from `%s` where 1 = 0" % table)
+  except Exception: # Each database module has its own exception classes
+    return None
+  cursor.fetchall()
+  return [ d[0] for d in cursor.description ]
+
+
+def prepare_table(connection, path):
+  """Create the table for a file, or add the columns of the file that the table lacks."""
+  table = table_name(path)
+  columns, records = read_summary(path)
+  cursor = connection.cursor()
+  present = existing_columns(cursor, table)
+  missing = [ c for c in columns if present is None or c not in present ]
+  if len(missing) > 0:
+    types = column_types(path)
+    if present is None:
+      cursor.execute("create table if not exists `%s` (%s)" %
+        (table, ", ".join( "`%s` %s" % (c, types[c]) for c in columns )))
+    else:
+      for c in missing:
+        cursor.execute("alter table `%s` add column `%s` %s" % (table, c, types[c]))
+  connection.commit()
+  cursor.close()
+
+
+def load_file(cursor, path, placeholder):
+  """Insert the records of a file in batches. Returns the number of records."""
+  columns, records = read_summary(path)
+  statement = "insert into `%s` (%s) values (%s)" % (
+    table_name(path), ", ".join( "`%s`" % c for c in columns ), ", ".join([placeholder] * len(columns)) )
+  row_count = 0
+  while True:
+    batch = list(itertools.islice(records, batch_size))
+    if len(batch) == 0: break
+    cursor.executemany(statement, batch)
+    row_count += len(batch)
+  return row_count
+
+
+def import_scenario(connection, placeholder, scenario_id, paths, log=None):
+  """Replace the rows of a scenario in the tables of the given summary files in one transaction.
+  placeholder is the parameter marker of the database module: %s for MySQLdb or ? for sqlite3.
+  Returns a list of (table, rows, seconds) for each file."""
+  for path in paths:
+    prepare_table(connection, path)
+  timings = []
+  cursor = connection.cursor()
+  try:
+    for table in sorted(set( table_name(path) for path in paths )):
+      cursor.execute("delete from `%s` where scenario_id = %s" % (table, placeholder), (scenario_id,))
+    for path in paths:
+      start_time = time.time()
+      row_count = load_file(cursor, path, placeholder)
+      cursor.execute("select count(*) from `%s` where scenario_id = %s" % (table_name(path), placeholder), (scenario_id,))
+      db_row_count = cursor.fetchone()[0]
+      seconds = time.time() - start_time
+      if db_row_count != row_count:
+        raise RuntimeError("Imported %d rows into %s, but expected %d." % (db_row_count, table_name(path), row_count))
+      timings.append( (table_name(path), row_count, seconds) )
+      if log is not None:
+        log("%20s  ->  %s: %d rows in %.2f seconds (%.0f rows/sec)" %
+          (path, table_name(path), row_count, seconds, row_count / max(seconds, 1e-6)))
+    connection.commit()
+  except:
+    connection.rollback()
+    raise
+  finally:
+    cursor.close()
+  return timings
@@ -0,0 +1,112 @@
+# The timepoint calendar of a scenario, from inputs/study_hours.tab
+# Every stage of summarize_results.py looks up the period, weight & neighbours of timepoints. Those used
+# to live in a dict record per timepoint, with a set of timepoints per period built by scanning every
+# timepoint once per period, and prior & next timepoints stored as timepoint ids. Here the timepoints are
+# sorted once and each attribute is a flat array with one value per column, in the column order of the
+# hourly tables in switch_summary/encoding.py. A timepoint is mapped to its column with one dict lookup,
+# prior & next timepoints are column offsets, and the columns of each period & date are kept in order.
+# With numpy, an attribute can be viewed as an array without copying, and masks select the columns of
+# a period or date at once.
+#   calendar = calendar_index.read_calendar('inputs/study_hours.tab')
+#   calendar.weight[calendar.column(2020010100)]
+#   calendar.field('hours_per_year')[calendar.period_mask(2016)].sum()
+import array
+from switch_summary import encoding
+from switch_summary import tab_cache
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+# Hours in an average year, which convert the hours of a period into its number of years
+hours_per_average_year = 8766
+
+# The attributes of each column: integer and double arrays
+integer_fields = ['timepoint', 'period', 'date', 'month_of_year', 'hour_of_day', 'prior', 'next']
+double_fields = ['hours_per_period', 'hours_per_year', 'weight']
+
+
+def read_calendar(path):
+  """The Calendar of the timepoints in a study_hours.tab file"""
+  return Calendar(
+    (int(row['hour']), int(row['period']), int(row['date']), float(row['hours_in_sample']))
+    for row in tab_cache.read_rows(path))
+
+
+class Calendar(object):
+  """The timepoints of a study in chronological order, with one column per timepoint. study_hours gives
+  the (timepoint, period, date, hours_in_sample) of each timepoint. Timepoint ids are YYYYMMDDHH, so
+  sorting them sorts the timepoints by date & hour of day.
+
+  The columns have these arrays of attributes:
+    timepoint, period, date, month_of_year, hour_of_day
+    hours_per_period, hours_per_year: the hours that the timepoint represents in its period & per year
+    weight: the share of the hours of its period, which adds to 1 within each period
+    prior, next: the columns of the prior & next timepoint of the same date. The first timepoint of
+      a date follows the last one, per our treatment in AMPL.
+  Each period also has its hours_in_period and its years_per_period, the hours rounded to whole years."""
+
+  def __init__(self, study_hours):
+    records = {}
+    self.hours_in_period = {}
+    for (timepoint, period, date, hours_in_sample) in study_hours:
+      records[timepoint] = (period, date, hours_in_sample)
+      self.hours_in_period[period] = self.hours_in_period.get(period, 0) + hours_in_sample
+    self.periods = sorted(self.hours_in_period)
+    self.years_per_period = dict( (period, round(self.hours_in_period[period] / hours_per_average_year))
+      for period in self.periods )
+
+    # Timepoints are coded by their sorted order, so the columns are in chronological order
+    self.codes = encoding.Codes(sorted(records))
+    self.timepoint_list = self.codes.names
+    for name in integer_fields: setattr(self, name, array.array('l'))
+    for name in double_fields: setattr(self, name, array.array('d'))
+    self.columns_by_period = dict( (period, array.array('l')) for period in self.periods )
+    self.columns_by_date = {}
+    for (column, timepoint) in enumerate(self.timepoint_list):
+      (period, date, hours_in_sample) = records[timepoint]
+      self.timepoint.append(timepoint)
+      self.period.append(period)
+      self.date.append(date)
+      self.month_of_year.append(int(str(timepoint)[5:6]))
+      self.hour_of_day.append(int(str(timepoint)[8:10]))
+      self.hours_per_period.append(hours_in_sample)
+      self.hours_per_year.append(hours_in_sample / self.years_per_period[period])
+      self.weight.append(hours_in_sample / self.hours_in_period[period])
+      self.columns_by_period[period].append(column)
+      if date not in self.columns_by_date: self.columns_by_date[date] = array.array('l')
+      self.columns_by_date[date].append(column)
+
+    # The prior timepoint is the one before on the same date. The first timepoint of a date wraps
+    # around to the last timepoint of the date.
+    num_columns = len(self.timepoint_list)
+    self.prior.extend(xrange(-1, num_columns - 1))
+    self.next.extend(xrange(num_columns))
+    for column in xrange(num_columns):
+      if column == 0 or self.date[column - 1] != self.date[column]:
+        self.prior[column] = self.columns_by_date[self.date[column]][-1]
+      self.next[self.prior[column]] = column
+
+  def __len__(self):
+    return len(self.timepoint_list)
+
+  def __contains__(self, timepoint):
+    return timepoint in self.codes
+
+  def column(self, timepoint):
+    """The column of a timepoint"""
+    return self.codes[timepoint]
+
+  def field(self, name):
+    """A numpy view of the array of an attribute, without copying it"""
+    values = getattr(self, name)
+    return numpy.frombuffer(values, dtype=numpy.dtype(values.typecode))
+
+  def period_mask(self, period):
+    """A numpy array that is True in the columns of a period"""
+    return self.field('period') == period
+
+  def date_mask(self, date):
+    """A numpy array that is True in the columns of a date"""
+    return self.field('date') == date
@@ -0,0 +1,163 @@
+# Columnar engine for summarizing generator_and_storage_dispatch files with NumPy.
+# The default engine in summarize_results.py walks the dispatch file one row at a time, which is
+# slow for files with tens of millions of rows. This engine loads the columns it needs into typed
+# arrays and computes the same sums as grouped reductions keyed by (period, tech_group).
+#
+# The reductions use numpy.bincount and numpy.add.accumulate, which add values in file order, so
+# the floating point sums (and the summary files) are identical to the row-by-row engine. The hourly
+# sums are added to the cells of the array-backed tables of switch_summary/encoding.py through numpy
+# views of their arrays.
+import numpy
+from switch_summary import encoding
+from switch_summary import tab_reader
+
+cost_var_columns = (
+  'fuel_cost', 'carbon_cost_hourly', 'variable_o_m',
+  'spinning_fuel_cost', 'spinning_carbon_cost_incurred',
+  'deep_cycling_fuel_cost', 'deep_cycling_carbon_cost',
+  'startup_fuel_cost', 'startup_nonfuel_cost', 'startup_carbon_cost'
+)
+emission_columns = ( 'co2_tons', 'spinning_co2_tons', 'deep_cycling_co2_tons', 'startup_co2_tons' )
+
+
+def read_columns(path, columns):
+  """Read the requested columns of a results file into a dict of numpy arrays. columns is a list of
+  (name, type) pairs as for switch_summary/tab_reader.py."""
+  blocks = dict( (c, []) for (c, column_type) in columns )
+  for block in tab_reader.read_blocks(path, columns):
+    for ((c, column_type), values) in zip(columns, block):
+      blocks[c].append(numpy.array(values))
+  return dict(
+    (c, numpy.concatenate(blocks[c]) if len(blocks[c]) > 0 else numpy.array([]))
+    for (c, column_type) in columns )
+
+
+def grouped_sum(group_idx, values, num_groups):
+  """Sum values by group in file order. Returns sums and the number of records in each group."""
+  sums = numpy.bincount(group_idx, weights=values, minlength=num_groups)
+  counts = numpy.bincount(group_idx, minlength=num_groups)
+  return sums, counts
+
+
+def grouped_running_sum(group_idx, values, num_groups):
+  """Running sum of values within each group, reported for each record in file order."""
+  running = numpy.zeros(len(values))
+  order = numpy.argsort(group_idx, kind='mergesort')
+  boundaries = numpy.searchsorted(group_idx[order], numpy.arange(num_groups + 1))
+  for g in range(num_groups):
+    members = order[boundaries[g]:boundaries[g+1]]
+    running[members] = numpy.add.accumulate(values[members])
+  return running
+
+
+def first_appearance(keys):
+  """Encode keys as dense integer codes numbered in order of first appearance.
+  Returns the code of each record and the index of the first record of each code."""
+  unique_keys, first_index, codes = numpy.unique(keys, return_index=True, return_inverse=True)
+  order = numpy.argsort(first_index, kind='mergesort')
+  rank = numpy.empty(len(order), dtype=numpy.int64)
+  rank[order] = numpy.arange(len(order))
+  return rank[codes], first_index[order]
+
+
+def summarize_dispatch(path, tech_to_group, calendar, gen_dat, hourly_output,
+                       system_dat, flexible_tech, flexible_net_power, intermittent_tech=(), area_net_load=None):
+  """Read a generator_and_storage_dispatch file and add its totals to gen_dat, hourly_output,
+  system_dat and flexible_net_power, and the output of intermittent_tech to area_net_load if it is
+  given. These are the data structures of summarize_results.py, and they are updated in place
+  exactly like the row-by-row engine does."""
+  cols = read_columns(path,
+    [('period', int), ('technology', None), ('fuel', None), ('power', float), ('hour', int), ('project_id', None)]
+    + [ (c, float) for c in cost_var_columns + emission_columns ])
+  if len(cols['period']) == 0: return
+
+  # Map each record to its (period, tech_group) and drop records that aren't in gen_dat
+  periods, period_idx = numpy.unique(cols['period'].astype(numpy.int64), return_inverse=True)
+  techs, tech_idx = numpy.unique(cols['technology'], return_inverse=True)
+  groups = sorted(set(tech_to_group[tech] for tech in techs.tolist()))
+  group_of_tech = numpy.array([groups.index(tech_to_group[tech]) for tech in techs.tolist()], dtype=numpy.int64)
+  group_idx = group_of_tech[tech_idx]
+  keys, key_idx = numpy.unique(period_idx * len(groups) + group_idx, return_inverse=True)
+  key_list = [ (int(periods[k // len(groups)]), groups[k % len(groups)]) for k in keys.tolist() ]
+  keep = numpy.array([ key in gen_dat for key in key_list ], dtype=bool)[key_idx]
+  period_idx, group_idx, key_idx = period_idx[keep], group_idx[keep], key_idx[keep]
+  tps, tp_idx = numpy.unique(cols['hour'][keep].astype(numpy.int64), return_inverse=True)
+  tp_list = tps.tolist()
+  column_of_tp = numpy.array([ calendar.column(tp) for tp in tp_list ], dtype=numpy.int64)
+  hours_per_year = calendar.field('hours_per_year')[column_of_tp][tp_idx]
+  power = cols['power'][keep]
+  fuel = cols['fuel'][keep]
+
+  # Per-record values, summed in the same order as the row-by-row engine so rounding matches
+  cost_var = cols[cost_var_columns[0]][keep]
+  for c in cost_var_columns[1:]:
+    cost_var = cost_var + cols[c][keep]
+  emissions = cols[emission_columns[0]][keep]
+  for c in emission_columns[1:]:
+    emissions = emissions + cols[c][keep]
+  emissions = hours_per_year * emissions
+  energy = power * hours_per_year
+  is_storage = fuel == 'Storage'
+
+  # Grouped reductions by (period, tech_group). Sums are only added for groups that had records so
+  # untouched totals keep the integer 0 from gen_dat_template, just like the row-by-row engine.
+  num_keys = len(key_list)
+  reductions = [
+    ('energy_released', numpy.logical_and(is_storage, power > 0), energy),
+    ('energy_stored', numpy.logical_and(is_storage, power < 0), -1 * power * hours_per_year),
+    ('energy_gen', numpy.logical_not(is_storage), energy),
+    ('emissions', None, emissions),
+    ('cost_var', None, hours_per_year * cost_var),
+  ]
+  for (column, mask, values) in reductions:
+    if mask is None:
+      sums, counts = grouped_sum(key_idx, values, num_keys)
+    else:
+      sums, counts = grouped_sum(key_idx[mask], values[mask], num_keys)
+    for k in numpy.flatnonzero(counts).tolist():
+      gen_dat[key_list[k]][column] += float(sums[k])
+
+  # System-wide totals by period. total_emissions accumulates the running emissions of the record's
+  # (period, tech_group) after each record, as summarize_results.py always has.
+  running_emissions = grouped_running_sum(key_idx, emissions, num_keys)
+  for (column, values) in [('energy_produced', energy), ('total_emissions', running_emissions)]:
+    sums, counts = grouped_sum(period_idx, values, len(periods))
+    for p in numpy.flatnonzero(counts).tolist():
+      system_dat[int(periods[p])][column] += float(sums[p])
+
+  # Hourly output by (period, tech_group) & timepoint
+  hourly_idx, first_record = first_appearance(key_idx * len(tp_list) + tp_idx)
+  sums, counts = grouped_sum(hourly_idx, power, len(first_record))
+  row_of_key = numpy.array([ hourly_output.rows[key] for key in key_list ], dtype=numpy.int64)
+  add_to_cells(hourly_output, 'power',
+    row_of_key[key_idx[first_record]] * hourly_output.num_columns + column_of_tp[tp_idx[first_record]], sums)
+
+  # Output of intermittent projects by load area; see switch_summary/areas.py
+  if area_net_load is not None:
+    is_intermittent = numpy.array([ group in intermittent_tech for group in groups ], dtype=bool)[group_idx]
+    area_net_load.add_output_columns(cols['project_id'][keep][is_intermittent], cols['technology'][keep][is_intermittent],
+      column_of_tp[tp_idx[is_intermittent]], power[is_intermittent])
+
+  # Net power of flexible projects, grouped by project_id, technology and timepoint
+  is_flexible = numpy.array([ group in flexible_tech for group in groups ], dtype=bool)[group_idx]
+  if not is_flexible.any(): return
+  project_ids, project_idx = numpy.unique(cols['project_id'][keep][is_flexible], return_inverse=True)
+  project_list = project_ids.tolist()
+  flex_tp_idx, flex_group_idx = tp_idx[is_flexible], group_idx[is_flexible]
+  flexible_idx, first_record = first_appearance(
+    (flex_tp_idx * len(groups) + flex_group_idx) * len(project_list) + project_idx)
+  sums, counts = grouped_sum(flexible_idx, energy[is_flexible], len(first_record))
+  # Rows of the (tech_group, project_id) units, which are added before the arrays are viewed
+  unit_idx, first_unit = first_appearance(flex_group_idx[first_record] * len(project_list) + project_idx[first_record])
+  row_of_unit = numpy.array([ flexible_net_power.row((groups[g], project_list[pid]))
+    for (g, pid) in zip(flex_group_idx[first_record][first_unit].tolist(), project_idx[first_record][first_unit].tolist()) ],
+    dtype=numpy.int64)
+  add_to_cells(flexible_net_power, 'net_power',
+    row_of_unit[unit_idx] * flexible_net_power.num_columns + column_of_tp[flex_tp_idx[first_record]], sums)
+
+
+def add_to_cells(grid, field, cells, values):
+  """Add values to distinct cells of an encoding.Grid and mark them present."""
+  numpy.frombuffer(grid.fields[field], dtype=float)[cells] += values
+  state = numpy.frombuffer(grid.state, dtype=numpy.uint8)
+  state[cells] = numpy.maximum(state[cells], encoding.present)
@@ -0,0 +1,143 @@
+# Transparent compression of results & summary files
+# The generator_and_storage_dispatch and transmission_dispatch results of a scenario run to several GB
+# of text, so results files may be stored compressed with gzip or zstd next to their plain name, e.g.
+# results/gen_cap_0.txt.gz instead of results/gen_cap_0.txt. The summary scripts look up each file by
+# its plain name with find() and read it with open_file(), which decompresses it as a stream.
+#
+# gzip files are read & written with python's gzip module. python has no zstd module, so zstd files
+# are piped through the zstd command line tool, which needs to be on the PATH.
+#   path = compressed.find('results/gen_cap_0.txt')
+#   f = compressed.open_file(path)
+import os
+import gzip
+import subprocess
+
+# File suffix of each compression, in the order find() looks for them
+suffixes = [('gz', '.gz'), ('zst', '.zst')]
+compressions = [ compression for (compression, suffix) in suffixes ]
+
+# gzip level for writing. 6 is the default of the gzip command; 9 is much slower for little gain.
+gzip_level = 6
+
+
+def compression_of(path):
+  """The compression of a file from its suffix, or None for plain text."""
+  for (compression, suffix) in suffixes:
+    if path.endswith(suffix): return compression
+  return None
+
+
+def base_name(path):
+  """The plain name of a possibly compressed file, e.g. gen_cap_0.txt for gen_cap_0.txt.gz"""
+  compression = compression_of(path)
+  if compression is None: return path
+  return path[:-len(dict(suffixes)[compression])]
+
+
+def compressed_path(path, compression):
+  """The name of the file path compressed with compression, which may be None for plain text."""
+  if compression is None: return path
+  return path + dict(suffixes)[compression]
+
+
+def find(path):
+  """Return path if it exists, or else the first compressed version of it that exists. If there are
+  none, path is returned so that callers can report it as missing."""
+  if os.path.isfile(path): return path
+  for (compression, suffix) in suffixes:
+    if os.path.isfile(path + suffix): return path + suffix
+  return path
+
+
+def open_file(path, mode='rb'):
+  """Open a plain or compressed file for reading or writing, from the suffix of path."""
+  compression = compression_of(path)
+  if compression == 'gz':
+    return gzip.open(path, mode, gzip_level)
+  if compression == 'zst':
+    return _ZstdFile(path, mode)
+  return open(path, mode)
+
+
+def open_output(path, compression=None, mode='wb'):
+  """Open the file with the plain name path for writing, compressed with compression. Other
+  versions of path are removed so find() returns the new file."""
+  output_path = compressed_path(path, compression)
+  for other_path in [path] + [ path + suffix for (c, suffix) in suffixes ]:
+    if other_path != output_path and os.path.isfile(other_path): os.remove(other_path)
+  return open_file(output_path, mode)
+
+
+def compress_file(path, compression):
+  """Replace a plain file with a compressed copy. Returns the name of the compressed file."""
+  output = open_output(path + '.tmp', compression)
+  f = open(path, 'rb')
+  while True:
+    chunk = f.read(8 * 1024 * 1024)
+    if not chunk: break
+    output.write(chunk)
+  f.close()
+  output.close()
+  return rename_output(path + '.tmp', path, compression)
+
+
+def rename_output(tmp_path, path, compression=None):
+  """Move a file that was written with open_output(tmp_path, compression) to the plain name path,
+  removing other versions of path. Returns the name of the renamed file."""
+  output_path = compressed_path(path, compression)
+  for other_path in [path] + [ path + suffix for (c, suffix) in suffixes ]:
+    if other_path != output_path and os.path.isfile(other_path): os.remove(other_path)
+  os.rename(compressed_path(tmp_path, compression), output_path)
+  return output_path
+
+
+class _ZstdFile(object):
+  """A zstd file read or written through a zstd process. Errors of the process are raised when the
+  file is closed after it has been read to the end or written."""
+  def __init__(self, path, mode):
+    self.name = path
+    self.reading = 'r' in mode
+    if self.reading and not os.path.isfile(path): raise IOError("No such file: '%s'" % path)
+    try:
+      if self.reading:
+        self.process = subprocess.Popen(['zstd', '-d', '-c', '-q', path], stdout=subprocess.PIPE)
+        self.file = self.process.stdout
+      else:
+        self.process = subprocess.Popen(['zstd', '-q', '-f', '-o', path], stdin=subprocess.PIPE)
+        self.file = self.process.stdin
+    except OSError:
+      raise IOError("The zstd command is needed for %s, but it was not found." % path)
+    self.at_end = False
+
+  def read(self, size=-1):
+    data = self.file.read(size)
+    if not data: self.at_end = True
+    return data
+
+  def readline(self):
+    line = self.file.readline()
+    if not line: self.at_end = True
+    return line
+
+  def __iter__(self):
+    return self
+
+  def next(self):
+    line = self.readline()
+    if not line: raise StopIteration
+    return line
+
+  def write(self, data):
+    self.file.write(data)
+
+  def close(self):
+    if self.file.closed: return
+    if self.reading and not self.at_end:
+      # The rest of the file isn't needed, so zstd would only fail writing to the closed pipe
+      self.process.terminate()
+      self.file.close()
+      self.process.wait()
+      return
+    self.file.close()
+    if self.process.wait() != 0:
+      raise IOError("zstd failed on %s" % self.name)
@@ -0,0 +1,167 @@
+# Utilization & congestion of each transmission path (corridor) for summarize_results.py
+# trans_summary.txt sums all transmission into one row per period, which hides the paths that bind.
+# Here the power sent on each path, a (load_area_from, load_area_receive) pair of transmission_lines.tab,
+# is summed by timepoint into an encoding.Grid with a row per path and a column per timepoint of
+# switch_summary/calendar_index.py, and compared against the capacity of the path in the trans_cap file.
+# AMPL models each line as two directional paths that each have the full rating, so the limit of a
+# path is its whole trans_mw times its transmission_derating_factor. (trans_summary.txt halves the
+# ratings to count each line once.)
+#
+# For each period & path, the utilization of a timepoint is the power sent over the derated limit, and
+# timepoints without records have a utilization of 0. The summary has the weighted percentiles of
+# utilization, the hours per year at the limit (at_limit) & near it (near_limit), and the energy sent
+# in the hours near the limit. Paths are ranked by that congested energy within each period, so rank 1
+# is the path that carried the most energy while it was nearly full.
+#
+# With numpy, the power sent in a period is viewed as a path x timepoint matrix, and every path is
+# summarized at once: utilization is sorted along the timepoints of each row and the percentiles are
+# found from the cumulative weights of each row. Sums add the timepoints in chronological order, so
+# the summaries are the same without numpy.
+from switch_summary import encoding
+from switch_summary import percentiles
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+# Utilization at or above which a path is at its limit, allowing for the rounding of the results files
+at_limit = 0.999
+# Utilization at or above which a path is near its limit
+near_limit = 0.95
+
+# The columns of the summary of each path, before the utilization percentiles
+summary_columns = ['rated_cap_MW', 'derated_cap_MW', 'energy_sent', 'average_utilization',
+  'hours_at_limit', 'hours_near_limit', 'congested_energy', 'congestion_rank']
+
+
+class Corridors(object):
+  """The capacity & hourly power sent of each transmission path of one carbon cost. trans_path_dat has
+  the transmission_lines.tab record of each path, as read by Inputs."""
+
+  def __init__(self, calendar, trans_path_dat):
+    self.calendar = calendar
+    self.trans_path_dat = trans_path_dat
+    self.capacity = {} # MW, indexed by (period, load_area_from, load_area_receive)
+    self.power_sent = encoding.Grid(len(calendar), ['power']) # Rows are (load_area_from, load_area_receive)
+
+  def add_capacity(self, period, start, end, trans_mw):
+    """Add a record of the trans_cap file. Existing & new capacity of a path are separate records."""
+    self.capacity[(period, start, end)] = self.capacity.get((period, start, end), 0) + trans_mw
+
+  def add_flow(self, load_area_from, load_area_receive, column, power_sent):
+    """Add a transmission dispatch record"""
+    power_sent_grid = self.power_sent
+    power_sent_grid.add(power_sent_grid.row((load_area_from, load_area_receive)), column, 'power', power_sent)
+
+  def summarize(self, period, calculate_percentiles):
+    """The summary of each path in a period, sorted by path. Returns a list of (path, record), where
+    record has the summary_columns and the utilization at each of calculate_percentiles. Utilization
+    is None for paths without capacity."""
+    if period not in self.calendar.columns_by_period: return []
+    columns = self.calendar.columns_by_period[period]
+    paths = set( (start, end) for (p, start, end) in self.capacity if p == period )
+    for (row, path) in enumerate(self.power_sent.rows.names):
+      if path not in paths and self.has_flows(row, columns): paths.add(path)
+    paths = sorted(paths)
+    records = []
+    for path in paths:
+      rated = self.capacity.get((period,) + path, 0)
+      derated = rated * self.trans_path_dat[path]['transmission_derating_factor'] if rated > 0 else 0
+      records.append({ 'rated_cap_MW': rated, 'derated_cap_MW': derated })
+    if numpy is not None:
+      self._numpy_stats(paths, records, columns, calculate_percentiles)
+    else:
+      self._python_stats(paths, records, columns, calculate_percentiles)
+
+    # Rank the paths by the energy they sent near their limits, then by their hours near the limits
+    order = sorted(range(len(paths)), key=lambda i: (-records[i]['congested_energy'], -records[i]['hours_near_limit'], paths[i]))
+    for (rank, i) in enumerate(order):
+      records[i]['congestion_rank'] = rank + 1
+    return zip(paths, records)
+
+  def has_flows(self, row, columns):
+    offset = row * self.power_sent.num_columns
+    state = self.power_sent.state
+    return any( state[offset + column] != encoding.absent for column in columns )
+
+  def _sent(self, path, columns):
+    """Power sent on a path in these columns, with 0 for timepoints without records"""
+    if path not in self.power_sent.rows: return [0.0] * len(columns)
+    values = self.power_sent.fields['power']
+    offset = self.power_sent.rows[path] * self.power_sent.num_columns
+    return [ values[offset + column] for column in columns ]
+
+  def _python_stats(self, paths, records, columns, calculate_percentiles):
+    calendar = self.calendar
+    hours_per_year = [ calendar.hours_per_year[column] for column in columns ]
+    weights = [ calendar.weight[column] for column in columns ]
+    for (path, record) in zip(paths, records):
+      sent = self._sent(path, columns)
+      record['energy_sent'] = 0.0
+      for (s, h) in zip(sent, hours_per_year): record['energy_sent'] += s * h
+      derated = record['derated_cap_MW']
+      if derated == 0:
+        record.update(average_utilization=None, hours_at_limit=0.0, hours_near_limit=0.0, congested_energy=0.0)
+        for p in calculate_percentiles: record[p] = None
+        continue
+      utilization = [ s / derated for s in sent ]
+      record['average_utilization'] = 0.0
+      record['hours_at_limit'] = 0.0
+      record['hours_near_limit'] = 0.0
+      record['congested_energy'] = 0.0
+      for (u, s, h, w) in zip(utilization, sent, hours_per_year, weights):
+        record['average_utilization'] += u * w
+        record['hours_at_limit'] += h if u >= at_limit else 0.0
+        record['hours_near_limit'] += h if u >= near_limit else 0.0
+        record['congested_energy'] += s * h if u >= near_limit else 0.0
+      record['average_utilization'] /= sum(weights)
+      (ranks, cut_points) = percentiles.weighted_percentiles([(utilization, weights)], calculate_percentiles, ranks=False)[0]
+      for p in calculate_percentiles: record[p] = utilization[cut_points[p]]
+
+  def _numpy_stats(self, paths, records, columns, calculate_percentiles):
+    columns = numpy.frombuffer(columns, dtype=numpy.dtype(columns.typecode))
+    hours_per_year = self.calendar.field('hours_per_year')[columns]
+    weights = self.calendar.field('weight')[columns]
+    sent = numpy.zeros((len(paths), len(columns)))
+    if len(self.power_sent.rows) > 0:
+      grid_values = numpy.frombuffer(self.power_sent.fields['power'], dtype=float).reshape(len(self.power_sent.rows), self.power_sent.num_columns)
+      for (i, path) in enumerate(paths):
+        if path in self.power_sent.rows: sent[i] = grid_values[self.power_sent.rows[path], columns]
+    derated = numpy.array([ record['derated_cap_MW'] for record in records ], dtype=float)
+    has_capacity = derated > 0
+    utilization = sent / numpy.where(has_capacity, derated, 1)[:, numpy.newaxis]
+    # Sums are running sums along the timepoints of each path, which add them in the same order as
+    # the loops of _python_stats
+    def row_sums(values):
+      return numpy.add.accumulate(values, axis=1)[:, -1].tolist() if len(columns) > 0 else [0.0] * len(paths)
+    energy = sent * hours_per_year
+    near = utilization >= near_limit
+    totals = {
+      'energy_sent': row_sums(energy),
+      'average_utilization': row_sums(utilization * weights),
+      'hours_at_limit': row_sums(numpy.where(utilization >= at_limit, hours_per_year, 0.0)),
+      'hours_near_limit': row_sums(numpy.where(near, hours_per_year, 0.0)),
+      'congested_energy': row_sums(numpy.where(near, energy, 0.0)) }
+    total_weight = float(numpy.add.accumulate(weights)[-1]) if len(columns) > 0 else 0
+
+    # Weighted percentiles of every path at once. Ties are kept in chronological order.
+    order = numpy.argsort(utilization, axis=1, kind='mergesort')
+    cumulative = numpy.add.accumulate(weights[order], axis=1)
+    row_idx = numpy.arange(len(paths))
+    cut_values = {}
+    for p in calculate_percentiles:
+      if len(columns) == 0: break
+      found = numpy.minimum((cumulative < (p / 100.0 - percentiles.tolerance) * cumulative[:, -1:]).sum(axis=1), len(columns) - 1)
+      cut_values[p] = utilization[row_idx, order[row_idx, found]].tolist()
+
+    for (i, record) in enumerate(records):
+      record['energy_sent'] = totals['energy_sent'][i]
+      if not has_capacity[i]:
+        record.update(average_utilization=None, hours_at_limit=0.0, hours_near_limit=0.0, congested_energy=0.0)
+        for p in calculate_percentiles: record[p] = None
+        continue
+      for key in ['hours_at_limit', 'hours_near_limit', 'congested_energy']:
+        record[key] = totals[key][i]
+      record['average_utilization'] = totals['average_utilization'][i] / total_weight
+      for p in calculate_percentiles: record[p] = cut_values[p][i] if p in cut_values else None
@@ -0,0 +1,221 @@
+# Convergence of the dispatch summaries while the test sets of a scenario are being solved
+# The dispatch summaries of switch_summary/dispatch.py are sums over every historic test set, but after
+# some of the test sets are solved, the rest mostly narrow down numbers that are already known. This
+# estimates the summaries of the whole sweep from the test sets that are solved so far, with confidence
+# intervals, so the sweep can stop once they are precise enough:
+#   cap_shortfall_mw: the cumulative capacity shortfall of a test set, averaged over the test sets
+#   emissions: total co2 of all test sets, against the emission target of the period
+#   ng_consumption & biomass_consumption: total consumption of all test sets, against the projections
+# Each is estimated for each carbon cost & period from the partial summaries of the test sets, which
+# dispatch.scan_partials() keeps in its manifest, so each update only scans newly solved test sets. A
+# test set is solved once it has dispatch_sums files for every carbon cost.
+#
+# Test sets are stratified by the peak of their hourly system load in inputs/system_load.tab, since
+# shortfalls & peaker dispatch depend on it. The estimate of a total is the sum over strata of the
+# stratum size times the mean of its solved test sets, and its variance has the finite population
+# correction, so the interval shrinks to 0 as the last test sets of a stratum are solved. An estimate
+# has converged when the half width of its interval is within tolerance of its target or projection
+# (shortfall_tolerance_mw for shortfalls). Every stratum needs 2 solved test sets to have a variance.
+#
+# The recommended order of the unsolved test sets adds test sets to the strata whose next test set
+# reduces the variance of the unconverged estimates the most, relative to their tolerances. Strata
+# without 2 solved test sets come first, from the highest peak load down. Within a stratum, test sets
+# are taken in a fixed pseudo-random order, so the solved ones remain a random sample of the stratum.
+# switch_summary/scheduler.py queues can be reordered with the recommendations and stopped once
+# every estimate has converged; dispatch/monitor_convergence.py is the command line interface.
+import os
+import math
+import hashlib
+from switch_summary import dispatch
+from switch_summary import tab_cache
+from switch_summary import tables
+
+# The estimates of each carbon cost & period. Shortfalls are means of the test sets, the rest are
+# totals of all test sets.
+measures = ['cap_shortfall_mw', 'emissions', 'ng_consumption', 'biomass_consumption']
+mean_measures = ['cap_shortfall_mw']
+
+summary_name = 'convergence_summary'
+summary_columns = ['scenario_id', 'carbon_cost', 'period', 'measure', 'solved_test_sets', 'test_sets',
+  'estimate', 'ci_low', 'ci_high', 'half_width', 'tolerance', 'reference', 'converged']
+
+
+def normal_quantile(p):
+  """The standard normal quantile of probability p, by bisection of the normal cdf"""
+  (low, high) = (-10.0, 10.0)
+  for i in range(100):
+    middle = (low + high) / 2
+    if 0.5 * (1 + math.erf(middle / math.sqrt(2))) < p: low = middle
+    else: high = middle
+  return (low + high) / 2
+
+
+def peak_load(test_dir):
+  """The peak of the hourly system load of a test set, summed over load areas, or None if the test set
+  doesn't have inputs/system_load.tab"""
+  path = os.path.join(test_dir, 'inputs', 'system_load.tab')
+  if not os.path.isfile(path): return None
+  hourly_load = {}
+  for row in tab_cache.read_rows(path):
+    hourly_load[row['hour']] = hourly_load.get(row['hour'], 0) + float(row['system_load'])
+  return max(hourly_load.values()) if hourly_load else None
+
+
+def test_set_values(partial, carbon_costs, periods):
+  """The value of each (measure, carbon_cost, period) in the partial summary of a test set"""
+  values = {}
+  for carbon_cost in carbon_costs:
+    for period in periods:
+      emissions = partial['emissions'].get(carbon_cost, {}).get(period)
+      values[('emissions', carbon_cost, period)] = sum( emissions[emission_type] for emission_type in
+        ['co2_tons', 'spinning_co2_tons', 'deep_cycling_co2_tons', 'startup_co2_tons'] ) if emissions else 0
+      values[('ng_consumption', carbon_cost, period)] = partial['ng_consumption'].get(carbon_cost, {}).get(period, 0)
+      values[('biomass_consumption', carbon_cost, period)] = sum(partial['biomass_consumption'].get(carbon_cost, {}).get(period, {}).values())
+      # Every shortfall record of a period has the cumulative shortfall of the period
+      values[('cap_shortfall_mw', carbon_cost, period)] = max([ record['cap_shortfall_mw'] for record in partial['capacity_shortfalls']
+        if record['carbon_cost'] == carbon_cost and record['period'] == str(period) ] or [0])
+  return values
+
+
+def sample_variance(values):
+  mean = sum(values) / len(values)
+  return sum( (value - mean) ** 2 for value in values ) / (len(values) - 1)
+
+
+def random_order(test_dir):
+  """A fixed pseudo-random sort key of a test set"""
+  return hashlib.md5(test_dir).hexdigest()
+
+
+class Monitor(object):
+  """Estimates of the dispatch summaries of a dispatch directory from its solved test sets. tolerance
+  is relative to the targets & projections, and confidence is the level of the intervals."""
+
+  def __init__(self, dispatch_dir='.', tolerance=0.02, shortfall_tolerance_mw=100, confidence=0.95,
+      min_test_sets=10, num_strata=4, workers=None):
+    self.dispatch_dir = dispatch_dir
+    self.tolerance = tolerance
+    self.shortfall_tolerance_mw = shortfall_tolerance_mw
+    self.z = normal_quantile(0.5 + confidence / 2)
+    self.min_test_sets = min_test_sets
+    self.num_strata = num_strata
+    self.workers = workers
+    self.scenario_id = str(int(open(os.path.join(dispatch_dir, "scenario_id.txt")).read()))
+    self.inputs = dispatch.Inputs(dispatch_dir)
+    self.peak_loads = {} # Indexed by test set directory name
+
+  def strata(self, test_dirs):
+    """Groups of test sets of similar peak load, from the highest peak down. Test sets without a peak
+    load are a stratum of their own."""
+    for test_dir in test_dirs:
+      if test_dir not in self.peak_loads: self.peak_loads[test_dir] = peak_load(os.path.join(self.dispatch_dir, test_dir))
+    with_peaks = sorted([ test_dir for test_dir in test_dirs if self.peak_loads[test_dir] is not None ],
+      key=lambda test_dir: -self.peak_loads[test_dir])
+    # Strata of at least 5 test sets, so each can have a variance well before it is solved
+    num_strata = max(1, min(self.num_strata, len(with_peaks) // 5))
+    strata = [ with_peaks[len(with_peaks) * i // num_strata:len(with_peaks) * (i + 1) // num_strata] for i in range(num_strata) ]
+    strata.append([ test_dir for test_dir in test_dirs if self.peak_loads[test_dir] is None ])
+    return [ stratum for stratum in strata if stratum ]
+
+  def reference(self, measure, carbon_cost, period):
+    """The target or projection of an estimate, or None"""
+    if measure == 'emissions': return self.inputs.emission_targets.get(period)
+    if measure == 'ng_consumption': return self.inputs.ng_consumption_projections.get(carbon_cost, {}).get(period)
+    if measure == 'biomass_consumption':
+      projections = self.inputs.biomass_consumption_projections.get(carbon_cost, {}).get(period)
+      return sum(projections.values()) if projections else None
+    return None
+
+  def update(self):
+    """Scan the test sets and estimate the summaries. Returns a dict with the estimates, whether they
+    have all converged, and the recommended order of the unsolved test sets."""
+    partials = dispatch.scan_partials(self.dispatch_dir, self.inputs.periods, self.workers)
+    carbon_costs = dispatch.summary_carbon_costs(self.inputs, partials)
+    solved = dict( (test_dir, test_set_values(partial, carbon_costs, self.inputs.periods)) for (test_dir, partial) in partials
+      if dispatch.solved(partial, carbon_costs) )
+    test_dirs = [ test_dir for (test_dir, partial) in partials ]
+    strata = self.strata(test_dirs)
+    estimates = [ self.estimate((measure, carbon_cost, period), strata, solved, len(test_dirs))
+      for carbon_cost in carbon_costs for period in sorted(self.inputs.periods) for measure in measures ]
+    converged = len(estimates) > 0 and all( estimate['converged'] for estimate in estimates )
+    return { 'estimates': estimates, 'converged': converged, 'solved_test_sets': len(solved), 'test_sets': len(test_dirs),
+      'recommendations': self.recommend(strata, solved, [ estimate for estimate in estimates if not estimate['converged'] ], len(test_dirs)) }
+
+  def estimate(self, key, strata, solved, num_test_sets):
+    """The stratified estimate of a (measure, carbon_cost, period) and its confidence interval"""
+    (measure, carbon_cost, period) = key
+    all_values = [ solved[test_dir][key] for test_dir in solved ]
+    overall_mean = sum(all_values) / len(all_values) if all_values else 0
+    (total, variance) = (0.0, 0.0)
+    for stratum in strata:
+      values = [ solved[test_dir][key] for test_dir in stratum if test_dir in solved ]
+      # Strata without solved test sets are estimated by the other strata
+      total += len(stratum) * (sum(values) / len(values) if values else overall_mean)
+      if len(values) == len(stratum): continue
+      if len(values) < 2: variance = None
+      if variance is not None:
+        variance += len(stratum) ** 2 * (1 - float(len(values)) / len(stratum)) * sample_variance(values) / len(values)
+    scale = float(num_test_sets) if measure in mean_measures else 1.0
+    estimate = total / scale if num_test_sets else None
+    half_width = self.z * math.sqrt(variance) / scale if variance is not None else None
+    reference = self.reference(measure, carbon_cost, period)
+    if measure == 'cap_shortfall_mw': tolerance = self.shortfall_tolerance_mw
+    elif reference: tolerance = self.tolerance * abs(reference)
+    else: tolerance = self.tolerance * abs(estimate or 0)
+    converged = len(solved) == num_test_sets or (len(solved) >= self.min_test_sets and half_width is not None and half_width <= tolerance)
+    return { 'measure': measure, 'carbon_cost': carbon_cost, 'period': period, 'solved_test_sets': len(solved),
+      'test_sets': num_test_sets, 'estimate': estimate, 'half_width': half_width, 'tolerance': tolerance,
+      'reference': reference, 'converged': converged }
+
+  def recommend(self, strata, solved, unconverged, num_test_sets):
+    """The unsolved test sets in the order that shrinks the intervals of the unconverged estimates the
+    most, by the greedy allocation of one test set at a time to the stratum whose next test set
+    reduces their variance the most, relative to their squared tolerances."""
+    unsolved = [ sorted([ test_dir for test_dir in stratum if test_dir not in solved ], key=random_order) for stratum in strata ]
+    num_solved = [ len(stratum) - len(remaining) for (stratum, remaining) in zip(strata, unsolved) ]
+    # The weighted variance of each stratum, per solved test set: the variance of its next test set
+    variances = []
+    for stratum in strata:
+      weighted = 0.0
+      for estimate in unconverged:
+        key = (estimate['measure'], estimate['carbon_cost'], estimate['period'])
+        values = [ solved[test_dir][key] for test_dir in stratum if test_dir in solved ]
+        if len(values) < 2 or not estimate['tolerance']: continue
+        scale = float(num_test_sets) if estimate['measure'] in mean_measures else 1.0
+        weighted += len(stratum) ** 2 * sample_variance(values) / (scale * estimate['tolerance']) ** 2
+      variances.append(weighted)
+    recommendations = []
+    while any(unsolved):
+      def gain(h):
+        if num_solved[h] < 2: return float('inf')
+        return variances[h] * (1.0 / num_solved[h] - 1.0 / (num_solved[h] + 1))
+      # Ties go to the strata of higher peak loads, which come first
+      h = max([ h for h in range(len(strata)) if unsolved[h] ], key=lambda h: (gain(h), -h))
+      recommendations.append(unsolved[h].pop(0))
+      num_solved[h] += 1
+    return recommendations
+
+  def write_summary(self, status):
+    """Write the estimates to convergence_summary.txt in the dispatch directory"""
+    summary_output = tables.SummaryFile(os.path.join(self.dispatch_dir, summary_name + '.txt'), summary_name, summary_columns)
+    for estimate in status['estimates']:
+      half_width = estimate['half_width']
+      summary_output.write( [
+        self.scenario_id, estimate['carbon_cost'], estimate['period'], estimate['measure'],
+        estimate['solved_test_sets'], estimate['test_sets'], estimate['estimate'],
+        estimate['estimate'] - half_width if half_width is not None else None,
+        estimate['estimate'] + half_width if half_width is not None else None,
+        half_width, estimate['tolerance'], estimate['reference'], int(estimate['converged']) ] )
+    summary_output.close()
+
+
+def dispatch_job_names(dispatch_dir, test_dirs):
+  """The scheduler job names of test set directories, as the dispatch_all qsub template names their
+  logs: <test_set_id>_dispatch, with the ids of test_set_ids.txt"""
+  ids = {}
+  path = os.path.join(dispatch_dir, 'test_set_ids.txt')
+  if os.path.isfile(path):
+    for line in open(path):
+      fields = line.split()
+      if len(fields) == 2: ids[fields[1]] = fields[0]
+  return [ ids.get(test_dir, test_dir.replace('test_set_', '').lstrip('0') or '0') + '_dispatch' for test_dir in test_dirs ]
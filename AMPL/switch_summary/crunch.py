@@ -0,0 +1,265 @@
+# Local crunch of the rollups of crunch_results.sql
+# After import_results_to_mysql.sh loads the results files into the results database, crunch_results.sql
+# rolls the generator & storage dispatch, generation capacity & transmission dispatch up by hour,
+# period, load area, technology & fuel with INSERT ... SELECT ... GROUP BY statements, which keep the
+# shared database server busy for hours for a large scenario. This computes the same tables from the
+# results files with grouped numpy reductions and writes each to results/crunch/<table>.txt, with a
+# header of the table's columns, so they can be loaded as they are and the statements between the
+# "rollups computed by crunch_results.py" markers of crunch_results.sql skipped:
+#   _gen_hourly_summary_tech_la, _gen_hourly_summary_tech & sum_hourly_weights_per_period_table
+#   _gen_summary_tech_la & _gen_summary_tech
+#   _gen_hourly_summary_fuel_la, _gen_hourly_summary_fuel, _gen_summary_fuel_la & gen_summary_fuel
+#   _gen_cap_summary_tech_la, _gen_cap_summary_tech, _gen_cap_summary_fuel_la & gen_cap_summary_fuel
+#   _trans_summary
+# Each dispatch file is read once and reduced to the hourly sums by load area & technology, and the
+# other generation rollups are computed from those, as in the SQL. The files of every carbon cost and
+# the present day files are crunched together like the tables of the database, since the hourly
+# weights of a period are shared by them. The fuel of each technology in the capacity rollups, which
+# the SQL takes from the technologies table, comes from the gen_cap files.
+import os
+import re
+import glob
+import numpy
+from switch_summary import columnar
+from switch_summary import compressed
+from switch_summary import tables
+
+crunch_dir_name = 'crunch'
+
+# The results files that import_results_to_mysql.sh loads into _generator_and_storage_dispatch, _gen_cap
+# & _transmission_dispatch, including the present day results
+dispatch_pattern = r'^(present_)?generator_and_storage_dispatch_\d+\.txt$'
+gen_cap_pattern = r'^(present_)?gen_cap_\d+\.txt$'
+transmission_dispatch_pattern = r'^(present_)?transmission_dispatch(_optimized)?_\d+\.txt$'
+
+# The sums of _gen_hourly_summary_tech_la and the columns of the dispatch files they are loaded from
+hourly_la_sums = [
+  ('variable_o_m_cost', 'variable_o_m'), ('fuel_cost', 'fuel_cost'), ('carbon_cost_incurred', 'carbon_cost_hourly'),
+  ('co2_tons', 'co2_tons'), ('power', 'power'), ('spinning_fuel_cost', 'spinning_fuel_cost'),
+  ('spinning_carbon_cost_incurred', 'spinning_carbon_cost_incurred'), ('spinning_co2_tons', 'spinning_co2_tons'),
+  ('spinning_reserve', 'spinning_reserve'), ('quickstart_capacity', 'quickstart_capacity'),
+  ('total_operating_reserve', 'total_operating_reserve'), ('deep_cycling_amount', 'deep_cycling_amount'),
+  ('deep_cycling_fuel_cost', 'deep_cycling_fuel_cost'), ('deep_cycling_carbon_cost', 'deep_cycling_carbon_cost'),
+  ('deep_cycling_co2_tons', 'deep_cycling_co2_tons'), ('mw_started_up', 'mw_started_up'),
+  ('startup_fuel_cost', 'startup_fuel_cost'), ('startup_nonfuel_cost', 'startup_nonfuel_cost'),
+  ('startup_carbon_cost', 'startup_carbon_cost'), ('startup_co2_tons', 'startup_co2_tons')
+]
+# The sums of the other hourly rollups, which are averaged over the hours of a period by the period rollups
+hourly_sums = ['power', 'co2_tons', 'spinning_reserve', 'spinning_co2_tons', 'quickstart_capacity', 'total_operating_reserve',
+  'deep_cycling_amount', 'deep_cycling_co2_tons', 'mw_started_up', 'startup_co2_tons', 'total_co2_tons']
+average_sums = [ 'avg_' + column for column in hourly_sums ]
+cap_sums = ['capacity', 'storage_energy_capacity', 'capital_cost', 'fixed_o_m_cost']
+cost_sums = ['variable_o_m_cost', 'fuel_cost', 'carbon_cost_total']
+total_cost_sums = ['capacity', 'storage_energy_capacity', 'capital_cost', 'o_m_cost_total', 'fuel_cost', 'carbon_cost_total']
+
+hourly_keys = ['study_date', 'study_hour', 'hours_in_sample', 'month', 'hour_of_day_UTC']
+
+# The columns of each crunched table, in the order of the insert statements of crunch_results.sql or
+# of the table where the insert doesn't list them
+table_columns = {
+  '_gen_hourly_summary_tech_la': ['scenario_id', 'carbon_cost', 'period', 'area_id', 'study_date', 'study_hour',
+    'hours_in_sample', 'technology_id', 'fuel'] + [ column for (column, file_column) in hourly_la_sums ] +
+    ['total_co2_tons', 'month', 'hour_of_day_UTC'],
+  '_gen_hourly_summary_tech': ['scenario_id', 'carbon_cost', 'period'] + hourly_keys + ['technology_id'] + hourly_sums,
+  'sum_hourly_weights_per_period_table': ['scenario_id', 'period', 'sum_hourly_weights_per_period', 'years_per_period'],
+  '_gen_summary_tech_la': ['scenario_id', 'carbon_cost', 'period', 'area_id', 'technology_id'] + average_sums,
+  '_gen_summary_tech': ['scenario_id', 'carbon_cost', 'period', 'technology_id'] + average_sums,
+  '_gen_hourly_summary_fuel_la': ['scenario_id', 'carbon_cost', 'period', 'area_id'] + hourly_keys + ['fuel'] + hourly_sums,
+  '_gen_hourly_summary_fuel': ['scenario_id', 'carbon_cost', 'period'] + hourly_keys + ['fuel'] + hourly_sums,
+  '_gen_summary_fuel_la': ['scenario_id', 'carbon_cost', 'period', 'area_id', 'fuel'] + average_sums,
+  'gen_summary_fuel': ['scenario_id', 'carbon_cost', 'period', 'fuel'] + average_sums,
+  '_gen_cap_summary_tech_la': ['scenario_id', 'carbon_cost', 'period', 'area_id', 'technology_id'] + cap_sums + cost_sums,
+  '_gen_cap_summary_tech': ['scenario_id', 'carbon_cost', 'period', 'technology_id'] + total_cost_sums,
+  '_gen_cap_summary_fuel_la': ['scenario_id', 'carbon_cost', 'period', 'area_id', 'fuel'] + cap_sums + cost_sums,
+  'gen_cap_summary_fuel': ['scenario_id', 'carbon_cost', 'period', 'fuel'] + total_cost_sums,
+  '_trans_summary': ['scenario_id', 'carbon_cost', 'period', 'area_id', 'study_date', 'study_hour', 'month',
+    'hour_of_day_UTC', 'hours_in_sample', 'net_power'],
+}
+# The tables in the order that crunch_results.sql builds them
+table_order = ['_gen_hourly_summary_tech_la', '_gen_hourly_summary_tech', 'sum_hourly_weights_per_period_table',
+  '_gen_summary_tech_la', '_gen_summary_tech', '_gen_hourly_summary_fuel_la', '_gen_hourly_summary_fuel',
+  '_gen_summary_fuel_la', 'gen_summary_fuel', '_gen_cap_summary_tech_la', '_gen_cap_summary_tech',
+  '_gen_cap_summary_fuel_la', 'gen_cap_summary_fuel', '_trans_summary']
+
+hours_per_year = 8766
+
+
+def results_files(results_dir, pattern):
+  """The results files whose names match a pattern, which may be compressed"""
+  return sorted( path for path in glob.glob(os.path.join(results_dir, '*.txt*'))
+    if re.match(pattern, os.path.basename(compressed.base_name(path))) )
+
+
+def rollup(table, keys, sums):
+  """GROUP BY the key columns of a table, a dict of numpy arrays of its columns. sums is a list of
+  (column, values) of the values to sum into each column. Returns the table of the groups, sorted by
+  their keys."""
+  num_records = len(table[keys[0]])
+  group_idx = numpy.zeros(num_records, dtype=numpy.int64)
+  for key in keys:
+    values, codes = numpy.unique(table[key], return_inverse=True)
+    # Renumber the groups after each key so the codes stay small
+    group_idx = numpy.unique(group_idx * len(values) + codes, return_inverse=True)[1]
+  num_groups = int(group_idx.max()) + 1 if num_records > 0 else 0
+  first_record = numpy.empty(num_groups, dtype=numpy.int64)
+  first_record[group_idx[::-1]] = numpy.arange(num_records - 1, -1, -1)
+  grouped = dict( (key, table[key][first_record]) for key in keys )
+  for (column, values) in sums:
+    grouped[column] = numpy.bincount(group_idx, weights=values, minlength=num_groups)
+  return grouped
+
+
+def concatenate(parts, columns):
+  return dict( (column, numpy.concatenate([ part[column] for part in parts ])) for column in columns )
+
+
+def lookup(table, keys, other, other_keys, column, default=0.0):
+  """The values of a column of another table for each record of a table, joined on keys, or default
+  for records without a match, like the left join of an UPDATE"""
+  index = dict( (key, i) for (i, key) in enumerate(zip(*[ other[k].tolist() for k in other_keys ])) )
+  values = other[column].tolist()
+  return numpy.array([ values[index[key]] if key in index else default
+    for key in zip(*[ table[k].tolist() for k in keys ]) ])
+
+
+def add_calendar_columns(table):
+  """The month & hour_of_day_UTC of each YYYYMMDDHH study_hour, as crunch_results.sql takes them from its digits"""
+  table['month'] = (table['study_hour'] // 10000) % 100
+  table['hour_of_day_UTC'] = table['study_hour'] % 100
+
+
+def hourly_dispatch(path):
+  """_gen_hourly_summary_tech_la of one generator_and_storage_dispatch file"""
+  key_columns = [('scenario_id', 'scenario_id', int), ('carbon_cost', 'carbon_cost', int), ('period', 'period', int),
+    ('area_id', 'load_area_id', int), ('study_date', 'date', int), ('study_hour', 'hour', int),
+    ('hours_in_sample', 'hours_in_sample', float), ('technology_id', 'technology_id', int), ('fuel', 'fuel', None)]
+  records = columnar.read_columns(path, [ (file_column, column_type) for (column, file_column, column_type) in key_columns ] +
+    [ (file_column, float) for (column, file_column) in hourly_la_sums ])
+  table = dict( (column, records[file_column]) for (column, file_column, column_type) in key_columns )
+  sums = [ (column, records[file_column]) for (column, file_column) in hourly_la_sums ]
+  sums.append( ('total_co2_tons', records['co2_tons'] + records['spinning_co2_tons'] + records['deep_cycling_co2_tons'] + records['startup_co2_tons']) )
+  return rollup(table, [ column for (column, file_column, column_type) in key_columns ], sums)
+
+
+def crunch_generation(dispatch_paths, gen_cap_paths):
+  """The generation & capacity rollups of the dispatch & gen_cap files, as a dict of tables"""
+  keys = table_columns['_gen_hourly_summary_tech_la'][:9]
+  sums = [ column for (column, file_column) in hourly_la_sums ] + ['total_co2_tons']
+  parts = [ hourly_dispatch(path) for path in dispatch_paths ]
+  hourly_la = concatenate(parts, keys + sums)
+  if len(parts) > 1: hourly_la = rollup(hourly_la, keys, [ (column, hourly_la[column]) for column in sums ])
+  add_calendar_columns(hourly_la)
+  crunched = {'_gen_hourly_summary_tech_la': hourly_la}
+
+  crunched['_gen_hourly_summary_tech'] = rollup(hourly_la, table_columns['_gen_hourly_summary_tech'][:9],
+    [ (column, hourly_la[column]) for column in hourly_sums ])
+
+  # The hours represented by each period, counting each hour of the scenario once
+  hours = rollup(crunched['_gen_hourly_summary_tech'], ['scenario_id', 'period', 'study_hour', 'hours_in_sample'], [])
+  weights = rollup(hours, ['scenario_id', 'period'], [('sum_hourly_weights_per_period', hours['hours_in_sample'])])
+  weights['years_per_period'] = weights['sum_hourly_weights_per_period'] / hours_per_year
+  crunched['sum_hourly_weights_per_period_table'] = weights
+
+  def period_averages(hourly, keys):
+    averages = rollup(hourly, keys, [ ('avg_' + column, hourly[column] * hourly['hours_in_sample']) for column in hourly_sums ])
+    period_weights = lookup(averages, ['scenario_id', 'period'], weights, ['scenario_id', 'period'], 'sum_hourly_weights_per_period')
+    for column in average_sums:
+      averages[column] = averages[column] / period_weights
+    return averages
+  def period_totals(averages, keys):
+    return rollup(averages, keys, [ (column, averages[column]) for column in average_sums ])
+  crunched['_gen_summary_tech_la'] = period_averages(hourly_la, ['scenario_id', 'carbon_cost', 'period', 'area_id', 'technology_id'])
+  crunched['_gen_summary_tech'] = period_totals(crunched['_gen_summary_tech_la'], ['scenario_id', 'carbon_cost', 'period', 'technology_id'])
+
+  hourly_fuel_la = rollup(hourly_la, table_columns['_gen_hourly_summary_fuel_la'][:10], [ (column, hourly_la[column]) for column in hourly_sums ])
+  crunched['_gen_hourly_summary_fuel_la'] = hourly_fuel_la
+  crunched['_gen_hourly_summary_fuel'] = rollup(hourly_fuel_la, table_columns['_gen_hourly_summary_fuel'][:9],
+    [ (column, hourly_fuel_la[column]) for column in hourly_sums ])
+  crunched['_gen_summary_fuel_la'] = period_averages(hourly_fuel_la, ['scenario_id', 'carbon_cost', 'period', 'area_id', 'fuel'])
+  crunched['gen_summary_fuel'] = period_totals(crunched['_gen_summary_fuel_la'], ['scenario_id', 'carbon_cost', 'period', 'fuel'])
+
+  # Capacity by load area & technology, with the costs of its dispatch over the period
+  cap_keys = ['scenario_id', 'carbon_cost', 'period', 'area_id', 'technology_id']
+  cap_columns = [('scenario_id', 'scenario_id', int), ('carbon_cost', 'carbon_cost', int), ('period', 'period', int),
+    ('area_id', 'load_area_id', int), ('technology_id', 'technology_id', int), ('fuel', 'fuel', None)] + \
+    [ (column, column, float) for column in cap_sums ]
+  gen_cap = concatenate([ dict( (column, records[file_column]) for (column, file_column, column_type) in cap_columns )
+    for records in [ columnar.read_columns(path, [ (file_column, column_type) for (column, file_column, column_type) in cap_columns ])
+      for path in gen_cap_paths ] ], [ column for (column, file_column, column_type) in cap_columns ])
+  cap_la = rollup(gen_cap, cap_keys, [ (column, gen_cap[column]) for column in cap_sums ])
+  hours_in_sample = hourly_la['hours_in_sample']
+  costs = rollup(hourly_la, cap_keys, [
+    ('variable_o_m_cost', (hourly_la['variable_o_m_cost'] + hourly_la['startup_nonfuel_cost']) * hours_in_sample),
+    ('fuel_cost', (hourly_la['fuel_cost'] + hourly_la['spinning_fuel_cost'] + hourly_la['deep_cycling_fuel_cost'] +
+      hourly_la['startup_fuel_cost']) * hours_in_sample),
+    ('carbon_cost_total', (hourly_la['carbon_cost_incurred'] + hourly_la['spinning_carbon_cost_incurred'] +
+      hourly_la['deep_cycling_carbon_cost'] + hourly_la['startup_carbon_cost']) * hours_in_sample) ])
+  for column in cost_sums:
+    cap_la[column] = lookup(cap_la, cap_keys, costs, cap_keys, column)
+  crunched['_gen_cap_summary_tech_la'] = cap_la
+
+  def cost_totals(cap, keys):
+    return rollup(cap, keys, [ (column, cap[column]) for column in ['capacity', 'storage_energy_capacity', 'capital_cost'] ] +
+      [ ('o_m_cost_total', cap['fixed_o_m_cost'] + cap['variable_o_m_cost']), ('fuel_cost', cap['fuel_cost']),
+        ('carbon_cost_total', cap['carbon_cost_total']) ])
+  crunched['_gen_cap_summary_tech'] = cost_totals(cap_la, ['scenario_id', 'carbon_cost', 'period', 'technology_id'])
+  cap_la['fuel'] = lookup(cap_la, ['technology_id'], gen_cap, ['technology_id'], 'fuel', None)
+  cap_fuel_la = rollup(cap_la, ['scenario_id', 'carbon_cost', 'period', 'area_id', 'fuel'], [ (column, cap_la[column]) for column in cap_sums + cost_sums ])
+  crunched['_gen_cap_summary_fuel_la'] = cap_fuel_la
+  crunched['gen_cap_summary_fuel'] = cost_totals(cap_fuel_la, ['scenario_id', 'carbon_cost', 'period', 'fuel'])
+  return crunched
+
+
+def crunch_transmission(transmission_paths):
+  """_trans_summary of the transmission dispatch files: the power received by each load area in each
+  hour, minus the power it sent"""
+  columns = [('scenario_id', int), ('carbon_cost', int), ('period', int), ('load_area_receive_id', int), ('load_area_from_id', int),
+    ('date', int), ('hour', int), ('hours_in_sample', float), ('power_sent', float), ('power_received', float)]
+  parts = []
+  for path in transmission_paths:
+    records = columnar.read_columns(path, columns)
+    zeros = numpy.zeros(len(records['hour']))
+    for (area_column, received, sent) in [('load_area_receive_id', records['power_received'], zeros),
+        ('load_area_from_id', zeros, records['power_sent'])]:
+      parts.append({ 'scenario_id': records['scenario_id'], 'carbon_cost': records['carbon_cost'], 'period': records['period'],
+        'area_id': records[area_column], 'study_date': records['date'], 'study_hour': records['hour'],
+        'hours_in_sample': records['hours_in_sample'], 'power_received': received, 'power_sent': sent })
+  keys = ['scenario_id', 'carbon_cost', 'period', 'area_id', 'study_date', 'study_hour', 'hours_in_sample']
+  if len(parts) == 0:
+    parts = [ dict( (column, numpy.array([], dtype=int)) for column in keys + ['power_received', 'power_sent'] ) ]
+  flows = concatenate(parts, keys + ['power_received', 'power_sent'])
+  trans_summary = rollup(flows, keys, [('power_received', flows['power_received']), ('power_sent', flows['power_sent'])])
+  trans_summary['net_power'] = trans_summary['power_received'] - trans_summary['power_sent']
+  add_calendar_columns(trans_summary)
+  return {'_trans_summary': trans_summary}
+
+
+def write_tables(crunch_dir, crunched):
+  """Write each crunched table to crunch_dir/<table>.txt. Returns a list of (table, rows)."""
+  if not os.path.isdir(crunch_dir): os.makedirs(crunch_dir)
+  row_counts = []
+  for name in table_order:
+    if name not in crunched: continue
+    columns = table_columns[name]
+    output = tables.SummaryFile(os.path.join(crunch_dir, name + '.txt'), name, columns)
+    for row in zip(*[ crunched[name][column].tolist() for column in columns ]):
+      output.write(row)
+    output.close()
+    row_counts.append( (name, len(crunched[name][columns[0]])) )
+  return row_counts
+
+
+def crunch(results_dir='results'):
+  """Crunch the rollups of the results files in results_dir into results_dir/crunch. Returns a list of
+  (table, rows), or None if there are no dispatch files."""
+  dispatch_paths = results_files(results_dir, dispatch_pattern)
+  if len(dispatch_paths) == 0:
+    print "Error! No generator_and_storage_dispatch files found in " + results_dir + "."
+    return None
+  gen_cap_paths = results_files(results_dir, gen_cap_pattern)
+  if len(gen_cap_paths) == 0:
+    print "Error! No gen_cap files found in " + results_dir + "."
+    return None
+  crunched = crunch_generation(dispatch_paths, gen_cap_paths)
+  crunched.update(crunch_transmission(results_files(results_dir, transmission_dispatch_pattern)))
+  return write_tables(os.path.join(results_dir, crunch_dir_name), crunched)
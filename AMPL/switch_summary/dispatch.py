@@ -0,0 +1,475 @@
+# Summaries of the dispatch test sets of a scenario
+# Each test_set_XXX directory of a scenario's dispatch/ directory has the results of dispatching the
+# investment plan against a different set of hours. This summarizes the capacity shortfalls,
+# emissions, and biomass & natural gas consumption across the test sets.
+# dispatch/summarize_results.py is the command line interface of this module.
+#
+# Each test set is scanned independently into a partial summary, and the partial summaries are
+# merged in order of test set directory. The partial summaries are saved in a manifest, keyed on the
+# files in each test set's results directory, so later runs only scan new or changed test sets.
+#   dispatch_tables = dispatch.summarize('scenario_1/dispatch', keep_tables=True)
+#
+# The summaries are sums over the test sets that have results. When dispatch/monitor_convergence.py
+# stops the sweep once its estimates converge, it writes convergence_stopped.txt, and the sums of the
+# test sets that were solved by then would understate the totals of the scenario. A test set is solved
+# once it has dispatch_sums files for every carbon cost. summarize() refuses to write the summaries of
+# a stopped sweep until every test set is solved, unless partial is set. With partial, only the solved
+# test sets are summarized, with solved_test_sets & test_sets columns that mark the summaries as
+# partial, and convergence_summary.txt has the estimates of the totals of all test sets.
+import os
+import re
+import csv
+import glob
+import cPickle
+import heapq
+import multiprocessing
+from switch_summary import tab_cache
+from switch_summary import tab_reader
+from switch_summary import compressed
+from switch_summary import tables
+
+# Partial summaries of each test set that was already scanned, keyed on the files in its results directory
+manifest_name = 'summary_manifest.pickle'
+manifest_version = 2
+
+# Written to the dispatch directory by monitor_convergence.py when it stops the sweep early
+stopped_name = 'convergence_stopped.txt'
+
+emissions_1990 = 284800000 # I'm too lazy to write code to pull this value from the depths of switch.mod
+
+
+class Inputs(object):
+  """The inputs of the dispatch summaries: the periods, the emission targets and the projected
+  consumption of biomass & natural gas."""
+
+  def __init__(self, dispatch_dir='.'):
+    self.periods = set()
+    self.emission_targets = {}                  # indexed by period
+    self.ng_consumption_projections = {}        # indexed by carbon cost & period
+    self.biomass_consumption_projections = {}   # indexed by carbon cost, period & load area
+    periods = self.periods
+    emission_targets = self.emission_targets
+
+    # Determine the number of years per period
+    f = open(os.path.join(dispatch_dir, "common_inputs/misc_params.dat"), 'rb')
+    dat = csv.reader(f, delimiter=' ', skipinitialspace=True)
+    for row in dat:
+      if row[1] == "num_years_per_period":
+        self.num_years_per_period = int(re.sub(r';', r'', row[3]))
+        break
+    f.close()
+
+    # Make a list of periods from one of the primary optimization's input files. Only the period column
+    # is needed, so this doesn't build a calendar, which needs whole years in each period.
+    for row in tab_cache.read_rows(os.path.join(dispatch_dir, "../inputs/study_hours.tab")):
+      periods.add(int(row['period']))
+
+    # Determine the emission goals from the carbon cap annual targets
+    for p in periods:
+      emission_targets[p] = 0
+    for row in tab_cache.read_rows(os.path.join(dispatch_dir, "common_inputs/carbon_cap_targets.tab")):
+      year = int(row['year'])
+      relative_goal = float(row['carbon_emissions_relative_to_base'])
+      for period in periods:
+        if year >= period and year < period + self.num_years_per_period:
+          emission_targets[period] += relative_goal*emissions_1990
+
+    # Determine the projected consumption levels for biomass
+    for biomass_projections_path in glob.glob(os.path.join(dispatch_dir, 'common_inputs/biomass_consumption_and_prices_by_period_*.tab')):
+      carbon_cost = re.sub(r'^.*/biomass_consumption_and_prices_by_period_(\d+).tab', r'\1', biomass_projections_path)
+      if carbon_cost not in self.biomass_consumption_projections:
+        self.biomass_consumption_projections[carbon_cost] = {}
+      for row in tab_cache.read_rows(biomass_projections_path):
+        period = int(row['period'])
+        load_area = row['load_area']
+        breakpoint_id = int(row['breakpoint_id'])
+        projected_consumption = float(row['breakpoint_mmbtu_per_year'])
+        if breakpoint_id != 1: continue
+        if period not in self.biomass_consumption_projections[carbon_cost]:
+          self.biomass_consumption_projections[carbon_cost][period] = {}
+        self.biomass_consumption_projections[carbon_cost][period][load_area] = projected_consumption
+
+    # Determine the projected consumption levels for natural gas
+    for ng_projections_path in glob.glob(os.path.join(dispatch_dir, 'common_inputs/ng_consumption_and_prices_by_period_*.tab')):
+      carbon_cost = re.sub(r'^.*/ng_consumption_and_prices_by_period_(\d+).tab', r'\1', ng_projections_path)
+      if carbon_cost not in self.ng_consumption_projections:
+        self.ng_consumption_projections[carbon_cost] = {}
+      for row in tab_cache.read_rows(ng_projections_path):
+        period = int(row['period'])
+        breakpoint_id = int(row['breakpoint_id'])
+        projected_consumption = float(row['ng_consumption_breakpoint'])
+        if breakpoint_id != 1: continue
+        self.ng_consumption_projections[carbon_cost][period] = projected_consumption
+
+
+def new_partial():
+  return {
+    'capacity_shortfalls': [], 'emissions': {},
+    'biomass_consumption': {}, 'biomass_consumption_indexes': [],
+    'ng_consumption': {}, 'ng_consumption_indexes': []
+  }
+
+
+# Retrieve data from a test_set_XXX/results/ directory into a partial summary.
+# The results files may be compressed; see switch_summary/compressed.py
+def scan_test_set(test_dir, periods):
+  test_set_id = os.path.basename(test_dir).replace('test_set_','')
+  partial = new_partial()
+  capacity_shortfalls = partial['capacity_shortfalls']
+  emissions = partial['emissions']
+  biomass_consumption = partial['biomass_consumption']
+  biomass_consumption_indexes = partial['biomass_consumption_indexes']
+  ng_consumption = partial['ng_consumption']
+  ng_consumption_indexes = partial['ng_consumption_indexes']
+
+  # Find infeasibilities & capacity shortfalls
+  shortfall_groups = []
+  for extra_peaker_path in sorted(glob.glob(test_dir + '/results/dispatch_extra_peakers_*')):
+    carbon_cost = re.sub(r'^.*/dispatch_extra_peakers_(\d+).txt', r'\1', compressed.base_name(extra_peaker_path))
+    load_infeasible_path = compressed.find(compressed.base_name(extra_peaker_path).replace('dispatch_extra_peakers','load_infeasibilities'))
+    balancing_infeasible_path = compressed.find(compressed.base_name(extra_peaker_path).replace('dispatch_extra_peakers','balancing_infeasibilities'))
+
+    # Make a unique list of infeasible timepoints referenced in the two infeasibility files
+    infeasible_timepoints = {}
+    for path in [load_infeasible_path, balancing_infeasible_path]:
+      if os.path.isfile(path):
+        for (hour, period) in tab_reader.read_records(path, [('hour', None), ('period', int)]):
+          infeasible_timepoints[hour] = period
+
+    # Summarize capacity shortfall by period
+    cap_shortfall_by_period = {}
+    if os.path.isfile(extra_peaker_path):
+      for (period, additional_capacity) in tab_reader.read_records(extra_peaker_path,
+          [('period', int), ('additional_capacity', float)]):
+        if period not in cap_shortfall_by_period:
+          cap_shortfall_by_period[period] = additional_capacity
+        else:
+          cap_shortfall_by_period[period] += additional_capacity
+
+    # Determine the cumulative capacity shortfalls from the incremental capacity additions that were needed.
+    # Walk the periods in order with a running total, starting from the earliest period with a shortfall.
+    cumulative_cap_shortfall = {}
+    if len(cap_shortfall_by_period) > 0:
+      running_shortfall = 0
+      for period in sorted(periods | set(cap_shortfall_by_period.keys())):
+        running_shortfall += cap_shortfall_by_period.get(period, 0)
+        if period in periods and period >= min(cap_shortfall_by_period.keys()):
+          cumulative_cap_shortfall[period] = running_shortfall
+
+    # Index the infeasible timepoints by period
+    infeasible_timepoints_by_period = {}
+    for tp in infeasible_timepoints:
+      infeasible_timepoints_by_period.setdefault(infeasible_timepoints[tp], []).append(tp)
+
+    # Cross the infeasible timepoints with the capacity shortfalls to produce the summary records.
+    # Every record of a period has the same shortfall, so the records are grouped by period and the
+    # groups are ordered by the magnitude of shortfall.
+    for period in cumulative_cap_shortfall:
+      shortfall_group = [
+        {"period": str(period), "timepoint": tp, "carbon_cost": carbon_cost,
+         "test_set_id": test_set_id,
+         "cap_shortfall_mw": cumulative_cap_shortfall[period]}
+        for tp in infeasible_timepoints_by_period.get(period, ["?"]) ]
+      shortfall_groups.append( (cumulative_cap_shortfall[period], shortfall_group) )
+  shortfall_groups.sort(key=lambda group: group[0], reverse=True)
+  for cap_shortfall_mw, shortfall_group in shortfall_groups:
+    capacity_shortfalls.extend(shortfall_group)
+
+  # Retrieve emissions for this test set
+  for dispatch_sums_path in sorted(glob.glob(test_dir + '/results/dispatch_sums_*')):
+    carbon_cost = re.sub(r'^.*/dispatch_sums_(\d+).txt', r'\1', compressed.base_name(dispatch_sums_path))
+    if carbon_cost not in emissions:
+      emissions[carbon_cost] = {}
+    columns = [('period', int), ('hours_in_sample', float), ('co2_tons', float), ('spinning_co2_tons', float),
+      ('deep_cycling_co2_tons', float), ('startup_co2_tons', float)]
+    for (period, hours_in_sample, co2_tons, spinning_co2_tons, deep_cycling_co2_tons, startup_co2_tons) in \
+        tab_reader.read_records(dispatch_sums_path, columns):
+      if period not in emissions[carbon_cost]:
+        emissions[carbon_cost][period] = {'co2_tons': 0, 'spinning_co2_tons': 0, 'deep_cycling_co2_tons': 0, 'startup_co2_tons': 0}
+      emissions[carbon_cost][period]['co2_tons'] += co2_tons*hours_in_sample
+      emissions[carbon_cost][period]['spinning_co2_tons'] += spinning_co2_tons*hours_in_sample
+      emissions[carbon_cost][period]['deep_cycling_co2_tons'] += deep_cycling_co2_tons*hours_in_sample
+      emissions[carbon_cost][period]['startup_co2_tons'] += startup_co2_tons*hours_in_sample
+
+  # Retrieve biomass consumption for this test set
+  for biomass_consumed_path in sorted(glob.glob(test_dir + '/results/biomass_consumed_*')):
+    carbon_cost = re.sub(r'^.*/biomass_consumed_(\d+).txt', r'\1', compressed.base_name(biomass_consumed_path))
+    if carbon_cost not in biomass_consumption:
+      biomass_consumption[carbon_cost] = {}
+    for (period, load_area, consumption) in tab_reader.read_records(biomass_consumed_path,
+        [('period', int), ('load_area', None), ('biosolid_consumed_mmbtu', float)]):
+      if period not in biomass_consumption[carbon_cost]:
+        biomass_consumption[carbon_cost][period] = {}
+      if load_area not in biomass_consumption[carbon_cost][period]:
+        biomass_consumption[carbon_cost][period][load_area] = consumption
+        biomass_consumption_indexes.append( [ carbon_cost, period, load_area ] )
+      else:
+        biomass_consumption[carbon_cost][period][load_area] += consumption
+
+  # Retrieve natural gas consumption for this test set
+  for ng_consumed_path in sorted(glob.glob(test_dir + '/results/ng_consumed_*')):
+    carbon_cost = re.sub(r'^.*/ng_consumed_(\d+).txt', r'\1', compressed.base_name(ng_consumed_path))
+    if carbon_cost not in ng_consumption:
+      ng_consumption[carbon_cost] = {}
+    for (period, consumption) in tab_reader.read_records(ng_consumed_path, [('period', int), ('ng_consumed_mmbtu', float)]):
+      if period not in ng_consumption[carbon_cost]:
+        ng_consumption[carbon_cost][period] = consumption
+        ng_consumption_indexes.append( [ carbon_cost, period ] )
+      else:
+        ng_consumption[carbon_cost][period] += consumption
+  return partial
+
+def _scan_test_set(arguments):
+  return scan_test_set(*arguments)
+
+def merge_test_set(totals, partial):
+  """Add the partial summary of one test set to the summaries of all test sets. capacity_shortfalls
+  of totals is a list of the records of each test set."""
+  capacity_shortfalls = totals['capacity_shortfalls']
+  emissions = totals['emissions']
+  biomass_consumption = totals['biomass_consumption']
+  biomass_consumption_indexes = totals['biomass_consumption_indexes']
+  ng_consumption = totals['ng_consumption']
+  ng_consumption_indexes = totals['ng_consumption_indexes']
+  capacity_shortfalls.append(partial['capacity_shortfalls'])
+  for carbon_cost in partial['emissions']:
+    if carbon_cost not in emissions:
+      emissions[carbon_cost] = {}
+    for period in partial['emissions'][carbon_cost]:
+      if period not in emissions[carbon_cost]:
+        emissions[carbon_cost][period] = {'co2_tons': 0, 'spinning_co2_tons': 0, 'deep_cycling_co2_tons': 0, 'startup_co2_tons': 0}
+      for emission_type in emissions[carbon_cost][period]:
+        emissions[carbon_cost][period][emission_type] += partial['emissions'][carbon_cost][period][emission_type]
+  for carbon_cost in partial['biomass_consumption']:
+    if carbon_cost not in biomass_consumption:
+      biomass_consumption[carbon_cost] = {}
+  for carbon_cost, period, load_area in partial['biomass_consumption_indexes']:
+    consumption = partial['biomass_consumption'][carbon_cost][period][load_area]
+    if period not in biomass_consumption[carbon_cost]:
+      biomass_consumption[carbon_cost][period] = {}
+    if load_area not in biomass_consumption[carbon_cost][period]:
+      biomass_consumption[carbon_cost][period][load_area] = consumption
+      biomass_consumption_indexes.append( [ carbon_cost, period, load_area ] )
+    else:
+      biomass_consumption[carbon_cost][period][load_area] += consumption
+  for carbon_cost in partial['ng_consumption']:
+    if carbon_cost not in ng_consumption:
+      ng_consumption[carbon_cost] = {}
+  for carbon_cost, period in partial['ng_consumption_indexes']:
+    consumption = partial['ng_consumption'][carbon_cost][period]
+    if period not in ng_consumption[carbon_cost]:
+      ng_consumption[carbon_cost][period] = consumption
+      ng_consumption_indexes.append( [ carbon_cost, period ] )
+    else:
+      ng_consumption[carbon_cost][period] += consumption
+
+def summary_carbon_costs(inputs, partials):
+  """The carbon costs that a solved test set has results for: those with consumption projections, or
+  else those in the results of any test set"""
+  carbon_costs = set(inputs.ng_consumption_projections) | set(inputs.biomass_consumption_projections)
+  if not carbon_costs:
+    carbon_costs = set( carbon_cost for (test_dir, partial) in partials for carbon_cost in partial['emissions'] )
+  return sorted(carbon_costs)
+
+
+def solved(partial, carbon_costs):
+  """Whether the partial summary of a test set has the dispatch sums of every carbon cost"""
+  return bool(partial['emissions']) and set(partial['emissions']) >= set(carbon_costs)
+
+
+def test_set_signature(test_dir):
+  """The name, size & modification time of each results file of a test set. A test set whose
+  signature matches the manifest doesn't need to be scanned again."""
+  results_dir = os.path.join(test_dir, 'results')
+  if not os.path.isdir(results_dir): return ()
+  signature = []
+  for name in sorted(os.listdir(results_dir)):
+    stat = os.stat(os.path.join(results_dir, name))
+    signature.append( (name, stat.st_size, stat.st_mtime) )
+  return tuple(signature)
+
+
+def scan_test_sets(dispatch_dir, periods, workers=None, rescan=False):
+  """Scan the test sets of a dispatch directory that aren't in its manifest, and merge the partial
+  summaries of every test set. Returns the totals."""
+  totals = new_partial()
+  for (test_dir, partial) in scan_partials(dispatch_dir, periods, workers, rescan):
+    merge_test_set(totals, partial)
+  return totals
+
+
+def scan_partials(dispatch_dir, periods, workers=None, rescan=False):
+  """Scan the test sets of a dispatch directory that aren't in its manifest. Returns a list of the
+  (test set directory name, partial summary) of every test set, in order of directory."""
+  # Load the partial summaries of test sets that were scanned by earlier runs. The manifest is only
+  # valid for the same format and set of periods, since capacity shortfalls are propagated to subsequent periods.
+  manifest_path = os.path.join(dispatch_dir, manifest_name)
+  manifest = {}
+  if os.path.isfile(manifest_path) and not rescan:
+    f = open(manifest_path, 'rb')
+    try:
+      manifest = cPickle.load(f)
+    except (EOFError, cPickle.UnpicklingError):
+      print "Warning: could not read " + manifest_path + ". All test sets will be scanned."
+    f.close()
+    if manifest.get('version') != manifest_version or manifest.get('periods') != periods: manifest = {}
+  test_set_manifest = manifest.get('test_sets', {})
+
+  test_dirs = sorted( os.path.basename(path) for path in
+    filter(os.path.isdir, glob.glob(os.path.join(dispatch_dir, 'test_set_*'))) )
+  signatures = dict( (test_dir, test_set_signature(os.path.join(dispatch_dir, test_dir))) for test_dir in test_dirs )
+  new_test_dirs = [ test_dir for test_dir in test_dirs
+    if test_dir not in test_set_manifest or test_set_manifest[test_dir]['signature'] != signatures[test_dir] ]
+  print "Scanning %d of %d test sets." % (len(new_test_dirs), len(test_dirs))
+  if len(new_test_dirs) > 0:
+    scan_arguments = [ (os.path.join(dispatch_dir, test_dir), periods) for test_dir in new_test_dirs ]
+    if workers == 1:
+      partials = map(_scan_test_set, scan_arguments)
+    else:
+      pool = multiprocessing.Pool(processes=workers)
+      partials = pool.map(_scan_test_set, scan_arguments, chunksize=1)
+      pool.close()
+      pool.join()
+    for test_dir, partial in zip(new_test_dirs, partials):
+      test_set_manifest[test_dir] = { 'signature': signatures[test_dir], 'partial': partial }
+
+  # Save the manifest for the next run, dropping test sets that no longer exist
+  f = open(manifest_path + '.tmp', 'wb')
+  cPickle.dump({ 'version': manifest_version, 'periods': periods, 'test_sets': dict( (test_dir, test_set_manifest[test_dir]) for test_dir in test_dirs ) },
+    f, cPickle.HIGHEST_PROTOCOL)
+  f.close()
+  os.rename(manifest_path + '.tmp', manifest_path)
+  return [ (test_dir, test_set_manifest[test_dir]['partial']) for test_dir in test_dirs ]
+
+
+# Merge the capacity shortfall records of each test set by the magnitude of shortfall. Ties are
+# broken by the order of test sets and then the order within a test set, like a stable sort.
+def ordered_shortfalls(test_set_index, records):
+  for i, record in enumerate(records):
+    yield (-record["cap_shortfall_mw"], test_set_index, i, record)
+
+
+def write_summaries(dispatch_dir, scenario_id, inputs, totals, compression=None, keep_tables=False, coverage=None):
+  """Write the summary output files, all as tab delimited text files. With coverage, the (solved, total)
+  number of test sets of partial summaries, each summary has solved_test_sets & test_sets columns.
+  Returns a dict of name: Table if keep_tables is set."""
+  num_years_per_period = inputs.num_years_per_period
+  emission_targets = inputs.emission_targets
+  biomass_consumption_projections = inputs.biomass_consumption_projections
+  ng_consumption_projections = inputs.ng_consumption_projections
+  emissions = totals['emissions']
+  biomass_consumption = totals['biomass_consumption']
+  biomass_consumption_indexes = totals['biomass_consumption_indexes']
+  ng_consumption = totals['ng_consumption']
+  ng_consumption_indexes = totals['ng_consumption_indexes']
+  capacity_shortfalls = totals['capacity_shortfalls']
+  outputs = []
+  coverage_values = list(coverage) if coverage is not None else []
+  def open_summary(name, header):
+    if coverage is not None: header = header + ['solved_test_sets', 'test_sets']
+    outputs.append(tables.SummaryFile(os.path.join(dispatch_dir, name + '.txt'), name, header,
+      compression=compression, keep=keep_tables))
+    return outputs[-1]
+
+  # Summarize biomass consumption levels
+  # sort records by amount of overconsumption
+  biomass_consumption_indexes.sort(reverse=True,
+    key=lambda x:
+      biomass_consumption[x[0]][x[1]][x[2]] - biomass_consumption_projections[x[0]][x[1]][x[2]])
+  summary_output = open_summary("biomass_consumption_summary", [
+      "scenario_id", "carbon_cost", "period",
+      "load_area", "consumption", "projected_consumption", "percent_over"
+    ])
+  for carbon_cost, period, load_area in biomass_consumption_indexes:
+    summary_output.write( [
+      scenario_id, carbon_cost, period, load_area,
+      biomass_consumption[carbon_cost][period][load_area],
+      biomass_consumption_projections[carbon_cost][period][load_area],
+      (biomass_consumption[carbon_cost][period][load_area] - biomass_consumption_projections[carbon_cost][period][load_area]) / biomass_consumption_projections[carbon_cost][period][load_area]
+    ] + coverage_values)
+  summary_output.close()
+
+
+  # Summarize natural gas consumption levels
+  # sort records by amount of overconsumption
+  ng_consumption_indexes.sort(reverse=True,
+    key=lambda x:
+      ng_consumption[x[0]][x[1]] - ng_consumption_projections[x[0]][x[1]])
+  summary_output = open_summary("ng_consumption_summary", [
+      "scenario_id", "carbon_cost", "period",
+      "consumption", "projected_consumption", "percent_over"
+    ])
+  for carbon_cost, period in ng_consumption_indexes:
+    summary_output.write( [
+      scenario_id, carbon_cost, period,
+      ng_consumption[carbon_cost][period],
+      ng_consumption_projections[carbon_cost][period],
+      (ng_consumption[carbon_cost][period] - ng_consumption_projections[carbon_cost][period]) / ng_consumption_projections[carbon_cost][period]
+    ] + coverage_values)
+  summary_output.close()
+
+
+  # Summarize emission levels
+  summary_output = open_summary("emissions_summary", [
+      "scenario_id", "carbon_cost", "period",
+      "co2_tons", "spinning_co2_tons", "deep_cycling_co2_tons", "startup_co2_tons", "total_co2_tons", "target_co2_tons", "fraction_over_target", "emissions_frac_of_1990", "target_frac_of_1990"
+    ])
+  for carbon_cost in emissions:
+    for period in emissions[carbon_cost]:
+      emissions[carbon_cost][period]['total'] = \
+        emissions[carbon_cost][period]['co2_tons'] + \
+        emissions[carbon_cost][period]['spinning_co2_tons'] + \
+        emissions[carbon_cost][period]['deep_cycling_co2_tons'] + \
+        emissions[carbon_cost][period]['startup_co2_tons']
+      summary_output.write( [
+        scenario_id, carbon_cost, period,
+        emissions[carbon_cost][period]['co2_tons'],
+        emissions[carbon_cost][period]['spinning_co2_tons'],
+        emissions[carbon_cost][period]['deep_cycling_co2_tons'],
+        emissions[carbon_cost][period]['startup_co2_tons'],
+        emissions[carbon_cost][period]['total'],
+        emission_targets[period],
+        (emissions[carbon_cost][period]['total'] - emission_targets[period]) / emission_targets[period],
+        emissions[carbon_cost][period]['total']/num_years_per_period/emissions_1990,
+        emission_targets[period]/num_years_per_period/emissions_1990
+      ] + coverage_values)
+  summary_output.close()
+
+
+  # Write out the capacity shortfalls
+  summary_output = open_summary("cap_shortfall_summary", [
+      "scenario_id", "carbon_cost", "test_set_id",
+      "timepoint", "period", "capacity_shortfall_mw" ])
+  for (negative_mw, test_set_index, i, record) in heapq.merge(
+      *[ ordered_shortfalls(test_set_index, records) for (test_set_index, records) in enumerate(capacity_shortfalls) ]):
+    summary_output.write( [
+        scenario_id, record["carbon_cost"], record["test_set_id"],
+        record["timepoint"], record["period"], record["cap_shortfall_mw"] ] + coverage_values)
+  summary_output.close()
+
+  if keep_tables:
+    return dict( (output.table.name, output.table) for output in outputs )
+
+
+def summarize(dispatch_dir='.', workers=None, rescan=False, compression=None, keep_tables=False, partial=False):
+  """Summarize the test sets of a scenario's dispatch directory. The scenario_id is read from
+  scenario_id.txt in the dispatch directory. If some test sets aren't solved, the solved test sets
+  are summarized as partial summaries if partial is set, and RuntimeError is raised if the sweep was
+  stopped by monitor_convergence.py. Returns a dict of name: Table if keep_tables is set."""
+  scenario_id = str(int(open(os.path.join(dispatch_dir, "scenario_id.txt")).read()))
+  inputs = Inputs(dispatch_dir)
+  partials = scan_partials(dispatch_dir, inputs.periods, workers, rescan)
+  carbon_costs = summary_carbon_costs(inputs, partials)
+  solved_partials = [ test_set_partial for (test_dir, test_set_partial) in partials if solved(test_set_partial, carbon_costs) ]
+  coverage = None
+  if len(solved_partials) < len(partials) and (partial or os.path.isfile(os.path.join(dispatch_dir, stopped_name))):
+    if not partial:
+      raise RuntimeError("monitor_convergence.py stopped the sweep with %d of %d test sets solved, so their sums would understate the dispatch summaries. "
+        "Set partial (--partial) to summarize the solved test sets, marked with solved_test_sets & test_sets columns; "
+        "convergence_summary.txt has the estimates of all test sets." % (len(solved_partials), len(partials)))
+    coverage = (len(solved_partials), len(partials))
+    partials = [ (None, test_set_partial) for test_set_partial in solved_partials ]
+  totals = new_partial()
+  for (test_dir, test_set_partial) in partials:
+    merge_test_set(totals, test_set_partial)
+  return write_summaries(dispatch_dir, scenario_id, inputs, totals, compression, keep_tables, coverage)
@@ -0,0 +1,105 @@
+# Integer-coded, array-backed tables for the hourly state of summarize_results.py
+# The hourly state used to be nested dicts with a dict record per (key, timepoint), indexed by tuples
+# of names such as (timepoint, tech_group, project_id). Python's per-object overhead made those far
+# larger than the floats they held. Here names are mapped to dense integer codes and the values live
+# in flat arrays of doubles, with one row per key and one column per timepoint. Names are only
+# decoded when the summaries are written.
+#
+# Each cell also has a state byte: absent (no record), set from a results file, or filled with a 0
+# for a timepoint that was missing from the results. Filled cells are reported as an integer 0,
+# which is how the summaries have always printed them.
+import array
+
+absent, present, filled = 0, 1, 2
+
+
+class Codes(object):
+  """Dense integer codes for names, numbered in order of first appearance."""
+  __slots__ = ('codes', 'names')
+
+  def __init__(self, names=()):
+    self.codes = {}
+    self.names = []
+    for name in names: self.code(name)
+
+  def code(self, name):
+    """The code of a name, adding the name if it is new."""
+    code = self.codes.get(name)
+    if code is None:
+      code = self.codes[name] = len(self.names)
+      self.names.append(name)
+    return code
+
+  def __len__(self):
+    return len(self.names)
+
+  def __contains__(self, name):
+    return name in self.codes
+
+  def __getitem__(self, name):
+    return self.codes[name]
+
+
+class Grid(object):
+  """A table of doubles indexed by (row, column) codes. Rows are named and added as they appear,
+  and the columns are fixed, e.g. the timepoints of the study. Each field is a flat array with
+  num_columns values per row, so it can be viewed as a matrix without copying."""
+  __slots__ = ('rows', 'num_columns', 'fields', 'state', '_zero_row', '_zero_state')
+
+  def __init__(self, num_columns, field_names):
+    self.num_columns = num_columns
+    self._zero_row = array.array('d', [0.0]) * num_columns
+    self._zero_state = bytearray(num_columns)
+    self.rows = Codes()
+    self.fields = dict( (name, array.array('d')) for name in field_names )
+    self.state = bytearray()
+
+  def row(self, name):
+    """The code of a row, adding a row of absent cells if the name is new."""
+    code = self.rows.codes.get(name)
+    if code is None:
+      code = self.rows.code(name)
+      for values in self.fields.values(): values.extend(self._zero_row)
+      self.state.extend(self._zero_state)
+    return code
+
+  def cell(self, row, column):
+    """Index of a cell in the flat arrays."""
+    return row * self.num_columns + column
+
+  def add(self, row, column, field, value):
+    """Add a value to a cell, marking it present."""
+    i = row * self.num_columns + column
+    self.fields[field][i] += value
+    if self.state[i] == absent: self.state[i] = present
+
+  def fill(self, row, columns):
+    """Fill the absent cells among these columns of a row with 0."""
+    offset = row * self.num_columns
+    for column in columns:
+      if self.state[offset + column] == absent: self.state[offset + column] = filled
+
+  def columns(self, row):
+    """Codes of the columns of a row that have a value, in column order."""
+    offset = row * self.num_columns
+    state = self.state
+    return [ column for column in xrange(self.num_columns) if state[offset + column] != absent ]
+
+  def value(self, row, column, field):
+    """The value of a cell as the summaries report it: an integer 0 for filled cells."""
+    i = row * self.num_columns + column
+    if self.state[i] == filled: return 0
+    return self.fields[field][i]
+
+  def copy(self):
+    """A copy of the table whose values can be changed without changing this one."""
+    grid = Grid(self.num_columns, self.fields.keys())
+    grid.rows = Codes(self.rows.names)
+    for name in self.fields: grid.fields[name] = array.array('d', self.fields[name])
+    grid.state = bytearray(self.state)
+    return grid
+
+  def clear(self):
+    self.rows = Codes()
+    for name in self.fields: self.fields[name] = array.array('d')
+    self.state = bytearray()
@@ -0,0 +1,134 @@
+# Partitioned Parquet output for summarize_results.py
+# The text summaries are written a row at a time as strings, and loading them into MySQL or pandas
+# parses all of that text again. With --parquet_dir, the generator, transmission & ramp summaries and
+# the hourly summaries are instead written as Parquet files with typed columns, one file per
+# scenario_id, carbon_cost & period in hive-style partition directories:
+#   <parquet_dir>/gen_hourly_summary/scenario_id=42/carbon_cost=0/period=2020/part-0.parquet
+# so an analysis across scenarios can read only the partitions and columns it needs, e.g. with
+# pyarrow.parquet.ParquetDataset or pandas.read_parquet. The partition values are in the directory
+# names rather than the files. Tech groups are dictionary-encoded.
+#
+# The hourly columns are gathered straight from the arrays of the encoding.Grid tables with numpy.
+# As in the text summaries, filled cells (timepoints missing from the results) are reported as 0.
+# This requires pyarrow, which in turn requires numpy.
+import os
+import numpy
+import pyarrow
+import pyarrow.parquet
+from switch_summary import encoding
+
+# The summaries that are written as Parquet instead of text
+tables = ['gen_summary', 'gen_hourly_summary', 'trans_summary', 'ramp_summary', 'net_load_hourly_summary']
+
+part_name = 'part-0.parquet'
+
+
+def partition_path(output_dir, table, scenario_id, carbon_cost, period):
+  return os.path.join(output_dir, table, 'scenario_id=%s' % scenario_id, 'carbon_cost=%s' % carbon_cost,
+    'period=%s' % period, part_name)
+
+
+def write_table(path, columns):
+  """Write a list of (name, values) columns to a Parquet file. values are pyarrow arrays, numpy arrays
+  or lists of floats, where None becomes null. The file is written under a temporary name first."""
+  arrays = [ values if isinstance(values, pyarrow.Array) else
+    pyarrow.array(values, type=pyarrow.float64()) if isinstance(values, list) else pyarrow.array(values)
+    for (name, values) in columns ]
+  table = pyarrow.Table.from_arrays(arrays, [ name for (name, values) in columns ])
+  if not os.path.isdir(os.path.dirname(path)): os.makedirs(os.path.dirname(path))
+  pyarrow.parquet.write_table(table, path + '.tmp')
+  os.rename(path + '.tmp', path)
+
+
+def dictionary(names, codes):
+  """A dictionary-encoded string column of names[code] for each code."""
+  return pyarrow.DictionaryArray.from_arrays(
+    pyarrow.array(numpy.asarray(codes, dtype=numpy.int32)), pyarrow.array(list(names), type=pyarrow.string()))
+
+
+def grid_cells(grid, rows, fields):
+  """The cells of these rows of an encoding.Grid that have a value, in row and then column order.
+  Returns the index of each cell's row in rows, its column, and a dict of field: values."""
+  state = numpy.frombuffer(grid.state, dtype=numpy.uint8).reshape(-1, grid.num_columns)[rows]
+  row_idx, columns = numpy.nonzero(state != encoding.absent)
+  cells = numpy.asarray(rows, dtype=numpy.int64)[row_idx] * grid.num_columns + columns
+  filled = state[row_idx, columns] == encoding.filled
+  values = {}
+  for field in fields:
+    values[field] = numpy.frombuffer(grid.fields[field], dtype=float)[cells]
+    values[field][filled] = 0
+  return row_idx, columns, values
+
+
+def row_values(grid, row, columns, field):
+  """Values of a field in these columns of a grid row, with 0 for absent & filled cells."""
+  cells = row * grid.num_columns + numpy.asarray(columns, dtype=numpy.int64)
+  values = numpy.frombuffer(grid.fields[field], dtype=float)[cells]
+  values[numpy.frombuffer(grid.state, dtype=numpy.uint8)[cells] != encoding.present] = 0
+  return values
+
+
+def timepoint_columns(calendar):
+  """Arrays of the timepoint, hours_per_year, weight, month_of_year & hour_of_day of each column of a
+  calendar_index.Calendar."""
+  return dict( (key, calendar.field(key)) for key in ['timepoint', 'hours_per_year', 'weight', 'month_of_year', 'hour_of_day'] )
+
+
+def write_gen_summary(path, period, gen_dat, columns, percentiles):
+  keys = sorted( key for key in gen_dat if key[0] == period )
+  write_table(path,
+    [ ('technology', dictionary([ tech_group for (p, tech_group) in keys ], range(len(keys)))) ] +
+    [ (c, [ gen_dat[key][c] for key in keys ]) for c in columns ] +
+    [ ('percentile_' + str(p), [ gen_dat[key]['power_percentiles'][p] for key in keys ]) for p in percentiles ])
+
+
+def write_trans_summary(path, period, trans_dat, columns, percentiles):
+  write_table(path,
+    [ (c, [ trans_dat[period][c] ]) for c in columns ] +
+    [ ('percentile_' + str(p), [ trans_dat[period]['energy_received_percentiles'][p] ]) for p in percentiles ])
+
+
+def write_ramp_summary(path, period, gen_dat, trans_dat, system_dat, flexible_tech):
+  sources = sorted( tech_group for (p, tech_group) in gen_dat if p == period and tech_group in flexible_tech )
+  ramps = [ gen_dat[(period, tech_group)] for tech_group in sources ]
+  if period in trans_dat:
+    sources.append('Net_Tx')
+    ramps.append(trans_dat[period])
+  write_table(path, [
+    ('source', dictionary(sources, range(len(sources)))),
+    ('total_hourly_up_ramp', [ r['total_hourly_up_ramp'] for r in ramps ]),
+    ('total_hourly_down_ramp', [ r['total_hourly_down_ramp'] for r in ramps ]),
+    ('up_ramp_%', [ r['total_hourly_up_ramp'] / system_dat[period]['total_hourly_up_ramp'] for r in ramps ]),
+    ('down_ramp_%', [ r['total_hourly_down_ramp'] / system_dat[period]['total_hourly_down_ramp'] for r in ramps ]),
+  ])
+
+
+def write_gen_hourly_summary(path, period, hourly_output, by_column):
+  keys = sorted( key for key in hourly_output.rows.names if key[0] == period )
+  row_idx, columns, values = grid_cells(hourly_output, [ hourly_output.rows[key] for key in keys ],
+    ['power', 'percentile_rank'])
+  write_table(path, [
+    ('technology', dictionary([ tech_group for (p, tech_group) in keys ], row_idx)),
+    ('timepoint', by_column['timepoint'][columns]),
+    ('power', values['power']),
+    ('hours_per_year', by_column['hours_per_year'][columns]),
+    ('weight', by_column['weight'][columns]),
+    ('percentile_rank', values['percentile_rank']),
+  ])
+
+
+def write_net_load_hourly_summary(path, period, hourly_net_load, hourly_output, intermittent_tech, by_column):
+  row_idx, columns, values = grid_cells(hourly_net_load, [ hourly_net_load.rows[period] ],
+    ['load', 'net_load', 'percentile_rank'])
+  intermittent_columns = []
+  for tech_group in sorted(intermittent_tech):
+    if (period, tech_group) in hourly_output.rows:
+      output = row_values(hourly_output, hourly_output.rows[(period, tech_group)], columns, 'power')
+    else:
+      output = numpy.zeros(len(columns))
+    intermittent_columns.append( (tech_group, output) )
+  write_table(path,
+    [ ('timepoint', by_column['timepoint'][columns]) ] +
+    [ (c, values[c]) for c in ['load', 'net_load', 'percentile_rank'] ] +
+    intermittent_columns +
+    [ (c, by_column[c][columns]) for c in ['weight', 'month_of_year', 'hour_of_day'] ])
@@ -0,0 +1,139 @@
+# Weighted percentiles & percentile ranks for summarize_results.py
+# Each timepoint has a weight (its share of hours in the period), so percentiles are taken from the
+# cumulative weight rather than from counts. Values are ordered from small to large, with ties kept in
+# the order they were given, and the rank of a value is the cumulative weight of the values before
+# it. The value at percentile p is the first value whose cumulative weight (including itself) reaches
+# p/100 of the group's total weight. Cumulative weights that fall a hair short of a percentile because
+# of rounding error are treated as reaching it, and if the largest percentile is still not reached,
+# the largest value is used.
+#
+# The kernels return positions in the input sequences rather than values so callers can report their
+# original records. All groups are sorted together with one numpy.lexsort when numpy is available, and
+# when ranks aren't needed the percentiles are found with a weighted quickselect instead of a sort.
+# Without numpy, the same results are computed with python's sort.
+import itertools
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+default_percentiles = (0, 2, 25, 50, 75, 98, 100)
+
+# Cumulative weights within this amount of a percentile are considered to have reached it.
+tolerance = 1e-9
+
+# Groups at or below this size are sorted instead of being partitioned further by quickselect.
+select_sort_size = 64
+
+
+def parse_percentiles(text):
+  """Parse a comma separated list of percentiles such as "0,2,25,50,75,98,100" from the command line."""
+  percentiles = []
+  for item in text.split(','):
+    p = float(item)
+    if p < 0 or p > 100:
+      raise ValueError("Percentiles need to be between 0 and 100, not " + item)
+    if p == int(p): p = int(p)
+    percentiles.append(p)
+  return tuple(sorted(set(percentiles)))
+
+
+def weighted_percentiles(groups, percentiles=default_percentiles, ranks=True):
+  """groups is a list of (values, weights) pairs of equal-length sequences. Returns a list with a
+  (ranks, cut_points) pair for each group. ranks[i] is the percentile rank of values[i] (None when
+  ranks=False) and cut_points[p] is the position of the value at percentile p."""
+  if numpy is None:
+    return [ _sort_kernel(values, weights, percentiles, ranks) for (values, weights) in groups ]
+  if not ranks:
+    return [ _select_kernel(values, weights, percentiles) for (values, weights) in groups ]
+  sizes = [ len(values) for (values, weights) in groups ]
+  offsets = [0]
+  for size in sizes: offsets.append(offsets[-1] + size)
+  all_values = numpy.fromiter(itertools.chain.from_iterable(v for (v, w) in groups), float, offsets[-1])
+  all_weights = numpy.fromiter(itertools.chain.from_iterable(w for (v, w) in groups), float, offsets[-1])
+  group_ids = numpy.repeat(numpy.arange(len(groups)), sizes)
+  # One stable sort for every group: by group, then by value, keeping ties in input order
+  order = numpy.lexsort((all_values, group_ids))
+  sorted_weights = all_weights[order]
+  fractions = numpy.array([ p / 100.0 - tolerance for p in percentiles ])
+  results = []
+  for g in range(len(groups)):
+    start, end = offsets[g], offsets[g+1]
+    if start == end:
+      results.append(([], {}))
+      continue
+    positions = order[start:end] - start
+    cumulative = numpy.add.accumulate(sorted_weights[start:end])
+    rank_list = [None] * (end - start)
+    for (position, rank) in zip(positions.tolist(), [0] + cumulative[:-1].tolist()):
+      rank_list[position] = rank
+    found = numpy.minimum(numpy.searchsorted(cumulative, fractions * cumulative[-1]), end - start - 1)
+    cut_points = dict(zip(percentiles, positions[found].tolist()))
+    results.append((rank_list, cut_points))
+  return results
+
+
+def _sort_kernel(values, weights, percentiles, ranks):
+  """Pure python version of weighted_percentiles for one group."""
+  if len(values) == 0: return ([], {})
+  rank_list = [None] * len(values)
+  cut_points = {}
+  total = sum(weights)
+  targets = iter(percentiles)
+  p = next(targets, None)
+  cumulative = 0
+  for i in sorted(range(len(values)), key=lambda i: values[i]):
+    rank_list[i] = cumulative
+    cumulative += weights[i]
+    while p is not None and cumulative >= (p / 100.0 - tolerance) * total:
+      cut_points[p] = i
+      p = next(targets, None)
+  # The largest percentiles may not be reached due to rounding error. Use the largest value in that event.
+  while p is not None:
+    cut_points[p] = i
+    p = next(targets, None)
+  return (rank_list if ranks else None, cut_points)
+
+
+def _select_kernel(values, weights, percentiles):
+  """Find the cut points of one group with a weighted quickselect, without sorting the whole group."""
+  if len(values) == 0: return (None, {})
+  values = numpy.asarray(values, dtype=float)
+  weights = numpy.asarray(weights, dtype=float)
+  # The last of the largest values, which is the last value in sorted order
+  largest = len(values) - 1 - int(numpy.argmax(values[::-1]))
+  total = weights.sum()
+  cut_points = {}
+  for p in percentiles:
+    position = _weighted_select(values, weights, (p / 100.0 - tolerance) * total)
+    cut_points[p] = largest if position is None else position
+  return (None, cut_points)
+
+
+def _weighted_select(values, weights, threshold):
+  """Position of the first value in sorted order whose cumulative weight reaches the threshold, or None."""
+  positions = numpy.arange(len(values))
+  below = 0.0 # Weight of the values that were partitioned away for being smaller
+  while len(values) > 0:
+    if len(values) <= select_sort_size:
+      order = numpy.argsort(values, kind='mergesort')
+      cumulative = below + numpy.add.accumulate(weights[order])
+      found = numpy.searchsorted(cumulative, threshold)
+      return int(positions[order[found]]) if found < len(order) else None
+    pivot = numpy.median(values[[0, len(values) // 2, -1]])
+    less = values < pivot
+    less_weight = weights[less].sum()
+    if below + less_weight >= threshold and less.any():
+      values, weights, positions = values[less], weights[less], positions[less]
+      continue
+    # Ties with the pivot are in input order, which is their sorted order
+    equal = values == pivot
+    cumulative = below + less_weight + numpy.add.accumulate(weights[equal])
+    found = numpy.searchsorted(cumulative, threshold)
+    if found < len(cumulative):
+      return int(positions[equal][found])
+    below = cumulative[-1]
+    greater = values > pivot
+    values, weights, positions = values[greater], weights[greater], positions[greater]
+  return None
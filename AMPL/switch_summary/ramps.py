@@ -0,0 +1,94 @@
+# Hourly ramping totals for summarize_results.py
+# Net power is given for each (source, unit) and timepoint, where a source is a tech_group or 'Net_Tx' and
+# a unit is a project_id or a load area. The ramp of a unit in a timepoint is its change in net power
+# from the prior timepoint, which wraps around to the last timepoint of the same date per our treatment
+# in AMPL. Missing records are assumed to have 0 values, which reduces file sizes significantly.
+# Positive ramps are summed as up ramps and other ramps as down ramps. If the record of the next
+# timepoint is missing, the unit down-ramped from its current value to 0.
+#
+# Net power is kept in an encoding.Grid with a row per unit and a column per timepoint, ordered by date
+# & hour. The prior & next timepoints are the column offsets of switch_summary/calendar_index.py. With
+# numpy, the grid is viewed as a dense unit x timepoint matrix, and the prior & next timepoint of every
+# cell are found at once by indexing its columns.
+from switch_summary import encoding
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+
+def ramp_totals(net_power, calendar):
+  """Sum the ramps of each (period, source). net_power is an encoding.Grid with a 'net_power' field,
+  whose rows are (source, unit) and whose columns are the columns of calendar, a
+  calendar_index.Calendar that gives the period, prior and next column of each column. Returns a dict of
+  (period, source): {'total_hourly_up_ramp': MW, 'total_hourly_down_ramp': MW}, where a total is only
+  included if at least one ramp was added to it."""
+  if numpy is None:
+    return _python_ramp_totals(net_power, calendar)
+  num_units = len(net_power.rows)
+  if num_units == 0: return {}
+  num_columns = net_power.num_columns
+  prior_column = calendar.field('prior')
+  next_column = calendar.field('next')
+  period_of_column = calendar.field('period')
+
+  # Units are summed in sorted (source, unit) order, then by timepoint
+  unit_order = sorted(range(num_units), key=net_power.rows.names.__getitem__)
+  values = numpy.frombuffer(net_power.fields['net_power'], dtype=float).reshape(num_units, num_columns)[unit_order]
+  found = (numpy.frombuffer(net_power.state, dtype=numpy.uint8).reshape(num_units, num_columns) != encoding.absent)[unit_order]
+  sources = [ net_power.rows.names[u][0] for u in unit_order ]
+  source_list, source_of_unit = numpy.unique(numpy.array(sources), return_inverse=True)
+
+  # Ramps of the cells with records. Cells without records have 0 values.
+  unit_idx, columns = numpy.nonzero(found)
+  cell_values = values[unit_idx, columns]
+  ramp = cell_values - values[unit_idx, prior_column[columns]]
+  next_found = found[unit_idx, next_column[columns]]
+  is_up = ramp > 0
+
+  # Sum the ramps of each (period, source)
+  periods, period_idx = numpy.unique(period_of_column[columns], return_inverse=True)
+  group_idx = period_idx * len(source_list) + source_of_unit[unit_idx]
+  num_groups = len(periods) * len(source_list)
+  up_sums = numpy.bincount(group_idx[is_up], weights=ramp[is_up], minlength=num_groups)
+  up_counts = numpy.bincount(group_idx[is_up], minlength=num_groups)
+  # Down ramps, plus ramps down to 0 when the next record is missing
+  to_zero = ~next_found
+  down_idx = numpy.concatenate((group_idx[~is_up], group_idx[to_zero]))
+  down_values = numpy.concatenate((-1 * ramp[~is_up], cell_values[to_zero]))
+  down_sums = numpy.bincount(down_idx, weights=down_values, minlength=num_groups)
+  down_counts = numpy.bincount(down_idx, minlength=num_groups)
+
+  totals = {}
+  source_list = source_list.tolist()
+  for g in numpy.flatnonzero(up_counts + down_counts).tolist():
+    key = (int(periods[g // len(source_list)]), source_list[g % len(source_list)])
+    totals[key] = {}
+    if up_counts[g] > 0: totals[key]['total_hourly_up_ramp'] = float(up_sums[g])
+    if down_counts[g] > 0: totals[key]['total_hourly_down_ramp'] = float(down_sums[g])
+  return totals
+
+
+def _python_ramp_totals(net_power, calendar):
+  """Pure python version of ramp_totals that visits one cell at a time."""
+  totals = {}
+  def add(period, source, column, ramp):
+    if (period, source) not in totals: totals[(period, source)] = {}
+    totals[(period, source)][column] = totals[(period, source)].get(column, 0) + ramp
+  values = net_power.fields['net_power']
+  for (source, unit) in sorted(net_power.rows.names):
+    row = net_power.rows[(source, unit)]
+    for column in net_power.columns(row):
+      prior_cell = net_power.cell(row, calendar.prior[column])
+      next_cell = net_power.cell(row, calendar.next[column])
+      period = calendar.period[column]
+      value = values[net_power.cell(row, column)]
+      ramp = value - values[prior_cell]
+      if ramp > 0:
+        add(period, source, 'total_hourly_up_ramp', ramp)
+      else:
+        add(period, source, 'total_hourly_down_ramp', -1*ramp)
+      if net_power.state[next_cell] == encoding.absent:
+        add(period, source, 'total_hourly_down_ramp', value)
+  return totals
@@ -0,0 +1,384 @@
+# Dynamic scheduling of the job lists of the dispatch qsub templates
+# dispatch/execute_jobs.pl gave each worker every numprocs-th line of a jobs file, so one slow test set
+# held up its worker while the others sat idle. Here the workers share one queue of the jobs and each
+# worker claims the next job when it finishes the last one. The jobs are queued longest first, which
+# shortens the makespan: the long jobs start early and the short ones fill in around them.
+#
+# The queue is a directory with a pickled state that is only read & changed while holding a lockf
+# lock on the lock file of the directory. lockf locks work across the nodes of a cluster on NFS, so
+# the workers of a multi-node job can share a queue on shared disk, and they are released if a
+# worker dies. The first worker to lock the queue creates it from the jobs file.
+#
+# The runtime of a job is estimated from, in order:
+#   logs/job_runtimes.txt, where each run of a job is recorded with its runtime & exit status
+#   the run_times.txt file in the results directory that the job cds to, which AMPL writes
+#   the "N seconds to ..." lines of the log file of the job, e.g. logs/<test set id>_dispatch.log
+# Jobs are matched to their records by the name of their log file, or by their command if they don't
+# write to logs/. Jobs without any estimate are queued first, since they may be long. Jobs that exit
+# with an error are put back at the end of the queue until they have been tried max_attempts times.
+# A running job records the host & pid of its worker, and the worker updates its heartbeat while the
+# job runs. If the worker dies, e.g. when its node is lost or the qsub job hits its walltime, the job
+# is put back in the queue by the next worker that looks at it, or by a later run that reuses the
+# queue, and the lost run counts as one of its attempts. A worker whose pid is gone on this host is
+# taken as dead at once, and a worker on another host once its heartbeat is lease_seconds old. Workers
+# wait for the running jobs of the other workers before they exit, so that they can pick up the jobs
+# of a worker that dies.
+# Other processes can reorder the pending jobs with prioritize() and stop the workers after their
+# current jobs with stop(), as switch_summary/convergence.py does once its estimates are precise enough.
+# dispatch/schedule_jobs.py is the command line interface of this module.
+import os
+import re
+import time
+import errno
+import fcntl
+import socket
+import cPickle
+import subprocess
+import multiprocessing
+
+state_name = 'state.pickle'
+lock_name = 'lock'
+stop_name = 'stop' # Once this file is in the queue, workers don't claim any more jobs
+# Seconds between the heartbeats of a running job, and after which a job without a heartbeat is taken
+# to have lost its worker
+heartbeat_seconds = 60
+lease_seconds = 600
+# Seconds between checks of the running jobs of other workers by a worker without a job
+poll_seconds = 30
+# The record of each run of a job, relative to the directory the jobs are run from
+runtimes_path = 'logs/job_runtimes.txt'
+runtimes_columns = ['job', 'host', 'worker', 'attempt', 'start_time', 'seconds', 'exit_status']
+
+
+def read_jobs(path):
+  """The commands of a jobs file, one per line, as execute_jobs.pl reads them"""
+  f = open(path)
+  commands = [ line.rstrip('\r\n') for line in f if line.strip() ]
+  f.close()
+  return commands
+
+
+def job_name(command):
+  """The name of a job: the name of its log file in logs/, or its command"""
+  match = re.search(r'logs/([^/\s;\'"]+)\.log\b', command)
+  return match.group(1) if match else command
+
+
+def job_directory(command):
+  """The directory that a job cds to, or None"""
+  match = re.search(r'\bcd\s+([^\s;\'"]+)\s*;', command)
+  return match.group(1) if match else None
+
+
+def read_runtimes(path):
+  """The runtime of the latest successful run of each job in a job_runtimes.txt file"""
+  runtimes = {}
+  if not os.path.isfile(path): return runtimes
+  f = open(path)
+  columns = f.readline().rstrip('\r\n').split('\t')
+  for line in f:
+    record = dict(zip(columns, line.rstrip('\r\n').split('\t')))
+    if record.get('exit_status') == '0':
+      runtimes[record['job']] = float(record['seconds'])
+  f.close()
+  return runtimes
+
+
+def seconds_in_run_times(path):
+  """The total seconds of the records of an AMPL run_times.txt file, or None if it has none. The
+  seconds are the last column, and AMPL separates the columns with tabs or spaces."""
+  if not os.path.isfile(path): return None
+  seconds = None
+  for line in open(path):
+    fields = line.split()
+    if len(fields) >= 4 and re.match(r'^[0-9.]+$', fields[-1]):
+      seconds = (seconds or 0) + float(fields[-1])
+  return seconds
+
+
+def seconds_in_log(path):
+  """The total of the "N seconds to ..." lines of a log file, or None if it has none"""
+  if not os.path.isfile(path): return None
+  seconds = None
+  for line in open(path):
+    match = re.match(r'^\s*([0-9.]+) seconds to ', line)
+    if match: seconds = (seconds or 0) + float(match.group(1))
+  return seconds
+
+
+def estimate_runtime(command, runtimes, base_dir='.'):
+  """The estimated runtime of a job in seconds, or None if there is no record of it. runtimes are the
+  runtimes of earlier runs from read_runtimes()."""
+  name = job_name(command)
+  if name in runtimes: return runtimes[name]
+  directory = job_directory(command)
+  if directory is not None:
+    seconds = seconds_in_run_times(os.path.join(base_dir, directory, 'results', 'run_times.txt'))
+    if seconds is not None: return seconds
+  if name != command:
+    return seconds_in_log(os.path.join(base_dir, 'logs', name + '.log'))
+  return None
+
+
+def order_jobs(commands, base_dir='.'):
+  """The jobs of a list of commands, longest first. Jobs without estimates come first, and ties keep
+  the order of the jobs file."""
+  runtimes = read_runtimes(os.path.join(base_dir, runtimes_path))
+  jobs = [ {'index': i + 1, 'name': job_name(command), 'command': command,
+    'estimate': estimate_runtime(command, runtimes, base_dir), 'status': 'pending', 'attempts': 0}
+    for (i, command) in enumerate(commands) ]
+  return sorted(jobs, key=lambda job: (job['estimate'] is not None, -(job['estimate'] or 0), job['index']))
+
+
+def process_exists(pid):
+  """Whether a process with this pid is running on this host"""
+  try:
+    os.kill(pid, 0)
+  except OSError, e:
+    return e.errno == errno.EPERM
+  return True
+
+
+def abandoned(job, now):
+  """Whether the worker of a running job is gone: its process is gone from this host, or its last
+  heartbeat is more than lease_seconds old"""
+  if job.get('host') == socket.gethostname() and not process_exists(job['pid']): return True
+  return now - job.get('heartbeat', 0) > lease_seconds
+
+
+class JobQueue(object):
+  """A queue of jobs in a directory that workers on any node can share. Each method locks the queue
+  while it reads & changes its state."""
+
+  def __init__(self, queue_dir):
+    self.queue_dir = queue_dir
+    if not os.path.isdir(queue_dir):
+      try:
+        os.makedirs(queue_dir)
+      except OSError: # Another worker made it first
+        if not os.path.isdir(queue_dir): raise
+    self.state_path = os.path.join(queue_dir, state_name)
+    self.stop_path = os.path.join(queue_dir, stop_name)
+
+  def _lock(self):
+    lock_file = open(os.path.join(self.queue_dir, lock_name), 'a')
+    fcntl.lockf(lock_file, fcntl.LOCK_EX)
+    return lock_file
+
+  def _unlock(self, lock_file):
+    fcntl.lockf(lock_file, fcntl.LOCK_UN)
+    lock_file.close()
+
+  def _read_state(self):
+    f = open(self.state_path, 'rb')
+    state = cPickle.load(f)
+    f.close()
+    return state
+
+  def _write_state(self, state):
+    f = open(self.state_path + '.tmp', 'wb')
+    cPickle.dump(state, f, cPickle.HIGHEST_PROTOCOL)
+    f.close()
+    os.rename(self.state_path + '.tmp', self.state_path)
+
+  def _requeue_abandoned(self, state):
+    """Put the running jobs whose workers are gone back in the queue, or mark them failed if they
+    have been tried max_attempts times. Returns whether any were found."""
+    now = time.time()
+    found = False
+    for (i, job) in enumerate(state['jobs']):
+      if job['status'] != 'running' or not abandoned(job, now): continue
+      found = True
+      print "Job # %d lost its worker %s on %s during attempt %d." % (job['index'], job['worker'], job['host'], job['attempts'])
+      if job['attempts'] < state.get('max_attempts', 2):
+        job['status'] = 'pending'
+        state['pending'].append(i)
+      else:
+        job['status'] = 'failed'
+    return found
+
+  def create(self, jobs_path, base_dir='.', max_attempts=2):
+    """Queue the jobs of a jobs file, unless another worker has already queued them. If the queue is
+    being reused, its jobs that lost their workers are queued again."""
+    lock_file = self._lock()
+    try:
+      if not os.path.isfile(self.state_path):
+        jobs = order_jobs(read_jobs(jobs_path), base_dir)
+        self._write_state({ 'jobs': jobs, 'pending': range(len(jobs)), 'max_attempts': max_attempts })
+      else:
+        state = self._read_state()
+        state['max_attempts'] = max_attempts
+        self._requeue_abandoned(state)
+        self._write_state(state)
+    finally:
+      self._unlock(lock_file)
+
+  def claim(self, worker):
+    """Take the next pending job for a worker, or None if there are none left or the queue was stopped"""
+    lock_file = self._lock()
+    try:
+      if os.path.isfile(self.stop_path): return None
+      state = self._read_state()
+      requeued = self._requeue_abandoned(state)
+      if not state['pending']:
+        if requeued: self._write_state(state)
+        return None
+      i = state['pending'].pop(0)
+      job = state['jobs'][i]
+      job.update(status='running', worker=worker, attempts=job['attempts'] + 1,
+        host=socket.gethostname(), pid=os.getpid(), heartbeat=time.time())
+      self._write_state(state)
+      return dict(job, position=i)
+    finally:
+      self._unlock(lock_file)
+
+  def finish(self, job, exit_status, start_time, seconds, max_attempts=2, base_dir='.'):
+    """Record the run of a claimed job. A job that failed is queued again, at the end, until it has
+    been tried max_attempts times. Returns the new status of the job."""
+    lock_file = self._lock()
+    try:
+      state = self._read_state()
+      queued = state['jobs'][job['position']]
+      queued.update(exit_status=exit_status, seconds=seconds)
+      # The job may have been queued again if this worker missed its heartbeats
+      if job['position'] in state['pending']: state['pending'].remove(job['position'])
+      if exit_status == 0:
+        queued['status'] = 'done'
+      elif queued['attempts'] < max_attempts:
+        queued['status'] = 'pending'
+        state['pending'].append(job['position'])
+      else:
+        queued['status'] = 'failed'
+      self._write_state(state)
+      append_runtime(os.path.join(base_dir, runtimes_path),
+        [job['name'], socket.gethostname(), job['worker'], job['attempts'], int(start_time), '%.1f' % seconds, exit_status])
+      return queued['status']
+    finally:
+      self._unlock(lock_file)
+
+  def heartbeat(self, job):
+    """Record that the worker of a claimed job is still running it"""
+    lock_file = self._lock()
+    try:
+      state = self._read_state()
+      queued = state['jobs'][job['position']]
+      if queued['status'] == 'running' and queued['attempts'] == job['attempts']:
+        queued['heartbeat'] = time.time()
+        self._write_state(state)
+    finally:
+      self._unlock(lock_file)
+
+  def running(self):
+    """The number of jobs that other workers are running, after queueing the jobs of workers that
+    are gone again"""
+    lock_file = self._lock()
+    try:
+      state = self._read_state()
+      if self._requeue_abandoned(state): self._write_state(state)
+      return len([ job for job in state['jobs'] if job['status'] == 'running' ])
+    finally:
+      self._unlock(lock_file)
+
+  def stopped(self):
+    return os.path.isfile(self.stop_path)
+
+  def unfinished(self):
+    """The jobs that haven't been done, leaving out the pending jobs of a stopped queue"""
+    stopped = self.stopped()
+    return [ job for job in self.jobs() if job['status'] != 'done' and not (stopped and job['status'] == 'pending') ]
+
+  def prioritize(self, names):
+    """Move the pending jobs with these names to the front of the queue, in this order. Returns False
+    if the queue hasn't been created yet."""
+    lock_file = self._lock()
+    try:
+      if not os.path.isfile(self.state_path): return False
+      state = self._read_state()
+      rank = dict( (name, i) for (i, name) in enumerate(names) )
+      # A stable sort keeps the other pending jobs in their order, after the prioritized ones
+      state['pending'].sort(key=lambda i: rank.get(state['jobs'][i]['name'], len(rank)))
+      self._write_state(state)
+      return True
+    finally:
+      self._unlock(lock_file)
+
+  def stop(self, reason):
+    """Stop the workers from claiming more jobs. Running jobs are finished."""
+    f = open(self.stop_path, 'wb')
+    f.write(reason + '\n')
+    f.close()
+
+  def jobs(self):
+    """The jobs of the queue, in queue order, with their status"""
+    lock_file = self._lock()
+    try:
+      return self._read_state()['jobs']
+    finally:
+      self._unlock(lock_file)
+
+
+def append_runtime(path, values):
+  """Append the record of a run of a job to a job_runtimes.txt file, writing its header if it is new"""
+  new_file = not os.path.isfile(path)
+  f = open(path, 'ab')
+  f.write(('\t'.join(runtimes_columns) + '\n' if new_file else '') + '\t'.join(map(str, values)) + '\n')
+  f.close()
+
+
+def run_worker(queue, worker, max_attempts=2, worker_exit=None, base_dir='.'):
+  """Run jobs from a queue until it is empty, then run the worker_exit command if it is given.
+  Returns the number of jobs that this worker gave up on."""
+  host = socket.gethostname()
+  failed = 0
+  try:
+    while True:
+      job = queue.claim(worker)
+      if job is None:
+        # Wait for the jobs of the other workers, in case one of them dies
+        if queue.stopped() or queue.running() == 0: break
+        time.sleep(poll_seconds)
+        continue
+      estimate = '%.0f seconds' % job['estimate'] if job['estimate'] is not None else 'unknown'
+      print "executing job # %d (attempt %d, estimated runtime %s) with worker %s running on %s.\n\t%s" % (
+        job['index'], job['attempts'], estimate, worker, host, job['command'])
+      start_time = time.time()
+      process = subprocess.Popen(job['command'], shell=True, cwd=base_dir)
+      last_heartbeat = time.time()
+      while process.poll() is None:
+        time.sleep(1)
+        if time.time() - last_heartbeat >= heartbeat_seconds:
+          queue.heartbeat(job)
+          last_heartbeat = time.time()
+      exit_status = process.returncode
+      status = queue.finish(job, exit_status, start_time, time.time() - start_time, max_attempts, base_dir)
+      if status == 'failed':
+        failed += 1
+        print "Error! job # %d failed with exit status %d after %d attempts." % (job['index'], exit_status, job['attempts'])
+  finally:
+    if worker_exit: subprocess.call(worker_exit, shell=True, cwd=base_dir)
+  return failed
+
+
+def _run_local_worker(arguments):
+  (queue_dir, worker, max_attempts, worker_exit, base_dir) = arguments
+  return run_worker(JobQueue(queue_dir), worker, max_attempts, worker_exit, base_dir)
+
+
+def run_local(jobs_path, queue_dir, workers=None, max_attempts=2, worker_exit=None, base_dir='.'):
+  """Run the jobs of a jobs file with a pool of worker processes on this node. Returns the number of
+  jobs that failed every attempt."""
+  if workers is None: workers = multiprocessing.cpu_count()
+  JobQueue(queue_dir).create(jobs_path, base_dir, max_attempts)
+  pool = multiprocessing.Pool(processes=workers)
+  failed = pool.map(_run_local_worker,
+    [ (queue_dir, str(worker), max_attempts, worker_exit, base_dir) for worker in range(workers) ], chunksize=1)
+  pool.close()
+  pool.join()
+  return sum(failed)
+
+
+def mpi_rank():
+  """The rank of this process in an MPI job, or None if it isn't in one"""
+  for variable in ['OMPI_COMM_WORLD_RANK', 'PMI_RANK', 'MV2_COMM_WORLD_RANK', 'SLURM_PROCID']:
+    if variable in os.environ: return os.environ[variable]
+  return None
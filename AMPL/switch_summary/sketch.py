@@ -0,0 +1,124 @@
+# Mergeable weighted quantile sketches for approximate percentiles
+# The exact percentiles in switch_summary/percentiles.py need every timepoint of a group at once. A
+# sketch instead counts the weight of the values that fall in each of a set of logarithmically sized
+# buckets, so it is built in one pass without sorting, and takes a few hundred buckets however many
+# values it has seen. Any percentile it reports is within relative_accuracy of the value at that
+# percentile, e.g. 0.01 for 1%, and percentiles 0 & 100 are the exact minimum & maximum. The buckets
+# of negative values (storage charging) mirror those of positive values, and 0 has its own bucket.
+#
+# Sketches with the same accuracy merge exactly by adding their bucket weights, so the sketches that
+# summarize_results.py saves for each carbon cost can be combined across carbon costs, test sets and
+# scenarios into fleet-level distributions without reading the dispatch files again:
+#   fleet = sketch.merged([ saved['power'][(2030, 'Wind')] for saved in map(sketch.read_sketches, paths) ])
+#   fleet.percentile(50)
+import os
+import math
+import cPickle
+from switch_summary import percentiles
+
+default_relative_accuracy = 0.01
+
+
+def parse_accuracy(text):
+  """Parse a relative accuracy such as "0.01" from the command line."""
+  accuracy = float(text)
+  if accuracy <= 0 or accuracy >= 1:
+    raise ValueError("The relative accuracy of sketches needs to be between 0 and 1, not " + text)
+  return accuracy
+
+
+class WeightedSketch(object):
+  """A mergeable sketch of the distribution of weighted values. Percentiles follow the definition in
+  switch_summary/percentiles.py: the value at percentile p is the first value whose cumulative
+  weight reaches p/100 of the total weight."""
+
+  def __init__(self, relative_accuracy=default_relative_accuracy):
+    self.relative_accuracy = relative_accuracy
+    self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+    self.log_gamma = math.log(self.gamma)
+    # Weight of each bucket, keyed so that the keys sort in the order of their values:
+    # (-1, -i) for negative values, (0, 0) for 0 and (1, i) for positive values
+    self.buckets = {}
+    self.total = 0.0
+    self.min = None
+    self.max = None
+    self._ranks = None
+
+  def key(self, value):
+    if value == 0: return (0, 0)
+    index = int(math.ceil(math.log(abs(value)) / self.log_gamma))
+    return (1, index) if value > 0 else (-1, -index)
+
+  def bucket_value(self, key):
+    """The value that represents a bucket, which is within relative_accuracy of every value in it"""
+    (sign, index) = key
+    return sign * 2 * self.gamma ** (sign * index) / (self.gamma + 1)
+
+  def add(self, value, weight=1.0):
+    key = self.key(value)
+    self.buckets[key] = self.buckets.get(key, 0.0) + weight
+    self.total += weight
+    if self.min is None or value < self.min: self.min = value
+    if self.max is None or value > self.max: self.max = value
+    self._ranks = None
+
+  def merge(self, other):
+    """Add the values of another sketch with the same relative accuracy to this one."""
+    if other.relative_accuracy != self.relative_accuracy:
+      raise ValueError("Sketches with relative accuracies of %s and %s can't be merged." %
+        (self.relative_accuracy, other.relative_accuracy))
+    for (key, weight) in other.buckets.iteritems():
+      self.buckets[key] = self.buckets.get(key, 0.0) + weight
+    self.total += other.total
+    if other.min is not None and (self.min is None or other.min < self.min): self.min = other.min
+    if other.max is not None and (self.max is None or other.max > self.max): self.max = other.max
+    self._ranks = None
+
+  def percentile(self, p):
+    """The approximate value at percentile p, or None if the sketch is empty."""
+    if self.total == 0: return None
+    if p == 0: return self.min
+    if p == 100: return self.max
+    threshold = (p / 100.0 - percentiles.tolerance) * self.total
+    cumulative = 0.0
+    for key in sorted(self.buckets):
+      cumulative += self.buckets[key]
+      if cumulative >= threshold:
+        return min(max(self.bucket_value(key), self.min), self.max)
+    return self.max
+
+  def rank(self, value):
+    """The approximate percentile rank of a value: the cumulative weight of the buckets before its
+    bucket, as a fraction of the total weight."""
+    if self._ranks is None:
+      self._ranks = {}
+      cumulative = 0.0
+      for key in sorted(self.buckets):
+        self._ranks[key] = cumulative / self.total
+        cumulative += self.buckets[key]
+    key = self.key(value)
+    if key in self._ranks: return self._ranks[key]
+    return sum( weight for (other_key, weight) in self.buckets.iteritems() if other_key < key ) / self.total
+
+
+def merged(sketches):
+  """A new sketch of the values of all of the sketches, which need the same relative accuracy."""
+  sketches = list(sketches)
+  result = WeightedSketch(sketches[0].relative_accuracy if sketches else default_relative_accuracy)
+  for other in sketches: result.merge(other)
+  return result
+
+
+def write_sketches(path, sketches):
+  """Save a dict of sketches, e.g. those of one carbon cost of a scenario, with cPickle."""
+  f = open(path + '.tmp', 'wb')
+  cPickle.dump(sketches, f, cPickle.HIGHEST_PROTOCOL)
+  f.close()
+  os.rename(path + '.tmp', path)
+
+
+def read_sketches(path):
+  f = open(path, 'rb')
+  sketches = cPickle.load(f)
+  f.close()
+  return sketches
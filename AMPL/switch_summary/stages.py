@@ -0,0 +1,189 @@
+# Wall clock time spent in each stage of summarize_results.py
+# Stages are timed with the timed() decorator or by calling add() directly, and the seconds of each
+# stage accumulate across calls, e.g. when the stages run once per period in streaming mode. The
+# benchmark harness reads these totals after running the summarizer.
+#
+# After instrument() is called, e.g. with summarize_results.py --profile, each stage also measures
+# its cpu time, the rows that it read from results files with switch_summary/tab_reader.py, and the
+# peak resident memory of the process when it finished. One stage can also be run under cProfile.
+# The measurements of a run are the differences of two snapshots:
+#   before = stages.snapshot()
+#   ... run the stages ...
+#   stages.append_run_times('results/run_times.txt', scenario_id, carbon_cost, stages.measurements(before))
+import os
+import sys
+import time
+import cProfile
+import functools
+
+try:
+  import resource
+except ImportError: # Not available on Windows
+  resource = None
+
+stage_seconds = {} # Indexed by stage name
+stage_order = [] # Stage names in the order they were first timed
+
+# Measured after instrument() is called
+enabled = False
+stage_cpu_seconds = {} # Indexed by stage name
+stage_rows = {} # Indexed by stage name
+stage_peak_rss_mb = {} # Indexed by stage name
+profile_stage = None # Name of the stage that is run under cProfile
+profiler = None
+_running = [] # Names of the stages that are running, innermost last
+
+# The header of results/run_times.txt, as import_results_to_mysql.sh loads it into the run_times table
+run_times_columns = ['scenario_id', 'carbon_cost', 'process_type', 'time_seconds']
+
+
+def instrument(stage_to_profile=None):
+  """Measure the cpu time, rows & peak memory of each stage as well as its wall clock time, and run
+  stage_to_profile under cProfile if it is given."""
+  global enabled, profile_stage, profiler
+  enabled = True
+  profile_stage = stage_to_profile
+  if stage_to_profile is not None and profiler is None: profiler = cProfile.Profile()
+
+
+def add(stage, seconds, cpu_seconds=0, peak_rss=None):
+  if stage not in stage_seconds:
+    stage_seconds[stage] = 0
+    stage_order.append(stage)
+  stage_seconds[stage] += seconds
+  stage_cpu_seconds[stage] = stage_cpu_seconds.get(stage, 0) + cpu_seconds
+  if peak_rss is not None: stage_peak_rss_mb[stage] = max(stage_peak_rss_mb.get(stage, 0), peak_rss)
+
+
+def add_rows(rows):
+  """Count rows read by the innermost running stage"""
+  if _running: stage_rows[_running[-1]] = stage_rows.get(_running[-1], 0) + rows
+
+
+def timed(stage):
+  """Decorator that adds the run time of a function to a stage."""
+  def decorator(function):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+      if not enabled:
+        start_time = time.time()
+        try:
+          return function(*args, **kwargs)
+        finally:
+          add(stage, time.time() - start_time)
+      start_time = time.time()
+      start_cpu = process_cpu_seconds()
+      _running.append(stage)
+      try:
+        if stage == profile_stage: return profiler.runcall(function, *args, **kwargs)
+        return function(*args, **kwargs)
+      finally:
+        _running.pop()
+        add(stage, time.time() - start_time, process_cpu_seconds() - start_cpu, peak_rss_mb())
+    return wrapper
+  return decorator
+
+
+def process_cpu_seconds():
+  """User & system cpu time of this process"""
+  times = os.times()
+  return times[0] + times[1]
+
+
+def peak_rss_mb():
+  """Peak resident memory of this process in MB, or None if it can't be determined."""
+  if resource is None: return None
+  # ru_maxrss is in KB on Linux and in bytes on Mac OS X
+  maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  if sys.platform == 'darwin': return maxrss / (1024.0 * 1024.0)
+  return maxrss / 1024.0
+
+
+def snapshot():
+  """The totals of each stage so far, to measure the stages of one run with measurements()"""
+  return dict( (stage, (stage_seconds[stage], stage_cpu_seconds.get(stage, 0), stage_rows.get(stage, 0))) for stage in stage_order )
+
+
+def measurements(before):
+  """The wall & cpu seconds, rows, rows per second & peak memory of each stage that ran since the
+  snapshot before, as a list of (stage, dict) in the order the stages were first timed. Peak memory
+  is the most the process has used by the end of the stage."""
+  results = []
+  for stage in stage_order:
+    (seconds, cpu_seconds, rows) = before.get(stage, (0, 0, 0))
+    seconds = stage_seconds[stage] - seconds
+    if stage in before and seconds == 0: continue
+    rows = stage_rows.get(stage, 0) - rows
+    results.append((stage, {
+      'wall_seconds': seconds, 'cpu_seconds': stage_cpu_seconds.get(stage, 0) - cpu_seconds, 'rows': rows,
+      'rows_per_second': rows / seconds if seconds > 0 else None, 'peak_rss_mb': stage_peak_rss_mb.get(stage) }))
+  return results
+
+
+def merge_measurements(first, second):
+  """Add up two lists of measurements, e.g. of the input parse and of a run that used the inputs.
+  Peak memory is the larger of the two."""
+  merged = dict( (stage, dict(measured)) for (stage, measured) in first )
+  order = [ stage for (stage, measured) in first ]
+  for (stage, measured) in second:
+    if stage not in merged:
+      merged[stage] = dict(measured)
+      order.append(stage)
+      continue
+    total = merged[stage]
+    for measure in ['wall_seconds', 'cpu_seconds', 'rows']:
+      total[measure] += measured[measure]
+    total['rows_per_second'] = total['rows'] / total['wall_seconds'] if total['wall_seconds'] > 0 else None
+    if measured['peak_rss_mb'] is not None:
+      total['peak_rss_mb'] = max(total['peak_rss_mb'], measured['peak_rss_mb'])
+  return [ (stage, merged[stage]) for stage in order ]
+
+
+def process_type(stage, measure):
+  """The process_type of a measurement in run_times.txt, e.g. Summarize_Dispatch_Aggregation_CPU_Seconds"""
+  return '_'.join(['Summarize'] + [ word.capitalize() for word in stage.split() ] + [measure])
+
+
+def append_run_times(path, scenario_id, carbon_cost, stage_measurements):
+  """Append measurements to a run_times.txt file, writing its header if it is new. Each measurement of
+  each stage is a record whose process_type names the stage & measure, and whose time_seconds column
+  has the value. Rows & rows per second are left out for stages that didn't read any rows."""
+  lines = []
+  for (stage, measured) in stage_measurements:
+    values = [('Wall_Seconds', measured['wall_seconds']), ('CPU_Seconds', measured['cpu_seconds'])]
+    if measured['rows'] > 0:
+      values += [('Rows', measured['rows']), ('Rows_Per_Second', measured['rows_per_second'])]
+    if measured['peak_rss_mb'] is not None:
+      values += [('Peak_RSS_MB', measured['peak_rss_mb'])]
+    for (measure, value) in values:
+      if value is None: continue
+      lines.append('%s\t%s\t%s\t%s\n' % (scenario_id, carbon_cost, process_type(stage, measure), value))
+  new_file = not os.path.isfile(path)
+  f = open(path, 'ab')
+  # One write, so the records of workers that append at the same time aren't interleaved
+  f.write(('\t'.join(run_times_columns) + '\n' if new_file else '') + ''.join(lines))
+  f.close()
+
+
+def format_measurements(stage_measurements):
+  """Lines that report measurements, one per stage"""
+  lines = []
+  for (stage, measured) in stage_measurements:
+    line = '%20s: %8.2f seconds, %8.2f cpu seconds' % (stage, measured['wall_seconds'], measured['cpu_seconds'])
+    if measured['rows'] > 0:
+      line += ', %d rows' % measured['rows']
+      if measured['rows_per_second'] is not None: line += ' (%.0f rows/second)' % measured['rows_per_second']
+    if measured['peak_rss_mb'] is not None:
+      line += ', peak memory %.0f MB' % measured['peak_rss_mb']
+    lines.append(line)
+  return lines
+
+
+def write_profile(path):
+  """Save the cProfile statistics of the profiled stage for pstats, and start a new profile. Returns
+  False if no stage is profiled or it didn't run."""
+  global profiler
+  if profiler is None or not profiler.getstats(): return False
+  profiler.dump_stats(path)
+  profiler = cProfile.Profile()
+  return True
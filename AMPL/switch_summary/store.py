@@ -0,0 +1,189 @@
+# Local store of the summaries of many scenarios
+# Comparing the scenarios of a sweep meant reading the summary files of each results/ directory or
+# querying the results database through an ssh tunnel. With --store, summarize_results.py and
+# dispatch/summarize_results.py also write their summaries to a SQLite database file, which the
+# scenarios of a sweep can share, and select() reads them back as Table objects:
+#   summaries = store.Store('sweep.db')
+#   capacity = summaries.select('gen_summary', ['scenario_id', 'carbon_cost', 'period', 'capacity'], technology='Wind')
+#
+# Each summary goes into the table that import_summaries.py --sqlite loads it into, e.g. gen_summary.txt
+# into summary_gen_summary, and the tables are created & altered from the headers of the files by
+# switch_summary/bulk_load.py. Summaries without a carbon_cost column, which summarize_results.py
+# writes for a single carbon cost, are stored with the carbon cost that was summarized. Each table has a
+# unique index on the key of its records, which starts with scenario_id, carbon_cost & period, and the
+# tables with a technology, source or area column also have an index on it & period, for selecting one
+# technology across scenarios. Storing summaries replaces the rows of each scenario & carbon cost in
+# them: the old rows are deleted and the new ones are upserted in batches on the key, in one
+# transaction for all of the summaries that are stored together. Scenarios that are summarized at the
+# same time wait for each other's transactions.
+import os
+import time
+import sqlite3
+import itertools
+from switch_summary import bulk_load
+from switch_summary import compressed
+from switch_summary import tables
+
+# The summaries of summarize_results.py & of dispatch/summarize_results.py that are stored. The hourly
+# summaries are left out.
+summary_names = ['gen_summary', 'gen_percentiles', 'sys_summary', 'trans_summary', 'ramp_summary',
+  'area_net_load_summary', 'trans_corridor_summary']
+dispatch_summary_names = ['emissions_summary', 'ng_consumption_summary', 'biomass_consumption_summary', 'cap_shortfall_summary']
+
+# The key of the records of each summary
+summary_keys = {
+  'gen_summary': ['scenario_id', 'carbon_cost', 'period', 'technology'],
+  'gen_percentiles': ['scenario_id', 'carbon_cost', 'period', 'technology', 'percentile_num'],
+  'sys_summary': ['scenario_id', 'carbon_cost', 'period'],
+  'trans_summary': ['scenario_id', 'carbon_cost', 'period'],
+  'ramp_summary': ['scenario_id', 'carbon_cost', 'period', 'source'],
+  'area_net_load_summary': ['scenario_id', 'carbon_cost', 'period', 'area_type', 'area', 'measure'],
+  'trans_corridor_summary': ['scenario_id', 'carbon_cost', 'period', 'load_area_from', 'load_area_receive'],
+  'emissions_summary': ['scenario_id', 'carbon_cost', 'period'],
+  'ng_consumption_summary': ['scenario_id', 'carbon_cost', 'period'],
+  'biomass_consumption_summary': ['scenario_id', 'carbon_cost', 'period', 'load_area'],
+  'cap_shortfall_summary': ['scenario_id', 'carbon_cost', 'period', 'test_set_id', 'timepoint'],
+}
+# Columns that are indexed with period, for selecting their values across scenarios
+name_columns = ['technology', 'source', 'area', 'load_area']
+
+# Seconds to wait for another process that is storing summaries in the same file
+lock_timeout = 600
+
+
+def summary_name(path):
+  """The name of the summary in a file, e.g. gen_summary for results/gen_summary.txt.gz"""
+  return os.path.basename(compressed.base_name(path))[:-len('.txt')]
+
+
+class Store(object):
+  """A SQLite file of summaries"""
+
+  def __init__(self, path):
+    self.path = path
+    self.connection = sqlite3.connect(path, timeout=lock_timeout)
+    self.connection.text_factory = str
+
+  def close(self):
+    self.connection.close()
+
+  def prepare_table(self, path):
+    """Create or alter the table of a summary file, with a carbon_cost column, and index it"""
+    bulk_load.prepare_table(self.connection, path)
+    table = bulk_load.table_name(path)
+    cursor = self.connection.cursor()
+    columns = bulk_load.existing_columns(cursor, table)
+    if 'carbon_cost' not in columns:
+      cursor.execute("alter table `%s` add column carbon_cost BIGINT" % table)
+      columns.append('carbon_cost')
+    key = summary_keys[summary_name(path)]
+    cursor.execute("create unique index if not exists `%s_key` on `%s` (%s)" % (table, table, ", ".join(key)))
+    for column in name_columns:
+      if column in key:
+        cursor.execute("create index if not exists `%s_%s` on `%s` (%s, period)" % (table, column, table, column))
+        break
+    self.connection.commit()
+    cursor.close()
+
+  def upsert(self, name, columns, rows, commit=True):
+    """Insert rows of a summary that has been stored before, or replace the rows with the same key,
+    in batches of bulk_load.batch_size. Returns the number of rows."""
+    statement = "insert or replace into `%s` (%s) values (%s)" % (
+      bulk_load.table_prefix + name, ", ".join( "`%s`" % c for c in columns ), ", ".join(['?'] * len(columns)) )
+    cursor = self.connection.cursor()
+    rows = iter(rows)
+    row_count = 0
+    try:
+      while True:
+        batch = list(itertools.islice(rows, bulk_load.batch_size))
+        if len(batch) == 0: break
+        cursor.executemany(statement, batch)
+        row_count += len(batch)
+      if commit: self.connection.commit()
+    finally:
+      cursor.close()
+    return row_count
+
+  def store_files(self, paths, carbon_cost=None, log=None):
+    """Replace the rows of each scenario & carbon cost in the tables of the given summary files, in one
+    transaction. carbon_cost is the carbon cost of the files without a carbon_cost column. Returns a
+    list of (table, rows, seconds) for each file."""
+    for path in paths:
+      self.prepare_table(path)
+    timings = []
+    cursor = self.connection.cursor()
+    try:
+      for path in paths:
+        start_time = time.time()
+        name = summary_name(path)
+        table = bulk_load.table_name(path)
+        (columns, records) = bulk_load.read_summary(path)
+        if 'carbon_cost' not in columns:
+          if carbon_cost is None:
+            raise ValueError("%s has no carbon_cost column, and no carbon cost was given for it." % path)
+          columns = columns + ['carbon_cost']
+          records = ( record + [carbon_cost] for record in records )
+        records = list(records)
+        (scenario_column, carbon_cost_column) = (columns.index('scenario_id'), columns.index('carbon_cost'))
+        runs = sorted(set( (record[scenario_column], record[carbon_cost_column]) for record in records ))
+        for run in runs:
+          cursor.execute("delete from `%s` where scenario_id = ? and carbon_cost = ?" % table, run)
+        row_count = self.upsert(name, columns, records, commit=False)
+        db_row_count = 0
+        for run in runs:
+          cursor.execute("select count(*) from `%s` where scenario_id = ? and carbon_cost = ?" % table, run)
+          db_row_count += cursor.fetchone()[0]
+        seconds = time.time() - start_time
+        # Records with the same key replace each other
+        if db_row_count != row_count:
+          raise RuntimeError("Stored %d rows in %s, but expected %d." % (db_row_count, table, row_count))
+        timings.append( (table, row_count, seconds) )
+        if log is not None:
+          log("%20s  ->  %s: %d rows in %.2f seconds" % (path, table, row_count, seconds))
+      self.connection.commit()
+    except:
+      self.connection.rollback()
+      raise
+    finally:
+      cursor.close()
+    return timings
+
+  def select(self, name, columns=None, order_by=None, **where):
+    """The rows of a stored summary as a Table with the given columns, or all of them. where gives the
+    value, or a list of values, of the rows to select for any of the columns, e.g. technology='Wind' or
+    scenario_id=[42, 43]. The rows are ordered by order_by, a list of columns, or the key of the summary."""
+    table = bulk_load.table_prefix + name
+    cursor = self.connection.cursor()
+    if columns is None: columns = bulk_load.existing_columns(cursor, table)
+    if order_by is None: order_by = summary_keys[name]
+    conditions = []
+    values = []
+    for (column, value) in sorted(where.items()):
+      if isinstance(value, (list, tuple, set)):
+        conditions.append("`%s` in (%s)" % (column, ", ".join(['?'] * len(value))))
+        values += list(value)
+      else:
+        conditions.append("`%s` = ?" % column)
+        values.append(value)
+    cursor.execute("select %s from `%s`%s order by %s" % (", ".join( "`%s`" % c for c in columns ), table,
+      " where " + " and ".join(conditions) if conditions else "", ", ".join( "`%s`" % c for c in order_by )), values)
+    rows = cursor.fetchall()
+    cursor.close()
+    return tables.Table(name, columns, rows)
+
+
+def store_summaries(store_path, summary_dir, names, carbon_cost=None):
+  """Store the summaries with these names that are in summary_dir, which may be compressed, in the
+  SQLite file at store_path. carbon_cost is the carbon cost of the summaries without a carbon_cost
+  column. Returns a list of (table, rows, seconds)."""
+  paths = []
+  for name in names:
+    path = compressed.find(os.path.join(summary_dir, name + '.txt'))
+    if os.path.isfile(path): paths.append(path)
+  summaries = Store(store_path)
+  try:
+    timings = summaries.store_files(paths, carbon_cost)
+  finally:
+    summaries.close()
+  print "Stored %d rows of %d summaries in %s." % (sum( rows for (table, rows, seconds) in timings ), len(timings), store_path)
+  return timings
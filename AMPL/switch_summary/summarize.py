@@ -0,0 +1,1015 @@
+# Summaries of SWITCH investment & operation results, grouping similar technologies according to
+# sets defined in tech_grouping.txt. For example, this can lump the 10 different Bio* generation
+# technologies into Biomass. summarize_results.py is the command line interface of this module.
+#
+# The work is split between two classes so that it can be done for many scenarios in one process:
+# Inputs holds what is read from a scenario's inputs/ directory, which doesn't depend on the carbon
+# cost, and Summary holds the sums for one carbon cost and has a method for each stage: reading the
+# capacity results, aggregating generator & transmission dispatch, percentiles, ramps, totals, net
+# load and writing the summaries. summarize_scenarios() summarizes a list of scenario directories,
+# parsing the inputs once for scenarios whose input files are identical, and returns the summaries
+# as Table objects as well as writing them to each scenario's results/ directory.
+#   scenario_tables = summarize.summarize_scenarios(['scenario_1', 'scenario_2'], carbon_costs='0')
+#   scenario_tables['scenario_1']['0']['gen_summary'].rows
+import os
+import re
+import csv
+import glob
+import copy
+import time
+import shutil
+import hashlib
+import tempfile
+import multiprocessing
+from switch_summary import percentiles
+from switch_summary import ramps
+from switch_summary import tab_cache
+from switch_summary import tab_reader
+from switch_summary import compressed
+from switch_summary import stages
+from switch_summary import encoding
+from switch_summary import tables
+from switch_summary import sketch
+from switch_summary import calendar_index
+from switch_summary import areas
+from switch_summary import congestion
+
+# Templates of the records of the summaries
+gen_dat_template = {
+  'capacity': 0, 'energy_gen': 0, 'capacity_factor': None, 'emissions': 0, # Units: MW, MWhr/yr, %, t-CO2eq/yr
+  'cost_capital': 0, 'cost_fixed': 0, 'cost_var': 0, # Units: 2007$/yr all
+  'levelized_cost': None, # Levelized cost in 2007$/yr is calculated by total energy generated and/or released
+  'total_hourly_up_ramp': 0, 'total_hourly_down_ramp': 0, # Units: MW/yr all
+  'storage_energy_capacity': 0, 'energy_stored': 0, 'energy_released': 0, # Units: MWhr, MWhr/yr, MWhr/yr
+  'power_percentiles': {} # index N gives values for N-th percentile. 0 and 100 are used to denote min and max
+#  ,'vintages': {} # gen_dat[(period,tech)]['vintages']['existing'|installed_year] = remaining_capacity_MW
+}
+# The hourly data is kept in array-backed tables with a row per key and a column per timepoint,
+# which are made once the timepoints are known. See switch_summary/encoding.py
+# The templates give the columns of the hourly summaries.
+hourly_output_template = {
+  'power': 0, 'hours_per_year': None, # Units: MW, count
+  'weight': None, 'percentile_rank': None # Units: statistical weight (which sums to 1 across period & tech), the percentile ranking of this hour within period & tech grouping in regards to power output
+}
+hourly_net_load_template = {
+  'load': 0, 'net_load': 0, # Units: MW, MW
+  'percentile_rank': None # Units: percentile ranking of this hour within period & in regards to net load
+}
+system_dat_template = {
+  'load_served': 0, 'energy_produced': 0, 'peak_demand': 0, 'hours_in_period': 0, # Units: MWhr/yr, MWhr/yr, MW, hours
+  'power_cost': None, 'system_cost': None, # Units: 2007$/MWh, 2007$
+  'total_hourly_up_ramp': 0, 'total_hourly_down_ramp': 0, 'total_emissions': 0 # Units: MW/yr, MW/yr, t-CO2eq/yr
+}
+trans_dat_template = {
+  'rated_cap_MW': 0, 'rated_cap_MWkm': 0, 'derated_cap_MW': 0, 'derated_cap_MWkm': 0, # Units: MW, MW-km,
+  'cost_annual': 0, # Units: 2007$/yr
+  'energy_sent': 0, 'energy_received': 0, 'capacity_factor': None, # Units: MWhr/yr, MWhr/yr
+  'total_hourly_up_ramp': 0, 'total_hourly_down_ramp': 0, # Units: MW/yr, MW/yr all
+  'energy_received_percentiles': {} # index N gives values for N-th percentile. 0 and 100 are used to denote min and max
+}
+# Names of the summary files that are written for each carbon cost
+summary_names = ['gen_summary', 'gen_percentiles', 'gen_hourly_summary', 'sys_summary', 'trans_summary', 'ramp_summary', 'net_load_hourly_summary']
+# Summaries of the net load of each load area & balancing area that are written with area_net_load.
+# See switch_summary/areas.py
+area_summary_names = ['area_net_load_summary', 'area_net_load_hourly_summary']
+# Summary of the utilization & congestion of each transmission path that is written with corridors.
+# See switch_summary/congestion.py
+corridor_summary_names = ['trans_corridor_summary']
+# The hourly summaries are the large ones, and are compressed with --compress
+hourly_summary_names = ['gen_hourly_summary', 'net_load_hourly_summary', 'area_net_load_hourly_summary']
+# Summaries that are written as partitioned Parquet files with --parquet_dir. See switch_summary/partitioned.py
+parquet_summary_names = ['gen_summary', 'gen_hourly_summary', 'trans_summary', 'ramp_summary', 'net_load_hourly_summary']
+
+# The input files of a scenario, relative to the scenario directory
+input_paths = ['inputs/tech_grouping.txt', 'inputs/study_hours.tab', 'inputs/max_system_loads.tab',
+  'inputs/generator_info.tab', 'inputs/system_load.tab', 'inputs/transmission_lines.tab', 'inputs/load_areas.tab']
+
+
+def text_summary_names(parquet_dir=None, area_net_load=False, corridors=False):
+  """Names of the summaries that are written as text, which are all of them unless parquet_dir is
+  given, plus the area summaries with area_net_load and the corridor summary with corridors."""
+  names = [ name for name in summary_names if parquet_dir is None or name not in parquet_summary_names ]
+  if area_net_load: names += area_summary_names
+  if corridors: names += corridor_summary_names
+  return names
+
+
+def read_scenario_id(scenario_dir):
+  return str(int(open(os.path.join(scenario_dir, "scenario_id.txt")).read()))
+
+
+def find_carbon_costs(scenario_dir):
+  """Every carbon cost that export.run wrote results for, in numerical order."""
+  return sorted(set(
+    [ re.sub(r'^.*/gen_cap_(\d+).txt$', r'\1', compressed.base_name(path))
+      for path in glob.glob(os.path.join(scenario_dir, 'results', 'gen_cap_*.txt*')) ]),
+    key=int)
+
+
+def input_key(scenario_dir):
+  """The sha1 hash of each input file of a scenario. Scenarios with the same key can share Inputs."""
+  key = []
+  for path in input_paths:
+    path = os.path.join(scenario_dir, path)
+    if not os.path.isfile(path):
+      key.append(None)
+      continue
+    digest = hashlib.sha1()
+    f = open(path, 'rb')
+    while True:
+      chunk = f.read(1024 * 1024)
+      if not chunk: break
+      digest.update(chunk)
+    f.close()
+    key.append(digest.hexdigest())
+  return tuple(key)
+
+
+class Inputs(object):
+  """The inputs of a scenario: tech groups, timepoints, system load, generator info & transmission
+  lines. They don't depend on the carbon cost, and are only read, not changed, by each Summary."""
+
+  def __init__(self, scenario_dir='.'):
+    # The Inputs are parsed before the Summary of any carbon cost runs, so the measurements of the
+    # parse are kept here and reported with the first carbon cost; see parse_measurements()
+    before = stages.snapshot() if stages.enabled else None
+    self.read(scenario_dir)
+    self.measured_parse = stages.measurements(before) if before is not None else []
+    self.parse_reported_by = None
+
+  def parse_measurements(self, scenario_dir, carbon_cost):
+    """The measurements of the stages of parsing these inputs, for the run times of the first carbon
+    cost & scenario that asks for them, or an empty list for the others"""
+    if self.parse_reported_by is None: self.parse_reported_by = (scenario_dir, carbon_cost)
+    return self.measured_parse if self.parse_reported_by == (scenario_dir, carbon_cost) else []
+
+  @stages.timed('input parse')
+  def read(self, scenario_dir):
+    self.tech_to_group = {} # tech_to_group[tech] = 'group'
+    self.system_dat = {} # Indexed by period. Sums from the inputs that each Summary starts with
+    self.flexible_tech = set()
+    self.intermittent_tech = set()
+    self.generator_info = {} # records from generator_info.tab, indexed by the technology column
+    self.trans_path_dat = {} # records from transmisison_lines.tab indexed by (from_area, to_area).
+    self.balancing_areas = {} # balancing area of each load area, from load_areas.tab
+    tech_to_group = self.tech_to_group
+    system_dat = self.system_dat
+    inputs_dir = os.path.normpath(os.path.join(scenario_dir, 'inputs'))
+
+    # Read in group info
+    path=os.path.join(inputs_dir, 'tech_grouping.txt')
+    if os.path.isfile(path):
+      f = open(path, 'rb')
+      file_dat = csv.DictReader(f, delimiter='\t')
+      for row in file_dat:
+        tech_to_group[row['technology']] = row['tech_group']
+      f.close()
+    else:
+      print "Error! " + path + " not found."
+
+    # Read in study timepoint info. See switch_summary/calendar_index.py
+    path=os.path.join(inputs_dir, 'study_hours.tab')
+    if os.path.isfile(path):
+      self.calendar = calendar_index.read_calendar(path)
+    else:
+      print "Error! " + path + " not found."
+      self.calendar = calendar_index.Calendar([])
+    calendar = self.calendar
+    for period in calendar.periods:
+      # Initialize variables that will be used for sums
+      system_dat[period] = system_dat_template.copy()
+      system_dat[period]['hours_in_period'] = calendar.hours_in_period[period]
+      system_dat[period]['num_years_per_period'] = calendar.years_per_period[period]
+
+    # Rows are periods. Each Summary starts with a copy of the loads
+    self.hourly_net_load = encoding.Grid(len(calendar), ['load', 'net_load', 'percentile_rank'])
+    # Rows are load areas
+    self.area_load = encoding.Grid(len(calendar), ['load'])
+
+    # Read in load data
+    path=os.path.join(inputs_dir, 'max_system_loads.tab')
+    if os.path.isfile(path):
+      for row in tab_cache.read_rows(path):
+        period = int(row['period'])
+        if period in system_dat: system_dat[period]['peak_demand'] += float(row['max_system_load'])
+    else:
+      print "Error! " + path + " not found."
+
+    # Read generator info. Make a list of flexible technologies and intermittent technologies
+    path=os.path.join(inputs_dir, 'generator_info.tab')
+    if os.path.isfile(path):
+      for row in tab_cache.read_rows(path):
+        tech = row['technology']
+        tech_group = tech_to_group[tech]
+        if int(row['dispatchable']) == 1 or int(row['storage']) == 1:
+          self.flexible_tech.add(tech_group)
+        if int(row['intermittent']) == 1:
+          self.intermittent_tech.add(tech_group)
+        self.generator_info[tech] = row.copy()
+    else:
+      print "Error! " + path + " not found."
+
+    # Read system load
+    path=os.path.join(inputs_dir, 'system_load.tab')
+    if os.path.isfile(path):
+      for row in tab_cache.read_rows(path):
+        column = calendar.column(int(row['hour']))
+        period = calendar.period[column]
+        self.hourly_net_load.add(self.hourly_net_load.row(period), column, 'load', float(row['system_load']))
+        self.area_load.add(self.area_load.row(row['load_area']), column, 'load', float(row['system_load']))
+        system_dat[period]['load_served'] += float(row['system_load']) * calendar.hours_per_year[column]
+    else:
+      print "Error! " + path + " not found."
+
+    # Read transmission line lengths
+    path=os.path.join(inputs_dir, 'transmission_lines.tab')
+    if os.path.isfile(path):
+      for row in tab_cache.read_rows(path):
+        self.trans_path_dat[(row['load_area_start'], row['load_area_end'])] = dict(
+          (key, float(row[key])) for key in row.keys() if key not in ('load_area_start', 'load_area_end')
+        )
+    else:
+      print "Error! " + path + " not found."
+
+    # Read the balancing area of each load area. Without load_areas.tab, the balancing areas are taken
+    # from the dispatch file.
+    path=os.path.join(inputs_dir, 'load_areas.tab')
+    if os.path.isfile(path):
+      for row in tab_cache.read_rows(path):
+        self.balancing_areas[row['load_area']] = row['balancing_area']
+
+
+class Summary(object):
+  """The summaries of the results of one carbon cost of a scenario. The stages are run in order by
+  run(), which can also be called one at a time. By default they process every period at once.
+  With streaming, the dispatch & transmission files are first split into one file per period, and
+  the stages run on one period at a time. The per-period state (hourly_output & flexible_net_power)
+  is freed once that period's summaries have been written, so peak memory depends on the largest
+  period rather than the whole study.
+
+  engine is 'python' or 'numpy' for the columnar engine in switch_summary/columnar.py, which writes
+  identical summaries. compression is None, 'gz' or 'zst' for the hourly summaries, and with
+  parquet_dir the tables in parquet_summary_names are written as Parquet files instead of text.
+  With sketch_accuracy, the power & transmission percentiles and the percentile ranks of the hourly
+  output are approximated with sketches of that relative accuracy, which are saved for merging; see
+  switch_summary/sketch.py. With area_net_load, the net load & residual load of each load area &
+  balancing area are summarized as well; see switch_summary/areas.py. With corridors, the utilization
+  & congestion of each transmission path are summarized; see switch_summary/congestion.py"""
+
+  def __init__(self, inputs, scenario_dir, carbon_cost, engine='python', streaming=False,
+      percentiles=percentiles.default_percentiles, compression=None, parquet_dir=None, sketch_accuracy=None,
+      area_net_load=False, corridors=False):
+    self.inputs = inputs
+    self.scenario_dir = scenario_dir
+    self.results_dir = os.path.normpath(os.path.join(scenario_dir, 'results'))
+    self.scenario_id = read_scenario_id(scenario_dir)
+    self.carbon_cost = carbon_cost
+    self.engine = engine
+    self.streaming = streaming
+    self.calculate_percentiles = percentiles
+    self.compression = compression
+    self.parquet_dir = parquet_dir
+    self.sketch_accuracy = sketch_accuracy
+    self.power_sketches = {} # Indexed by (period, technology)
+    self.trans_sketches = {} # Indexed by period
+    if parquet_dir is not None:
+      from switch_summary import partitioned
+      self.partitioned = partitioned
+    # Summaries that are written as text
+    self.text_summary_names = text_summary_names(parquet_dir, area_net_load, corridors)
+
+    # Data structures for storing and/or aggregating info from files.
+    num_columns = len(inputs.calendar)
+    self.gen_dat = {} # Indexed by ( period, technology )
+    self.system_dat = copy.deepcopy(inputs.system_dat) # Indexed by period
+    self.trans_dat = {} # Indexed by (period)
+    self.hourly_output = encoding.Grid(num_columns, ['power', 'percentile_rank']) # Rows are (period, technology)
+    self.hourly_net_load = inputs.hourly_net_load.copy() # Rows are periods
+    self.hourly_trans = encoding.Grid(num_columns, ['power_received']) # Rows are periods. Value is power received
+    self.flexible_net_power = encoding.Grid(num_columns, ['net_power']) # Rows are ([technology|'Net_Tx'], [project_id|load_area]). Value is power_MW
+    self.area_net_load = None
+    if area_net_load:
+      self.area_net_load = areas.AreaNetLoad(inputs.calendar, inputs.area_load, inputs.balancing_areas, inputs.tech_to_group)
+    self.corridors = None
+    if corridors:
+      self.corridors = congestion.Corridors(inputs.calendar, inputs.trans_path_dat)
+
+  def results_path(self, name):
+    """Path of a results file of this scenario, which may be compressed; see switch_summary/compressed.py"""
+    return compressed.find(os.path.join(self.results_dir, name))
+
+  def read_records(self, path, columns):
+    """Records of the requested columns of a results file; see switch_summary/tab_reader.py"""
+    return tab_reader.read_records(path, columns)
+
+  # Read & summarize generation capacity
+  @stages.timed('input parse')
+  def read_generation_capacity(self, path):
+    gen_dat = self.gen_dat
+    system_dat = self.system_dat
+    area_net_load = self.area_net_load
+    columns = [('period', int), ('project_id', None), ('load_area', None), ('technology', None), ('capacity', float),
+      ('storage_energy_capacity', float), ('capital_cost', float), ('fixed_o_m_cost', float)]
+    for (period, project_id, load_area, tech, capacity, storage_energy_capacity, capital_cost, fixed_o_m_cost) in self.read_records(path, columns):
+      tech_group = self.inputs.tech_to_group[tech]
+      if area_net_load is not None: area_net_load.add_project(project_id, tech, load_area)
+      if (period, tech_group) not in gen_dat:
+        gen_dat[(period, tech_group)] = copy.deepcopy(gen_dat_template)
+      gen_dat[(period, tech_group)]['capacity'] += capacity
+      gen_dat[(period, tech_group)]['storage_energy_capacity'] += storage_energy_capacity
+      # Need to divide these period-wide costs by num_years_per_period to get annual costs. This reverses the simplified financial conversion in basic_stats from annual to period-wide costs.
+      gen_dat[(period, tech_group)]['cost_capital'] += capital_cost / system_dat[period]['num_years_per_period']
+      gen_dat[(period, tech_group)]['cost_fixed'] += fixed_o_m_cost / system_dat[period]['num_years_per_period']
+
+  # Read & summarize transmission capacity
+  @stages.timed('input parse')
+  def read_transmission_capacity(self, path):
+    trans_dat = self.trans_dat
+    trans_path_dat = self.inputs.trans_path_dat
+    system_dat = self.system_dat
+    corridors = self.corridors
+    columns = [('period', int), ('start', None), ('end', None), ('trans_mw', float), ('fixed_cost', float)]
+    for (period, start, end, trans_mw, fixed_cost) in self.read_records(path, columns):
+      if period not in trans_dat:
+        trans_dat[period] = copy.deepcopy(trans_dat_template)
+        self.hourly_trans.row(period)
+      if corridors is not None: corridors.add_capacity(period, start, end, trans_mw)
+      # Divide by 2 to correct the modeling issue of representing a bi-directional transmission line
+      #  as two uni-directional paths with symetric build-outs that each are assigned the full
+      # ratings and 1/2 of the costs. This is also reasonable summary of existing lines that sometimes have assymetrical ratings.
+      trans_mw = trans_mw / 2
+      trans_mwkm = trans_mw * trans_path_dat[(start, end)]['transmission_length_km']
+      trans_dat[period]['rated_cap_MW'] += trans_mw
+      trans_dat[period]['rated_cap_MWkm'] += trans_mwkm
+      trans_dat[period]['derated_cap_MW'] += trans_mw * trans_path_dat[(start, end)]['transmission_derating_factor']
+      trans_dat[period]['derated_cap_MWkm'] += trans_mwkm * trans_path_dat[(start, end)]['transmission_derating_factor']
+      # Need to divide these period-wide costs by num_years_per_period to get annual costs. This reverses the simplified financial conversion in basic_stats from annual to period-wide costs.
+      trans_dat[period]['cost_annual'] += fixed_cost / system_dat[period]['num_years_per_period']
+
+  # Read power cost summary, from cost_summary_<carbon cost>.txt. Older exports only have
+  # cost_summary.txt, which export.run overwrites for each carbon cost, so only use records that match
+  # the carbon cost being summarized.
+  @stages.timed('input parse')
+  def read_cost_summary(self, path):
+    system_dat = self.system_dat
+    columns = [('period', int), ('Power_Cost_Per_Period', float)]
+    if 'carbon_cost' in tab_reader.read_header(path): columns.append(('carbon_cost', None))
+    for record in self.read_records(path, columns):
+      if len(record) > 2 and record[2] != self.carbon_cost: continue
+      period = record[0]
+      system_dat[period]['power_cost'] = record[1]
+      system_dat[period]['system_cost'] = system_dat[period]['power_cost'] * system_dat[period]['load_served']
+  #    system_dat[period]['system_cost'] = float(row['Total_Cost_Per_Period'])
+
+  @stages.timed('dispatch aggregation')
+  def init_hourly_output(self, periods):
+    for (period, tech_group) in self.gen_dat:
+      if period in periods:
+        self.hourly_output.row((period, tech_group))
+
+  # Read & summarize power production
+  @stages.timed('dispatch aggregation')
+  def summarize_dispatch(self, path):
+    inputs = self.inputs
+    if self.engine == 'numpy':
+      from switch_summary import columnar
+      columnar.summarize_dispatch(path, inputs.tech_to_group, inputs.calendar, self.gen_dat,
+        self.hourly_output, self.system_dat, inputs.flexible_tech, self.flexible_net_power,
+        inputs.intermittent_tech, self.area_net_load)
+      return
+    gen_dat = self.gen_dat
+    system_dat = self.system_dat
+    hourly_output = self.hourly_output
+    flexible_net_power = self.flexible_net_power
+    area_net_load = self.area_net_load
+    tech_to_group = inputs.tech_to_group
+    calendar = inputs.calendar
+    flexible_tech = inputs.flexible_tech
+    intermittent_tech = inputs.intermittent_tech
+    columns = [('period', int), ('technology', None), ('fuel', None), ('power', float), ('hour', int), ('project_id', None),
+      ('fuel_cost', float), ('carbon_cost_hourly', float), ('variable_o_m', float),
+      ('spinning_fuel_cost', float), ('spinning_carbon_cost_incurred', float),
+      ('deep_cycling_fuel_cost', float), ('deep_cycling_carbon_cost', float),
+      ('startup_fuel_cost', float), ('startup_nonfuel_cost', float), ('startup_carbon_cost', float),
+      ('co2_tons', float), ('spinning_co2_tons', float), ('deep_cycling_co2_tons', float), ('startup_co2_tons', float)]
+    for (period, tech, fuel, power, tp, project_id,
+         fuel_cost, carbon_cost_hourly, variable_o_m, spinning_fuel_cost, spinning_carbon_cost_incurred,
+         deep_cycling_fuel_cost, deep_cycling_carbon_cost, startup_fuel_cost, startup_nonfuel_cost, startup_carbon_cost,
+         co2_tons, spinning_co2_tons, deep_cycling_co2_tons, startup_co2_tons) in self.read_records(path, columns):
+      tech_group = tech_to_group[tech]
+      cost_var = fuel_cost + carbon_cost_hourly + variable_o_m \
+        + spinning_fuel_cost + spinning_carbon_cost_incurred \
+        + deep_cycling_fuel_cost + deep_cycling_carbon_cost \
+        + startup_fuel_cost + startup_nonfuel_cost + startup_carbon_cost
+      if (period, tech_group) not in gen_dat: continue
+      column = calendar.column(tp)
+      hours_per_year = calendar.hours_per_year[column]
+      hourly_output.add(hourly_output.rows[(period, tech_group)], column, 'power', power)
+      if fuel == 'Storage':
+        if power > 0:
+          gen_dat[(period, tech_group)]['energy_released'] += power * hours_per_year
+        elif power < 0:
+          gen_dat[(period, tech_group)]['energy_stored'] += -1 * power * hours_per_year
+      else:
+        gen_dat[(period, tech_group)]['energy_gen'] += power * hours_per_year
+      gen_dat[(period, tech_group)]['emissions'] += hours_per_year * \
+        (co2_tons + spinning_co2_tons + deep_cycling_co2_tons + startup_co2_tons)
+      gen_dat[(period, tech_group)]['cost_var'] += hours_per_year * cost_var
+      system_dat[period]['energy_produced'] += power * hours_per_year
+      system_dat[period]['total_emissions'] += gen_dat[(period, tech_group)]['emissions']
+      if tech_group in flexible_tech:
+        # There may be multiple records for this project & timepoint because the storage
+        # portion of dispatch is stored in separate records from the non-storage portion
+        # of dispatch for pumped hydro and CAES. In those edge cases, the net generation
+        # of the plant is their sum, grouped by project_id, technology and timepoint.
+        flexible_net_power.add(flexible_net_power.row((tech_group, project_id)), column, 'net_power', power * hours_per_year)
+      if area_net_load is not None and tech_group in intermittent_tech:
+        area_net_load.add_output(project_id, tech, tech_group, column, power)
+
+  # Summarize distribution of hourly_output by identifying select percentiles
+  # This is complicated because different timepoints have different weights.
+  @stages.timed('percentiles')
+  def summarize_output_percentiles(self, periods):
+    hourly_output = self.hourly_output
+    weight_by_column = self.inputs.calendar.weight
+    keys = [ key for key in hourly_output.rows.names if key[0] in periods ]
+    # Timepoints with power output of 0 are skipped in the dispatch file to save disk space/memory
+    # requirements, so populate missing entries with 0's
+    for key in keys:
+      hourly_output.fill(hourly_output.rows[key], self.inputs.calendar.columns_by_period[key[0]])
+    if self.sketch_accuracy is not None:
+      self.sketch_output_percentiles(keys)
+      return
+    # Each record has an associated weight, which add to 1 within a group. The percentile rank of each
+    # record is the cumulative weight of the records with smaller output. See switch_summary/percentiles.py
+    # Ties are ranked in chronological order.
+    rows = [ hourly_output.rows[key] for key in keys ]
+    columns_by_row = [ hourly_output.columns(row) for row in rows ]
+    power = hourly_output.fields['power']
+    groups = [
+      ( [power[hourly_output.cell(row, column)] for column in columns], [weight_by_column[column] for column in columns] )
+      for (row, columns) in zip(rows, columns_by_row) ]
+    rank_field = hourly_output.fields['percentile_rank']
+    for (key, row, columns, (ranks, cut_points)) in zip(keys, rows, columns_by_row,
+        percentiles.weighted_percentiles(groups, self.calculate_percentiles)):
+      for (column, rank) in zip(columns, ranks):
+        rank_field[hourly_output.cell(row, column)] = rank
+      for p in self.calculate_percentiles:
+        self.gen_dat[key]['power_percentiles'][p] = hourly_output.value(row, columns[cut_points[p]], 'power')
+
+  # Approximate the percentiles & percentile ranks of each group with a sketch of its hourly output,
+  # which is built in one pass over the group without sorting it. See switch_summary/sketch.py
+  def sketch_output_percentiles(self, keys):
+    hourly_output = self.hourly_output
+    weight_by_column = self.inputs.calendar.weight
+    rank_field = hourly_output.fields['percentile_rank']
+    for key in keys:
+      row = hourly_output.rows[key]
+      columns = hourly_output.columns(row)
+      values = [ hourly_output.value(row, column, 'power') for column in columns ]
+      power_sketch = sketch.WeightedSketch(self.sketch_accuracy)
+      for (column, value) in zip(columns, values):
+        power_sketch.add(value, weight_by_column[column])
+      for (column, value) in zip(columns, values):
+        rank_field[hourly_output.cell(row, column)] = power_sketch.rank(value)
+      for p in self.calculate_percentiles:
+        self.gen_dat[key]['power_percentiles'][p] = power_sketch.percentile(p)
+      self.power_sketches[key] = power_sketch
+
+  # Transmission dispatch: read & summarize
+  @stages.timed('dispatch aggregation')
+  def summarize_transmission_dispatch(self, path):
+    trans_dat = self.trans_dat
+    hourly_trans = self.hourly_trans
+    flexible_net_power = self.flexible_net_power
+    area_net_load = self.area_net_load
+    corridors = self.corridors
+    calendar = self.inputs.calendar
+    columns = [('period', int), ('hour', int), ('load_area_from', None), ('load_area_receive', None),
+      ('power_sent', float), ('power_received', float)]
+    for (period, timepoint, load_area_send, load_area_receive, power_sent, power_received) in self.read_records(path, columns):
+      column = calendar.column(timepoint)
+      hours_per_year = calendar.hours_per_year[column]
+      flexible_net_power.add(flexible_net_power.row(('Net_Tx', load_area_send)), column, 'net_power', -power_sent)
+      flexible_net_power.add(flexible_net_power.row(('Net_Tx', load_area_receive)), column, 'net_power', power_received)
+      trans_dat[period]['energy_sent'] += power_sent * hours_per_year
+      trans_dat[period]['energy_received'] += power_received * hours_per_year
+      hourly_trans.add(hourly_trans.rows[period], column, 'power_received', power_received)
+      if area_net_load is not None:
+        area_net_load.add_flow(load_area_send, load_area_receive, column, power_sent, power_received)
+      if corridors is not None:
+        corridors.add_flow(load_area_send, load_area_receive, column, power_sent)
+
+  # Summarize distribution of trans_dat energy_received by identifying select percentiles
+  # This is complicated because different timepoints have different weights.
+  @stages.timed('percentiles')
+  def summarize_transmission_percentiles(self, periods):
+    trans_dat = self.trans_dat
+    hourly_trans = self.hourly_trans
+    weight_by_column = self.inputs.calendar.weight
+    trans_periods = [ period for period in trans_dat.keys() if period in periods ]
+    # Records for timepoints with no transmitted power are skipped in the dispatch file to save
+    # disk space/memory, so I need to populate missing entries with 0's
+    rows = [ hourly_trans.rows[period] for period in trans_periods ]
+    for (period, row) in zip(trans_periods, rows):
+      hourly_trans.fill(row, self.inputs.calendar.columns_by_period[period])
+    # Only the percentiles are needed here, not the rank of each timepoint
+    columns_by_row = [ hourly_trans.columns(row) for row in rows ]
+    if self.sketch_accuracy is not None:
+      for (period, row, columns) in zip(trans_periods, rows, columns_by_row):
+        trans_sketch = sketch.WeightedSketch(self.sketch_accuracy)
+        for column in columns:
+          trans_sketch.add(hourly_trans.value(row, column, 'power_received'), weight_by_column[column])
+        for p in self.calculate_percentiles:
+          trans_dat[period]['energy_received_percentiles'][p] = trans_sketch.percentile(p)
+        self.trans_sketches[period] = trans_sketch
+      return
+    power_received = hourly_trans.fields['power_received']
+    groups = [
+      ( [power_received[hourly_trans.cell(row, column)] for column in columns], [weight_by_column[column] for column in columns] )
+      for (row, columns) in zip(rows, columns_by_row) ]
+    for (period, row, columns, (ranks, cut_points)) in zip(trans_periods, rows, columns_by_row,
+        percentiles.weighted_percentiles(groups, self.calculate_percentiles, ranks=False)):
+      for p in self.calculate_percentiles:
+        trans_dat[period]['energy_received_percentiles'][p] = hourly_trans.value(row, columns[cut_points[p]], 'power_received')
+
+  # Calculate overall ramping performed by each source
+  @stages.timed('ramps')
+  def calculate_ramps(self):
+    # Ramps are computed for the whole unit x timepoint matrix at once; see switch_summary/ramps.py
+    for ((period, tech_group), ramp_dat) in ramps.ramp_totals(self.flexible_net_power, self.inputs.calendar).items():
+      for (column, ramp) in ramp_dat.items():
+        self.system_dat[period][column] += ramp
+        if tech_group == 'Net_Tx': self.trans_dat[period][column] += ramp
+        else: self.gen_dat[(period, tech_group)][column] += ramp
+
+  @stages.timed('output')
+  def summarize_totals(self, periods):
+    gen_dat = self.gen_dat
+    trans_dat = self.trans_dat
+    # Summarize transmission
+    for period in trans_dat:
+      if period not in periods: continue
+      trans_dat[period]['capacity_factor'] = trans_dat[period]['energy_sent'] / (trans_dat[period]['rated_cap_MW'] * 8766)
+
+    # Summarize generation
+    for (period, tech_group) in gen_dat:
+      if period not in periods: continue
+      # Add energy released so storage projects will have a more reasonable cap factor; the caveat is
+      # that we aren't including charging in this calculation. This calculation works for non-storage
+      # gen because they have 0 for energy_released. Sometimes legacy generators have 0 capacity if
+      # they were retired early for emissions purposes & fixed cost savings.
+      if gen_dat[(period, tech_group)]['capacity'] == 0:
+        gen_dat[(period, tech_group)]['capacity_factor'] = 0
+      else:
+        gen_dat[(period, tech_group)]['capacity_factor'] = \
+          ( gen_dat[(period, tech_group)]['energy_gen'] + gen_dat[(period, tech_group)]['energy_released'] ) \
+          / ( gen_dat[(period, tech_group)]['capacity'] * 8760 )
+      # Same reasoning & caveats for levelized_costs
+      if ( gen_dat[(period, tech_group)]['energy_gen'] + gen_dat[(period, tech_group)]['energy_released'] ) == 0:
+        gen_dat[(period, tech_group)]['levelized_cost'] = 0
+      else:
+        gen_dat[(period, tech_group)]['levelized_cost'] = \
+          ( gen_dat[(period, tech_group)]['cost_capital'] + gen_dat[(period, tech_group)]['cost_fixed'] + gen_dat[(period, tech_group)]['cost_var'] ) \
+          / ( gen_dat[(period, tech_group)]['energy_gen'] + gen_dat[(period, tech_group)]['energy_released'] )
+
+  # Apply intermittent power output to net load
+  @stages.timed('percentiles')
+  def calculate_net_load(self, periods):
+    hourly_net_load = self.hourly_net_load
+    weight_by_column = self.inputs.calendar.weight
+    load_periods = [ period for period in hourly_net_load.rows.names if period in periods ]
+    rows = [ hourly_net_load.rows[period] for period in load_periods ]
+    columns_by_row = [ hourly_net_load.columns(row) for row in rows ]
+    load = hourly_net_load.fields['load']
+    net_load = hourly_net_load.fields['net_load']
+    for (period, row, columns) in zip(load_periods, rows, columns_by_row):
+      for column in columns:
+        cell = hourly_net_load.cell(row, column)
+        net_load[cell] = load[cell]
+        for tech_group in self.inputs.intermittent_tech:
+          net_load[cell] -= self.intermittent_output(period, tech_group, column)
+
+    # Calculate percentile rankings for net load values. See hourly_output calculations above for weight-based implementation notes
+    groups = [
+      ( [net_load[hourly_net_load.cell(row, column)] for column in columns], [weight_by_column[column] for column in columns] )
+      for (row, columns) in zip(rows, columns_by_row) ]
+    rank_field = hourly_net_load.fields['percentile_rank']
+    for (row, columns, (ranks, cut_points)) in zip(rows, columns_by_row, percentiles.weighted_percentiles(groups, ())):
+      for (column, rank) in zip(columns, ranks):
+        rank_field[hourly_net_load.cell(row, column)] = rank
+
+  # Output of an intermittent tech group in a timepoint column, or 0 if it has no record
+  def intermittent_output(self, period, tech_group, column):
+    hourly_output = self.hourly_output
+    if (period, tech_group) not in hourly_output.rows: return 0
+    row = hourly_output.rows[(period, tech_group)]
+    if hourly_output.state[hourly_output.cell(row, column)] == encoding.absent: return 0
+    return hourly_output.value(row, column, 'power')
+
+  # Release the hourly data of these periods after their summaries have been written
+  # hourly_output & flexible_net_power only hold the rows of the periods being streamed, and
+  # hourly_trans & hourly_net_load only have one row per period.
+  def clear_period_state(self, periods):
+    self.hourly_output.clear()
+    self.flexible_net_power.clear()
+
+  # Split a results file into one file per period in tmp_dir. Returns a dict of period: path
+  @stages.timed('dispatch aggregation')
+  def partition_by_period(self, path, tmp_dir):
+    f = compressed.open_file(path)
+    header = f.readline()
+    period_column = header.rstrip('\r\n').split('\t').index('period')
+    partitions = {}
+    partition_files = {}
+    for line in f:
+      period = int(line.split('\t', period_column + 1)[period_column])
+      if period not in partition_files:
+        partitions[period] = os.path.join(tmp_dir, str(period) + '_' + os.path.basename(compressed.base_name(path)))
+        partition_files[period] = open(partitions[period], 'wb')
+        partition_files[period].write(header)
+      partition_files[period].write(line)
+    f.close()
+    for period in partition_files: partition_files[period].close()
+    return partitions
+
+  # The header of each summary file. id_columns are the leading columns that identify the run, either
+  # scenario_id or scenario_id & carbon_cost.
+  def summary_headers(self, id_columns):
+    headers = {}
+    non_percentile_columns = [i for i in sorted(gen_dat_template.keys()) if i != 'power_percentiles' ] #&& i != 'vintages']
+    percentile_columns = ['percentile_' + str(p) for p in self.calculate_percentiles]
+    headers['gen_summary'] = id_columns + ['period', 'technology'] + non_percentile_columns + percentile_columns
+    headers['gen_percentiles'] = id_columns + ['period', 'technology', 'percentile_num', 'percentile_value']
+    headers['gen_hourly_summary'] = id_columns + ['period', 'technology', 'timepoint'] + hourly_output_template.keys()
+    headers['sys_summary'] = id_columns + ['period'] + system_dat_template.keys()
+    non_percentile_columns = [i for i in sorted(trans_dat_template.keys()) if i != 'energy_received_percentiles']
+    headers['trans_summary'] = id_columns + ['period'] + non_percentile_columns + percentile_columns
+    headers['ramp_summary'] = id_columns + ['period', 'source', "total_hourly_up_ramp", "total_hourly_down_ramp", "up_ramp_%", "down_ramp_%"]
+    headers['net_load_hourly_summary'] = id_columns + ['period', 'timepoint'] + \
+      hourly_net_load_template.keys() + \
+      ['"' + tech_group + '"' for tech_group in self.inputs.intermittent_tech] + \
+      ['weight', 'month_of_year', 'hour_of_day']
+    headers['area_net_load_summary'] = id_columns + ['period', 'area_type', 'area', 'measure', 'average'] + percentile_columns
+    headers['area_net_load_hourly_summary'] = id_columns + ['period', 'area_type', 'area', 'timepoint'] + areas.hourly_columns + \
+      [measure + '_duration_hours' for measure in areas.measures] + ['weight', 'hours_per_year']
+    headers['trans_corridor_summary'] = id_columns + ['period', 'load_area_from', 'load_area_receive'] + \
+      congestion.summary_columns + ['utilization_percentile_' + str(p) for p in self.calculate_percentiles]
+    return headers
+
+  # Open the text summary files in output_dir and write their headers. Summaries that are written as
+  # Parquet are left out. The technology, source & area names are quoted.
+  def open_summary_files(self, output_dir, id_columns, compression=None, keep_tables=False):
+    headers = self.summary_headers(id_columns)
+    outputs = {}
+    for name in self.text_summary_names:
+      quoted = [ i for (i, column) in enumerate(headers[name]) if column in ('technology', 'source', 'area', 'load_area_from', 'load_area_receive') ]
+      outputs[name] = tables.SummaryFile(os.path.join(output_dir, name + '.txt'), name, headers[name], quoted,
+        compression if name in hourly_summary_names else None, keep_tables)
+    return outputs
+
+  # Write the summary records of these periods. Periods need to be written in sorted order.
+  @stages.timed('output')
+  def write_summaries(self, outputs, periods, id_values):
+    gen_dat = self.gen_dat
+    system_dat = self.system_dat
+    trans_dat = self.trans_dat
+    hourly_output = self.hourly_output
+    hourly_net_load = self.hourly_net_load
+    calendar = self.inputs.calendar
+    calculate_percentiles = self.calculate_percentiles
+    # Print summaries about generators
+    if 'gen_summary' in outputs:
+      non_percentile_columns = [i for i in sorted(gen_dat_template.keys()) if i != 'power_percentiles' ] #&& i != 'vintages']
+      for (period, tech_group) in sorted([ key for key in gen_dat.keys() if key[0] in periods ]):
+        outputs['gen_summary'].write(
+          id_values + [period, tech_group] + \
+          [gen_dat[(period, tech_group)][key] for key in non_percentile_columns] + \
+          [gen_dat[(period, tech_group)]['power_percentiles'][p] for p in calculate_percentiles])
+
+    # Print generation percentile summaries in normalized form
+    if 'gen_percentiles' in outputs:
+      for (period, tech_group) in sorted([ key for key in gen_dat.keys() if key[0] in periods ]):
+        for p in calculate_percentiles:
+          outputs['gen_percentiles'].write(
+            id_values + [period, tech_group, p, gen_dat[(period, tech_group)]['power_percentiles'][p]])
+
+    # Print hourly summaries about power production
+    if 'gen_hourly_summary' in outputs:
+      for (period, tech_group) in sorted([ key for key in hourly_output.rows.names if key[0] in periods ]):
+        row = hourly_output.rows[(period, tech_group)]
+        for column in hourly_output.columns(row):
+          record = {
+            'power': hourly_output.value(row, column, 'power'),
+            'hours_per_year': calendar.hours_per_year[column], 'weight': calendar.weight[column],
+            'percentile_rank': reported_rank(hourly_output.value(row, column, 'percentile_rank'))
+          }
+          outputs['gen_hourly_summary'].write(
+            id_values + [period, tech_group, calendar.timepoint[column]] + [record[key] for key in hourly_output_template.keys()])
+
+    # Print system summary
+    if 'sys_summary' in outputs:
+      for period in sorted([ period for period in system_dat.keys() if period in periods ]):
+        outputs['sys_summary'].write(
+          id_values + [period] + [system_dat[period][key] for key in system_dat_template.keys()])
+
+    # Print transmission summary
+    if 'trans_summary' in outputs:
+      non_percentile_columns = [i for i in sorted(trans_dat_template.keys()) if i != 'energy_received_percentiles']
+      for period in sorted([ period for period in trans_dat.keys() if period in periods ]):
+        outputs['trans_summary'].write(
+          id_values + [period] + [trans_dat[(period)][key] for key in non_percentile_columns] + [trans_dat[period]['energy_received_percentiles'][p] for p in calculate_percentiles])
+
+    # Print ramping summary. Transmission ramps are written after all periods by write_transmission_ramps()
+    if 'ramp_summary' in outputs:
+      for (period, tech_group) in sorted([ (period,tech_group) for (period,tech_group) in gen_dat.keys() if tech_group in self.inputs.flexible_tech and period in periods ]):
+        outputs['ramp_summary'].write( id_values + [
+          period, tech_group,
+          gen_dat[(period, tech_group)]['total_hourly_up_ramp'],
+          gen_dat[(period, tech_group)]['total_hourly_down_ramp'],
+          gen_dat[(period, tech_group)]['total_hourly_up_ramp'] / system_dat[period]['total_hourly_up_ramp'],
+          gen_dat[(period, tech_group)]['total_hourly_down_ramp'] / system_dat[period]['total_hourly_down_ramp']
+        ])
+
+    # Print hourly summaries about net load
+    if 'net_load_hourly_summary' in outputs:
+      for period in sorted([ period for period in hourly_net_load.rows.names if period in periods ]):
+        row = hourly_net_load.rows[period]
+        for column in hourly_net_load.columns(row):
+          record = {
+            'load': hourly_net_load.value(row, column, 'load'), 'net_load': hourly_net_load.value(row, column, 'net_load'),
+            'percentile_rank': reported_rank(hourly_net_load.value(row, column, 'percentile_rank'))
+          }
+          outputs['net_load_hourly_summary'].write(
+            id_values + [period, calendar.timepoint[column]] + \
+            [record[key] for key in hourly_net_load_template.keys()] + \
+            [self.intermittent_output(period, tech_group, column) for tech_group in self.inputs.intermittent_tech] + \
+            [calendar.weight[column], calendar.month_of_year[column], calendar.hour_of_day[column] ] \
+          )
+
+  @stages.timed('output')
+  def write_transmission_ramps(self, outputs, id_values):
+    if 'ramp_summary' not in outputs: return
+    trans_dat = self.trans_dat
+    system_dat = self.system_dat
+    for period in sorted(trans_dat.keys()):
+      outputs['ramp_summary'].write( id_values + [
+        period, 'Net_Tx',
+        trans_dat[(period)]['total_hourly_up_ramp'],
+        trans_dat[(period)]['total_hourly_down_ramp'],
+        trans_dat[(period)]['total_hourly_up_ramp'] / system_dat[period]['total_hourly_up_ramp'],
+        trans_dat[(period)]['total_hourly_down_ramp'] / system_dat[period]['total_hourly_down_ramp']
+      ])
+
+  # Write the net load summaries of each load area & balancing area, one period at a time
+  @stages.timed('area net load')
+  def write_area_summaries(self, outputs, periods, id_values):
+    calendar = self.inputs.calendar
+    for area_values in self.area_net_load.area_values(periods):
+      (durations, summaries) = areas.distributions(area_values, calendar, self.calculate_percentiles)
+      for (i, (period, area_type, area, columns, values)) in enumerate(area_values):
+        if 'area_net_load_summary' in outputs:
+          for measure in areas.measures:
+            outputs['area_net_load_summary'].write(
+              id_values + [period, area_type, area, measure, summaries[i][measure]['average']] + \
+              [summaries[i][measure][p] for p in self.calculate_percentiles])
+        if 'area_net_load_hourly_summary' in outputs:
+          for (j, column) in enumerate(columns):
+            outputs['area_net_load_hourly_summary'].write(
+              id_values + [period, area_type, area, calendar.timepoint[column]] + \
+              [values[key][j] for key in areas.hourly_columns] + \
+              [durations[i][measure][j] for measure in areas.measures] + \
+              [calendar.weight[column], calendar.hours_per_year[column]])
+
+  # Write the utilization & congestion summary of each transmission path, one period at a time
+  @stages.timed('corridors')
+  def write_corridor_summary(self, outputs, periods, id_values):
+    if 'trans_corridor_summary' not in outputs: return
+    for period in periods:
+      for ((load_area_from, load_area_receive), record) in self.corridors.summarize(period, self.calculate_percentiles):
+        outputs['trans_corridor_summary'].write(
+          id_values + [period, load_area_from, load_area_receive] + \
+          [record[key] for key in congestion.summary_columns] + [record[p] for p in self.calculate_percentiles])
+
+  @stages.timed('output')
+  def write_sketches(self):
+    """Save the sketches of this carbon cost to results/percentile_sketches_<carbon cost>.pickle, from
+    which they can be merged with the sketches of other carbon costs & scenarios."""
+    sketch.write_sketches(os.path.join(self.results_dir, 'percentile_sketches_%s.pickle' % self.carbon_cost), {
+      'scenario_id': self.scenario_id, 'carbon_cost': self.carbon_cost, 'relative_accuracy': self.sketch_accuracy,
+      'power': self.power_sketches, 'energy_received': self.trans_sketches })
+
+  def write_run_times(self, stages_before, seconds, cpu_seconds):
+    """Report the measurements of the stages of run() and append them to results/run_times.txt, with
+    the total of the run, and save the cProfile statistics of the profiled stage; see
+    switch_summary/stages.py"""
+    input_measured = self.inputs.parse_measurements(self.scenario_dir, self.carbon_cost)
+    seconds += sum( stage_measured['wall_seconds'] for (stage, stage_measured) in input_measured )
+    cpu_seconds += sum( stage_measured['cpu_seconds'] for (stage, stage_measured) in input_measured )
+    measured = stages.merge_measurements(input_measured, stages.measurements(stages_before))
+    rows = sum( stage_measured['rows'] for (stage, stage_measured) in measured )
+    measured.append(('total', { 'wall_seconds': seconds, 'cpu_seconds': cpu_seconds, 'rows': rows,
+      'rows_per_second': rows / seconds if seconds > 0 else None, 'peak_rss_mb': stages.peak_rss_mb() }))
+    stages.append_run_times(os.path.join(self.results_dir, 'run_times.txt'), self.scenario_id, self.carbon_cost, measured)
+    print "Stages of summarizing carbon cost %s:\n%s" % (self.carbon_cost, '\n'.join(stages.format_measurements(measured)))
+    profile_path = os.path.join(self.results_dir, 'summarize_profile_%s.pstats' % self.carbon_cost)
+    if stages.write_profile(profile_path):
+      print "cProfile statistics of the %s stage were saved to %s. View them with python -m pstats." % (stages.profile_stage, profile_path)
+
+  # Write the Parquet summaries of these periods to parquet_dir, one partition per period
+  @stages.timed('output')
+  def write_partitions(self, periods):
+    partitioned = self.partitioned
+    inputs = self.inputs
+    gen_columns = [i for i in sorted(gen_dat_template.keys()) if i != 'power_percentiles' ]
+    trans_columns = [i for i in sorted(trans_dat_template.keys()) if i != 'energy_received_percentiles']
+    by_column = partitioned.timepoint_columns(inputs.calendar)
+    for period in periods:
+      path = lambda table: partitioned.partition_path(self.parquet_dir, table, self.scenario_id, self.carbon_cost, period)
+      partitioned.write_gen_summary(path('gen_summary'), period, self.gen_dat, gen_columns, self.calculate_percentiles)
+      partitioned.write_gen_hourly_summary(path('gen_hourly_summary'), period, self.hourly_output, by_column)
+      if period in self.trans_dat:
+        partitioned.write_trans_summary(path('trans_summary'), period, self.trans_dat, trans_columns, self.calculate_percentiles)
+      partitioned.write_ramp_summary(path('ramp_summary'), period, self.gen_dat, self.trans_dat, self.system_dat, inputs.flexible_tech)
+      if period in self.hourly_net_load.rows:
+        partitioned.write_net_load_hourly_summary(path('net_load_hourly_summary'), period,
+          self.hourly_net_load, self.hourly_output, inputs.intermittent_tech, by_column)
+
+  def run(self, output_dir=None, with_carbon_cost_column=False, keep_tables=False):
+    """Summarize the results files that export.run wrote for this carbon cost, and write the summaries
+    to output_dir, which defaults to the results directory. Returns a dict of name: Table of the text
+    summaries if keep_tables is set."""
+    if output_dir is None: output_dir = self.results_dir
+    carbon_cost = self.carbon_cost
+    if stages.enabled:
+      stages_before = stages.snapshot()
+      (start_time, start_cpu) = (time.time(), stages.process_cpu_seconds())
+    path=self.results_path('gen_cap_' + carbon_cost + '.txt')
+    if os.path.isfile(path):
+      self.read_generation_capacity(path)
+    else:
+      print "Error! " + path + " not found."
+    path=self.results_path('trans_cap_' + carbon_cost + '.txt')
+    if os.path.isfile(path):
+      self.read_transmission_capacity(path)
+    else:
+      print "Error! " + path + " not found."
+    path=self.results_path('cost_summary_' + carbon_cost + '.txt')
+    if not os.path.isfile(path):
+      path=self.results_path('cost_summary.txt')
+    if os.path.isfile(path):
+      self.read_cost_summary(path)
+    else:
+      print "Error! " + path + " not found."
+
+    dispatch_path=self.results_path('generator_and_storage_dispatch_' + carbon_cost + '.txt')
+    trans_dispatch_path=self.results_path('transmission_dispatch_' + carbon_cost + '.txt')
+    for path in [dispatch_path, trans_dispatch_path]:
+      if not os.path.isfile(path):
+        print "Error! " + path + " not found."
+
+    if with_carbon_cost_column:
+      id_columns, id_values = ['scenario_id', 'carbon_cost'], [self.scenario_id, carbon_cost]
+    else:
+      id_columns, id_values = ['scenario_id'], [self.scenario_id]
+    outputs = self.open_summary_files(output_dir, id_columns, self.compression, keep_tables)
+    study_periods = sorted(self.system_dat.keys())
+    if self.streaming:
+      tmp_dir = tempfile.mkdtemp(prefix='summarize_', dir=self.results_dir)
+      try:
+        dispatch_partitions = {}
+        trans_dispatch_partitions = {}
+        if os.path.isfile(dispatch_path):
+          dispatch_partitions = self.partition_by_period(dispatch_path, tmp_dir)
+        if os.path.isfile(trans_dispatch_path):
+          trans_dispatch_partitions = self.partition_by_period(trans_dispatch_path, tmp_dir)
+        for period in study_periods:
+          self.init_hourly_output([period])
+          if period in dispatch_partitions:
+            self.summarize_dispatch(dispatch_partitions[period])
+          self.summarize_output_percentiles([period])
+          if period in trans_dispatch_partitions:
+            self.summarize_transmission_dispatch(trans_dispatch_partitions[period])
+          self.summarize_transmission_percentiles([period])
+          self.calculate_ramps()
+          self.summarize_totals([period])
+          self.calculate_net_load([period])
+          self.write_summaries(outputs, [period], id_values)
+          if self.parquet_dir is not None: self.write_partitions([period])
+          self.clear_period_state([period])
+      finally:
+        shutil.rmtree(tmp_dir)
+    else:
+      self.init_hourly_output(study_periods)
+      if os.path.isfile(dispatch_path):
+        self.summarize_dispatch(dispatch_path)
+      self.summarize_output_percentiles(study_periods)
+      if os.path.isfile(trans_dispatch_path):
+        self.summarize_transmission_dispatch(trans_dispatch_path)
+      self.summarize_transmission_percentiles(study_periods)
+      self.calculate_ramps()
+      self.summarize_totals(study_periods)
+      self.calculate_net_load(study_periods)
+      self.write_summaries(outputs, study_periods, id_values)
+      if self.parquet_dir is not None: self.write_partitions(study_periods)
+    self.write_transmission_ramps(outputs, id_values)
+    if self.area_net_load is not None: self.write_area_summaries(outputs, study_periods, id_values)
+    if self.corridors is not None: self.write_corridor_summary(outputs, study_periods, id_values)
+    for name in outputs: outputs[name].close()
+    if self.sketch_accuracy is not None: self.write_sketches()
+    if stages.enabled:
+      self.write_run_times(stages_before, time.time() - start_time, stages.process_cpu_seconds() - start_cpu)
+    if keep_tables:
+      return dict( (name, outputs[name].table) for name in outputs )
+
+
+# The rank of the smallest value of a group is reported as an integer 0, like filled cells
+def reported_rank(rank):
+  return 0 if rank == 0 else rank
+
+
+# Batch mode worker. Each worker process is forked from the main process after the shared inputs
+# have been read, and is only used for one carbon cost, so it starts with the parsed inputs and
+# makes its own Summary.
+_batch = {}
+
+def _summarize_batch_member(carbon_cost):
+  output_dir = os.path.join(_batch['batch_dir'], carbon_cost)
+  os.mkdir(output_dir)
+  # Only the combined summaries are compressed
+  options = dict(_batch['options'], compression=None)
+  summary = Summary(_batch['inputs'], _batch['scenario_dir'], carbon_cost, **options)
+  return summary.run(output_dir, with_carbon_cost_column=True, keep_tables=_batch['keep_tables'])
+
+
+def summarize_batch(inputs, scenario_dir, carbon_costs, workers=None, keep_tables=False, **options):
+  """Summarize several carbon costs of a scenario and write combined summaries with a carbon_cost
+  column to its results directory. The carbon costs are summarized in parallel by a pool of workers,
+  or one after the other in this process if workers is 1. options are passed to Summary. Returns a
+  dict of name: Table of the combined text summaries if keep_tables is set."""
+  results_dir = os.path.join(scenario_dir, 'results')
+  batch_dir = tempfile.mkdtemp(prefix='summarize_batch_', dir=results_dir)
+  _batch.update(inputs=inputs, scenario_dir=scenario_dir, batch_dir=batch_dir, options=options, keep_tables=keep_tables)
+  # The first carbon cost reports the input parse, also in the workers, which get a copy of inputs
+  inputs.parse_measurements(scenario_dir, carbon_costs[0])
+  try:
+    if workers == 1:
+      member_tables = map(_summarize_batch_member, carbon_costs)
+    else:
+      pool = multiprocessing.Pool(processes=workers, maxtasksperchild=1)
+      member_tables = pool.map(_summarize_batch_member, carbon_costs, chunksize=1)
+      pool.close()
+      pool.join()
+    combine_summaries(results_dir, batch_dir, carbon_costs, options.get('parquet_dir'), options.get('compression'),
+      options.get('area_net_load', False), options.get('corridors', False))
+  finally:
+    shutil.rmtree(batch_dir)
+    _batch.clear()
+  if keep_tables:
+    combined = {}
+    for name in text_summary_names(options.get('parquet_dir'), options.get('area_net_load', False), options.get('corridors', False)):
+      combined[name] = tables.Table(name, member_tables[0][name].columns,
+        [ row for member in member_tables for row in member[name].rows ])
+    return combined
+
+
+def combine_summaries(results_dir, batch_dir, carbon_costs, parquet_dir=None, compression=None, area_net_load=False,
+    corridors=False):
+  """Combine the text summaries that were written to batch_dir/<carbon cost> for each carbon cost
+  into one set of files in results_dir. Each file is written under a temporary name and then
+  renamed, so readers of results_dir never see a partial summary."""
+  for name in text_summary_names(parquet_dir, area_net_load, corridors):
+    path = os.path.join(results_dir, name + '.txt')
+    summary_compression = compression if name in hourly_summary_names else None
+    summary_output = compressed.open_output(path + '.tmp', summary_compression, "w")
+    for i, carbon_cost in enumerate(carbon_costs):
+      f = open(os.path.join(batch_dir, carbon_cost, name + '.txt'), 'rb')
+      header = f.readline()
+      if i == 0: summary_output.write(header)
+      shutil.copyfileobj(f, summary_output)
+      f.close()
+    summary_output.close()
+    compressed.rename_output(path + '.tmp', path, summary_compression)
+
+
+def summarize_scenarios(scenario_dirs, carbon_costs=None, keep_tables=True, workers=1, **options):
+  """Summarize a list of scenario directories in this process, writing the summaries to the results
+  directory of each. Scenarios whose input files are identical share one parsed Inputs. With a list
+  of carbon_costs, or every carbon cost in results/ if it is None, the combined summaries of the
+  carbon costs are written as with summarize_batch(); with a single carbon cost such as '0', the
+  summaries of that carbon cost are written. options are passed to Summary.
+  Returns a dict of scenario_dir: {carbon_cost or 'batch': {name: Table}} if keep_tables is set."""
+  inputs_by_key = {}
+  scenario_tables = {}
+  for scenario_dir in scenario_dirs:
+    key = input_key(scenario_dir)
+    if key not in inputs_by_key:
+      inputs_by_key[key] = Inputs(scenario_dir)
+    inputs = inputs_by_key[key]
+    if isinstance(carbon_costs, basestring):
+      summary = Summary(inputs, scenario_dir, carbon_costs, **options)
+      scenario_tables[scenario_dir] = { carbon_costs: summary.run(keep_tables=keep_tables) }
+    else:
+      costs = carbon_costs if carbon_costs is not None else find_carbon_costs(scenario_dir)
+      scenario_tables[scenario_dir] = { 'batch': summarize_batch(inputs, scenario_dir, costs, workers, keep_tables, **options) }
+  if keep_tables: return scenario_tables
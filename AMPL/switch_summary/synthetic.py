@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# Synthetic SWITCH scenarios for benchmarking summarize_results.py
+# Real results directories are too big to check in, so this writes a scenario directory with the
+# inputs/ and results/ files that summarize_results.py reads: study_hours, tech_grouping,
+# generator_info, system_load, max_system_loads, transmission_lines & load_areas inputs, and the gen_cap,
+# trans_cap, cost_summary, generator_and_storage_dispatch & transmission_dispatch results of each
+# carbon cost. As export.run overwrites cost_summary.txt for each carbon cost, it is left with the last
+# one. The columns follow export.run, and the values are random but repeatable for a seed.
+#
+# The size of a scenario is set by the number of periods, dates per period, hours per date,
+# projects, load areas and tech groups. The generator & storage dispatch file has a record for
+# most (project, timepoint) pairs, which is what makes real results files large.
+#   python -m switch_summary.synthetic bench/small --periods 2 --projects 50
+import os
+import random
+import argparse
+
+dispatch_columns = [
+  'scenario_id', 'carbon_cost', 'period', 'project_id', 'load_area_id', 'load_area', 'balancing_area',
+  'date', 'hour', 'technology_id', 'technology', 'new', 'baseload', 'cogen', 'storage', 'fuel',
+  'fuel_category', 'hours_in_sample', 'power', 'co2_tons', 'heat_rate', 'fuel_cost', 'carbon_cost_hourly',
+  'variable_o_m', 'spinning_reserve', 'quickstart_capacity', 'total_operating_reserve', 'spinning_co2_tons',
+  'spinning_fuel_cost', 'spinning_carbon_cost_incurred', 'deep_cycling_amount', 'deep_cycling_fuel_cost',
+  'deep_cycling_carbon_cost', 'deep_cycling_co2_tons', 'mw_started_up', 'startup_fuel_cost',
+  'startup_nonfuel_cost', 'startup_carbon_cost', 'startup_co2_tons'
+]
+transmission_dispatch_columns = [
+  'scenario_id', 'carbon_cost', 'period', 'transmission_line_id', 'load_area_receive_id', 'load_area_from_id',
+  'load_area_receive', 'load_area_from', 'date', 'hour', 'rps_fuel_category', 'power_sent', 'power_received',
+  'hours_in_sample'
+]
+
+# Kinds of technologies, cycled through the tech groups: (fuel, dispatchable, storage, intermittent)
+tech_kinds = [
+  ('Gas', 1, 0, 0), ('Storage', 0, 1, 0), ('Wind', 0, 0, 1), ('Uranium', 0, 0, 0), ('Coal', 1, 0, 0),
+  ('Solar', 0, 0, 1), ('Water', 1, 0, 0)
+]
+
+# Load areas per balancing area
+load_areas_per_balancing_area = 5
+
+# Fraction of (project, timepoint) dispatch records that are left out, as AMPL omits 0 values
+missing_dispatch_fraction = 0.3
+
+# Size presets for the benchmark, from a quick check to roughly the size of a WECC-wide run
+sizes = {
+  'small': dict(periods=2, dates=4, hours=6, projects=50, load_areas=5, tech_groups=5),
+  'medium': dict(periods=3, dates=12, hours=12, projects=500, load_areas=20, tech_groups=10),
+  'large': dict(periods=4, dates=12, hours=24, projects=2000, load_areas=30, tech_groups=15),
+  'wecc': dict(periods=4, dates=12, hours=24, projects=6000, load_areas=50, tech_groups=20),
+}
+size_order = ['small', 'medium', 'large', 'wecc']
+
+
+def _write_table(path, columns, rows, ampl_header=None):
+  f = open(path, 'wb')
+  if ampl_header is not None: f.write(ampl_header + '\n')
+  f.write('\t'.join(columns) + '\n')
+  for row in rows:
+    f.write('\t'.join(row) + '\n')
+  f.close()
+
+
+def make_scenario(directory, periods=2, dates=4, hours=6, projects=50, load_areas=5, tech_groups=5,
+                  techs_per_group=2, carbon_costs=(0,), scenario_id=42, seed=1):
+  """Write a synthetic scenario into directory. Returns the number of dispatch records per carbon cost."""
+  rnd = random.Random(seed)
+  for sub in ('inputs', 'results'):
+    if not os.path.isdir(os.path.join(directory, sub)): os.makedirs(os.path.join(directory, sub))
+  open(os.path.join(directory, 'scenario_id.txt'), 'wb').write('%d\n' % scenario_id)
+
+  # Timepoints are YYYYMMDDHH ids. Dates are spread over the months of a year a few years after the
+  # start of each period, and hours are spread over the day.
+  period_list = [ 2016 + 10 * i for i in range(periods) ]
+  timepoints = [] # (timepoint, period, date)
+  study_hours = []
+  for period in period_list:
+    for d in range(dates):
+      month = 1 + (d * 12) // dates
+      date = (period + 4) * 10000 + month * 100 + 1 + d % 28
+      hours_in_sample = 87660.0 / (dates * hours) * rnd.choice([0.5, 1.0, 1.5])
+      for h in range(hours):
+        hour_of_day = h * 24 // hours
+        timepoint = date * 100 + hour_of_day
+        timepoints.append( (timepoint, period, date) )
+        study_hours.append( [ str(timepoint), str(period), str(date), '%.1f' % hours_in_sample, str(month), str(hour_of_day) ] )
+  _write_table(os.path.join(directory, 'inputs/study_hours.tab'),
+    ['hour', 'period', 'date', 'hours_in_sample', 'month_of_year', 'hour_of_day'], study_hours, 'ampl.tab 1 5')
+
+  # Technologies & their groups. Group names have spaces & quotes like the real tech_grouping.txt.
+  technologies = [] # (technology, tech_group, kind)
+  for g in range(tech_groups):
+    kind = tech_kinds[g % len(tech_kinds)]
+    for t in range(techs_per_group):
+      technologies.append( ('%s_%d_%d' % (kind[0], g, t), '"%s Group %d"' % (kind[0], g), kind) )
+  _write_table(os.path.join(directory, 'inputs/tech_grouping.txt'), ['technology', 'tech_group'],
+    [ [tech, group] for (tech, group, kind) in technologies ])
+  _write_table(os.path.join(directory, 'inputs/generator_info.tab'),
+    ['technology', 'technology_id', 'fuel', 'dispatchable', 'storage', 'intermittent'],
+    [ [tech, str(i + 1), kind[0], str(kind[1]), str(kind[2]), str(kind[3])]
+      for (i, (tech, group, kind)) in enumerate(technologies) ], 'ampl.tab 1 5')
+
+  # Load areas, loads and transmission lines between neighboring & some random load areas
+  areas = [ 'LA_%d' % i for i in range(load_areas) ]
+  balancing_area_of = dict( (area, 'BA_%d' % (i // load_areas_per_balancing_area + 1)) for (i, area) in enumerate(areas) )
+  _write_table(os.path.join(directory, 'inputs/load_areas.tab'), ['load_area', 'load_area_id', 'balancing_area'],
+    ( [area, str(i + 1), balancing_area_of[area]] for (i, area) in enumerate(areas) ), 'ampl.tab 1 2')
+  _write_table(os.path.join(directory, 'inputs/system_load.tab'),
+    ['load_area', 'hour', 'system_load', 'present_day_system_load'],
+    ( [area, str(tp), str(rnd.randint(100, 3000)), '0'] for area in areas for (tp, period, date) in timepoints ),
+    'ampl.tab 2 2')
+  _write_table(os.path.join(directory, 'inputs/max_system_loads.tab'), ['load_area', 'period', 'max_system_load'],
+    ( [area, str(period), str(rnd.randint(3000, 4000))] for area in areas for period in period_list ), 'ampl.tab 2 1')
+  lines = [ (areas[i], areas[j]) for i in range(load_areas) for j in range(load_areas)
+    if i != j and (abs(i - j) == 1 or rnd.random() < 2.0 / load_areas) ]
+  _write_table(os.path.join(directory, 'inputs/transmission_lines.tab'),
+    ['load_area_start', 'load_area_end', 'transmission_line_id', 'transmission_length_km', 'transmission_efficiency',
+     'transmission_derating_factor'],
+    ( [start, end, str(i + 1), '%.3f' % rnd.uniform(50, 900), '%.4f' % rnd.uniform(0.9, 1), '%.2f' % rnd.uniform(0.5, 1)]
+      for (i, (start, end)) in enumerate(lines) ), 'ampl.tab 2 4')
+
+  project_list = [ (pid, technologies[rnd.randrange(len(technologies))], areas[rnd.randrange(load_areas)])
+    for pid in range(1, projects + 1) ]
+  area_id = dict( (area, str(i + 1)) for (i, area) in enumerate(areas) )
+  technology_id = dict( (tech, str(i + 1)) for (i, (tech, group, kind)) in enumerate(technologies) )
+  # Formatted random values are drawn from a pool, which is much faster than formatting each one
+  value_pool = [ '%.2f' % rnd.uniform(0, 50) for i in range(4096) ]
+  dispatch_records = 0
+  cost_summary_columns = ['scenario_id', 'carbon_cost', 'period', 'Power_Cost_Per_Period', 'Total_Cost_Per_Period']
+  for carbon_cost in carbon_costs:
+    cc = str(carbon_cost)
+    _write_table(os.path.join(directory, 'results/gen_cap_%s.txt' % cc),
+      ['scenario_id', 'carbon_cost', 'period', 'project_id', 'load_area_id', 'load_area', 'technology_id', 'technology',
+       'site', 'new', 'baseload', 'cogen', 'fuel', 'capacity', 'storage_energy_capacity', 'capital_cost', 'fixed_o_m_cost'],
+      ( [str(scenario_id), cc, str(period), str(pid), area_id[area], area, technology_id[tech], tech, 'na', '1', '0', '0',
+         kind[0], '%.2f' % rnd.uniform(0, 500),
+         '%.2f' % (rnd.uniform(0, 3000) if kind[2] else 0), '%.2f' % rnd.uniform(0, 1e7), '%.2f' % rnd.uniform(0, 1e6)]
+        for (pid, (tech, group, kind), area) in project_list for period in period_list ))
+    _write_table(os.path.join(directory, 'results/trans_cap_%s.txt' % cc),
+      ['scenario_id', 'carbon_cost', 'period', 'start', 'end', 'new', 'trans_mw', 'fixed_cost'],
+      ( [str(scenario_id), cc, str(period), start, end, '0', '%.2f' % rnd.uniform(100, 2000), '%.2f' % rnd.uniform(0, 1e6)]
+        for (start, end) in lines for period in period_list ))
+    cost_summary = [ [str(scenario_id), cc, str(period), '%.4f' % rnd.uniform(50, 150), '0.0000'] for period in period_list ]
+    _write_table(os.path.join(directory, 'results/cost_summary_%s.txt' % cc), cost_summary_columns, cost_summary)
+    _write_table(os.path.join(directory, 'results/cost_summary.txt'), cost_summary_columns, cost_summary)
+
+    f = open(os.path.join(directory, 'results/generator_and_storage_dispatch_%s.txt' % cc), 'wb')
+    f.write('\t'.join(dispatch_columns) + '\n')
+    dispatch_records = 0
+    for (pid, (tech, group, kind), area) in project_list:
+      prefix = '\t'.join([str(scenario_id), cc]) + '\t'
+      for (tp, period, date) in timepoints:
+        if rnd.random() < missing_dispatch_fraction: continue
+        power = rnd.uniform(-200, 200) if kind[2] else rnd.uniform(0, 300)
+        values = [ value_pool[rnd.getrandbits(12)] for i in range(20) ]
+        f.write(prefix + '\t'.join([ str(period), str(pid), area_id[area], area, balancing_area_of[area], str(date), str(tp),
+          technology_id[tech], tech,
+          '1', '0', '0', str(kind[2]), kind[0], 'na', '10.00', '%.2f' % power ] + values) + '\n')
+        dispatch_records += 1
+    f.close()
+
+    _write_table(os.path.join(directory, 'results/transmission_dispatch_%s.txt' % cc), transmission_dispatch_columns,
+      ( [str(scenario_id), cc, str(period), str(i + 1), area_id[end], area_id[start], end, start, str(date), str(tp), category,
+         '%.2f' % sent, '%.2f' % (sent * 0.95), '10.00']
+        for (i, (start, end)) in enumerate(lines) for category in ('brown', 'green')
+        for (tp, period, date) in timepoints if rnd.random() >= missing_dispatch_fraction
+        for sent in [rnd.uniform(0, 500)] ))
+  return dispatch_records
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Write a synthetic SWITCH scenario for benchmarking summarize_results.py.')
+  parser.add_argument('directory', help='Scenario directory to write.')
+  parser.add_argument('--size', choices=size_order, default=None,
+    help='Start from one of the preset sizes. Other options override parts of the preset.')
+  for name in ['periods', 'dates', 'hours', 'projects', 'load_areas', 'tech_groups', 'techs_per_group', 'seed']:
+    parser.add_argument('--' + name, type=int, default=None)
+  parser.add_argument('--carbon_costs', default='0', help='Comma separated list of carbon costs.')
+  args = parser.parse_args()
+  options = dict(sizes[args.size]) if args.size is not None else {}
+  for name in ['periods', 'dates', 'hours', 'projects', 'load_areas', 'tech_groups', 'techs_per_group', 'seed']:
+    if getattr(args, name) is not None: options[name] = getattr(args, name)
+  options['carbon_costs'] = [ int(c) for c in args.carbon_costs.split(',') ]
+  print "Wrote %d dispatch records per carbon cost." % make_scenario(args.directory, **options)
@@ -0,0 +1,173 @@
+# Binary columnar cache of AMPL .tab input files
+# The .tab files in inputs/ and dispatch/common_inputs/ start with an extra "ampl.tab" header line for
+# AMPL, followed by a tab-delimited header and records. Parsing them from text on every run of the
+# summary scripts repeats the same work for every scenario of a sweep, so the first run saves each
+# column as a typed .npy file in a <name>.tab.cache directory next to the source file, and later runs
+# memory-map those files instead of parsing the text.
+#
+# The cache is keyed on the modification time, size and sha1 hash of the source. If the modification
+# time or size changed, the hash is checked before rebuilding, so copying or touching an input file
+# doesn't force a rebuild. Symbolic links are resolved first so linked inputs share one cache.
+# Columns of canonical integers are stored as int64, other numeric columns as float64 and the rest as
+# strings. The values are parsed with python's int() & float(), so they match the values the scripts
+# got from the text. The names of load areas, technologies etc. in text_columns are always kept as
+# strings, even if they look numeric, since the scripts use them as keys that are matched against the
+# names in the results files. Without numpy, or when the cache can't be written, the text is parsed
+# instead.
+import os
+import csv
+import hashlib
+import shutil
+import tempfile
+from collections import OrderedDict
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+cache_suffix = '.cache'
+key_file = 'key.txt'
+columns_file = 'columns.txt'
+# Caches of another version are rebuilt. Version 2 keeps text_columns as strings.
+cache_version = '2'
+
+# Columns of names, which are read as strings like csv.DictReader reads them
+text_columns = ['load_area', 'load_area_start', 'load_area_end', 'balancing_area', 'technology', 'fuel']
+
+
+def read_rows(path):
+  """Yield each record of a .tab file as a dict indexed by column name, like csv.DictReader. The
+  values are python ints, floats or strings as described above, and the values of text_columns are
+  strings. Without numpy, all values are strings."""
+  if numpy is None:
+    f = open(path, 'rb')
+    f.next() # Skip the ampl.tab header
+    for row in csv.DictReader(f, delimiter='\t'):
+      yield row
+    f.close()
+    return
+  columns = load_columns(path)
+  names = columns.keys()
+  for values in zip(*[ columns[name].tolist() for name in names ]):
+    yield dict(zip(names, values))
+
+
+def load_columns(path):
+  """Load a .tab file as a dict of numpy arrays indexed by column name, using the cache when it is
+  current and building it otherwise."""
+  path = os.path.realpath(path)
+  cache_dir = path + cache_suffix
+  stat = os.stat(path)
+  key = _read_key(cache_dir)
+  digest = None
+  if key is not None and (key['mtime'], key['size']) != (repr(stat.st_mtime), str(stat.st_size)):
+    digest = _hash_file(path)
+    if key['sha1'] == digest: _write_key(cache_dir, stat, digest)
+    else: key = None
+  if key is not None:
+    try:
+      return _load_cache(cache_dir)
+    except (IOError, ValueError):
+      pass # A damaged cache is rebuilt below
+  if digest is None: digest = _hash_file(path)
+  columns = parse_columns(path)
+  try:
+    _write_cache(cache_dir, columns, stat, digest)
+  except (IOError, OSError):
+    pass # The inputs directory may be read-only; just use the parsed columns.
+  return columns
+
+
+def parse_columns(path):
+  """Parse a .tab file into a dict of typed numpy arrays without using the cache."""
+  f = open(path, 'rb')
+  f.next() # Skip the ampl.tab header
+  file_dat = csv.reader(f, delimiter='\t')
+  names = file_dat.next()
+  records = [ row for row in file_dat if len(row) > 0 ]
+  f.close()
+  columns = OrderedDict()
+  for (i, name) in enumerate(names):
+    text_values = [ row[i] for row in records ]
+    columns[name] = numpy.array(text_values, dtype=str) if name in text_columns else _typed_array(text_values)
+  return columns
+
+
+def _typed_array(text_values):
+  """Convert a column of text to an int64, float64 or string array."""
+  try:
+    values = [ int(v) for v in text_values ]
+    if all(str(v) == t for (v, t) in zip(values, text_values)):
+      return numpy.array(values, dtype=numpy.int64)
+  except (ValueError, OverflowError):
+    pass
+  try:
+    return numpy.array([ float(v) for v in text_values ], dtype=numpy.float64)
+  except ValueError:
+    return numpy.array(text_values, dtype=str)
+
+
+def _hash_file(path):
+  sha1 = hashlib.sha1()
+  f = open(path, 'rb')
+  for chunk in iter(lambda: f.read(1 << 20), ''):
+    sha1.update(chunk)
+  f.close()
+  return sha1.hexdigest()
+
+
+def _read_key(cache_dir):
+  """The mtime, size & sha1 of the source file the cache was built from, or None without a cache."""
+  try:
+    f = open(os.path.join(cache_dir, key_file), 'rb')
+  except IOError:
+    return None
+  key = dict( line.rstrip('\n').split('\t', 1) for line in f if '\t' in line )
+  f.close()
+  if not all(k in key for k in ('mtime', 'size', 'sha1')) or key.get('version') != cache_version: return None
+  return key
+
+
+def _write_key(cache_dir, stat, digest):
+  try:
+    f = open(os.path.join(cache_dir, key_file), 'wb')
+    f.write("mtime\t%s\nsize\t%s\nsha1\t%s\nversion\t%s\n" % (repr(stat.st_mtime), stat.st_size, digest, cache_version))
+    f.close()
+  except IOError:
+    pass
+
+
+def _umask():
+  mask = os.umask(0)
+  os.umask(mask)
+  return mask
+
+
+def _load_cache(cache_dir):
+  f = open(os.path.join(cache_dir, columns_file), 'rb')
+  names = [ line.rstrip('\n') for line in f ]
+  f.close()
+  columns = OrderedDict()
+  for (i, name) in enumerate(names):
+    columns[name] = numpy.load(os.path.join(cache_dir, '%d.npy' % i), mmap_mode='r')
+  return columns
+
+
+def _write_cache(cache_dir, columns, stat, digest):
+  """Write the cache into a temporary directory and move it into place, so concurrent runs never
+  see a partial cache."""
+  tmp_dir = tempfile.mkdtemp(prefix=os.path.basename(cache_dir) + '.', dir=os.path.dirname(cache_dir))
+  try:
+    os.chmod(tmp_dir, 0775 & ~_umask())
+    f = open(os.path.join(tmp_dir, columns_file), 'wb')
+    for name in columns: f.write(name + '\n')
+    f.close()
+    for (i, name) in enumerate(columns):
+      numpy.save(os.path.join(tmp_dir, '%d.npy' % i), columns[name])
+    _write_key(tmp_dir, stat, digest)
+    if os.path.isdir(cache_dir):
+      shutil.rmtree(cache_dir, ignore_errors=True)
+    os.rename(tmp_dir, cache_dir)
+  finally:
+    if os.path.isdir(tmp_dir): shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,106 @@
+# Column-projecting reader for the tab-delimited results files written by export.run
+# The results files have a header line followed by records, one per line, and export.run writes them
+# with printf, so values are never quoted. The dispatch files have about 40 columns, of which the
+# summary scripts only use a few, and building a csv.DictReader dict of every column of every row
+# dominated their run time. This reader parses the header once and reads the file in large blocks of
+# whole lines. Each line is only split up to the last requested column, and each requested column is
+# converted to typed values for the whole block at once.
+#
+# Local files are memory-mapped. Compressed files (see switch_summary/compressed.py) and other file
+# objects such as pipes are read with their read() method.
+# The rows that are read are counted for the running stage of switch_summary/stages.py.
+#   for (period, power) in tab_reader.read_records(path, [('period', int), ('power', float)]):
+import mmap
+import operator
+import itertools
+from switch_summary import compressed
+from switch_summary import stages
+
+# Approximate number of bytes to parse at a time
+block_bytes = 8 * 1024 * 1024
+
+
+def read_header(source):
+  """Column names of a results file, given its path or a file object."""
+  f = compressed.open_file(source) if isinstance(source, basestring) else source
+  header = f.readline().rstrip('\r\n')
+  if f is not source: f.close()
+  return header.split('\t') if header else []
+
+
+def read_blocks(source, columns):
+  """Read the requested columns of a results file in blocks. source is a path or a file object, and
+  columns is a list of (name, type) pairs, where type is a function such as int or float that
+  converts each value, or None to keep the values as strings. Yields one list of values per
+  requested column for each block of records."""
+  if isinstance(source, basestring) and compressed.compression_of(source) is not None:
+    f = compressed.open_file(source)
+    try:
+      for block in _read_blocks(f, source, columns): yield block
+    finally:
+      f.close()
+  elif isinstance(source, basestring):
+    f = open(source, 'rb')
+    try:
+      if _size(f) == 0: return
+      data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+      try:
+        for block in _read_blocks(data, source, columns): yield block
+      finally:
+        data.close()
+    finally:
+      f.close()
+  else:
+    for block in _read_blocks(source, getattr(source, 'name', 'stream'), columns): yield block
+
+
+def read_records(source, columns):
+  """Yield each record of a results file as a tuple of the typed values of the requested columns."""
+  for block in read_blocks(source, columns):
+    for record in itertools.izip(*block):
+      yield record
+
+
+def _size(f):
+  try:
+    f.seek(0, 2)
+    return f.tell()
+  finally:
+    f.seek(0)
+
+
+def _read_blocks(data, name, columns):
+  header = data.readline().rstrip('\r\n')
+  names = header.split('\t')
+  indexes = []
+  for (column, column_type) in columns:
+    if column not in names:
+      raise KeyError("%s has no %s column" % (name, column))
+    indexes.append(names.index(column))
+  # Lines only need to be split up to the last requested column
+  max_split = max(indexes) + 1 if indexes else 0
+  getters = [ operator.itemgetter(i) for i in indexes ]
+  for lines in _line_blocks(data):
+    rows = [ line.split('\t', max_split) for line in lines if line ]
+    if len(rows) == 0: continue
+    stages.add_rows(len(rows))
+    try:
+      yield [ map(column_type, map(getter, rows)) if column_type is not None else map(getter, rows)
+              for ((column, column_type), getter) in zip(columns, getters) ]
+    except IndexError:
+      short = [ row for row in rows if len(row) <= max_split - 1 ][0]
+      raise ValueError("%s has a record with too few columns: %s" % (name, '\t'.join(short)))
+
+
+def _line_blocks(data):
+  """Yield lists of whole lines from data.read(), carrying partial lines over to the next block."""
+  partial = ''
+  while True:
+    chunk = data.read(block_bytes)
+    if not chunk:
+      if partial: yield [partial.rstrip('\r')]
+      return
+    chunk = partial + chunk
+    end = chunk.rfind('\n') + 1
+    partial = chunk[end:]
+    if end > 0: yield chunk[:end].splitlines()
@@ -0,0 +1,40 @@
+# Summary tables of the summary scripts
+# The summaries are written as tab-delimited text files, and the library functions of
+# switch_summary/summarize.py & switch_summary/dispatch.py can also return them as Table objects of
+# python values, so a caller that summarizes many scenarios in one process doesn't need to parse
+# the files again.
+from switch_summary import compressed
+
+# Use tab as a delimieter on output files
+delimiter="\t"
+
+
+class Table(object):
+  """A summary as python values: its column names and a list of rows."""
+  __slots__ = ('name', 'columns', 'rows')
+
+  def __init__(self, name, columns, rows=None):
+    self.name = name
+    self.columns = columns
+    self.rows = rows if rows is not None else []
+
+
+class SummaryFile(object):
+  """A summary that is being written as tab-delimited text, compressed if compression is given.
+  Values are written with str(), and the values of the quoted columns, e.g. technology names, are
+  written in double quotes. If keep is set, the rows are also kept in a Table."""
+
+  def __init__(self, path, name, header, quoted=(), compression=None, keep=False):
+    self.file = compressed.open_output(path, compression, "w")
+    self.file.write(delimiter.join(header) + "\n")
+    self.quoted = quoted
+    self.table = Table(name, [ column.strip('"') for column in header ]) if keep else None
+
+  def write(self, row):
+    if self.table is not None: self.table.rows.append(row)
+    values = [ str(value) for value in row ]
+    for i in self.quoted: values[i] = '"' + values[i] + '"'
+    self.file.write(delimiter.join(values) + "\n")
+
+  def close(self):
+    self.file.close()
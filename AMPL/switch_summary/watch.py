@@ -0,0 +1,191 @@
+# Watch mode for summarize_results.py
+# export.run writes the results files of each carbon cost one after another, and writing the
+# generator dispatch file of a large scenario takes hours. With --watch, summarize_results.py starts
+# while export.run is still running. It summarizes each carbon cost as its results files are written,
+# and after each carbon cost it publishes combined summaries of the carbon costs that are done to
+# results/, in the same format as --batch. Post-processing then overlaps the export instead of
+# following it.
+#
+# export.run writes the files of a carbon cost in the order that a Summary reads them, listed in
+# export_order below, so a file is complete once the next one exists and is at least as new.
+# cost_summary_<carbon cost>.txt is written first since cost_summary.txt is overwritten by each carbon
+# cost. The small files are read once they are complete. The generator & transmission dispatch files
+# are followed as they are written, with tab_reader reading a GrowingFile, unless the numpy engine or
+# --streaming is used, which read them once they are complete.
+#
+# The carbon costs are read from the CARBON_COSTS set in switch.dat, and those without a solution to
+# export are skipped. Files left in results/ by an earlier export are taken as complete, so remove
+# the results of carbon costs that are being exported again before starting.
+#   watch.follow_export(summarize.Inputs('.'), '.', watch.read_carbon_costs('.'))
+import os
+import re
+import time
+import shutil
+import tempfile
+from switch_summary import summarize
+from switch_summary import tab_reader
+from switch_summary import compressed
+
+# The results files that a Summary reads, in the order that export.run writes them for each carbon
+# cost, followed by the file that export.run writes next.
+export_order = ['cost_summary_%s.txt', 'gen_cap_%s.txt', 'trans_cap_%s.txt',
+  'generator_and_storage_dispatch_%s.txt', 'transmission_dispatch_%s.txt', 'existing_trans_cost_%s.txt']
+# Results files that are read as they are written
+followed = ['generator_and_storage_dispatch_%s.txt', 'transmission_dispatch_%s.txt']
+
+# Seconds between checks of a results file that is being written
+poll_seconds = 5
+
+# Bytes to read from a growing file at a time
+read_bytes = 8 * 1024 * 1024
+
+
+def read_carbon_costs(scenario_dir):
+  """The carbon costs that export.run exports, in order, from the CARBON_COSTS set in switch.dat"""
+  match = re.search(r'set\s+CARBON_COSTS\s*:=\s*([^;]*);', open(os.path.join(scenario_dir, 'switch.dat')).read())
+  if match is None:
+    raise ValueError("switch.dat in %s has no CARBON_COSTS set" % scenario_dir)
+  return match.group(1).split()
+
+
+class GrowingFile(object):
+  """A file that is still being written, with the read() & readline() methods that tab_reader uses.
+  At the end of what has been written so far, reads wait for more data until is_complete() returns
+  true, so the file is read to its end exactly once."""
+
+  def __init__(self, path, is_complete, poll_seconds=poll_seconds):
+    self.name = path
+    self.is_complete = is_complete
+    self.poll_seconds = poll_seconds
+    self.fd = os.open(path, os.O_RDONLY)
+    self.buffer = ''
+    self.complete = False
+
+  def _fill(self):
+    """Add the data that was written since the last read to the buffer. Returns False at the end of
+    a complete file."""
+    while True:
+      data = os.read(self.fd, read_bytes)
+      if data:
+        self.buffer += data
+        return True
+      if self.complete: return False
+      # Check for completion before reading again, so nothing written before completion is missed
+      self.complete = self.is_complete()
+      if not self.complete: time.sleep(self.poll_seconds)
+
+  def read(self, size=-1):
+    if not self.buffer and not self._fill(): return ''
+    if size < 0: size = len(self.buffer)
+    data, self.buffer = self.buffer[:size], self.buffer[size:]
+    return data
+
+  def readline(self):
+    while '\n' not in self.buffer:
+      if not self._fill(): break
+    end = self.buffer.find('\n') + 1 or len(self.buffer)
+    line, self.buffer = self.buffer[:end], self.buffer[end:]
+    return line
+
+  def close(self):
+    os.close(self.fd)
+
+
+class WatchedSummary(summarize.Summary):
+  """A Summary of a carbon cost whose results files export.run may still be writing. Each results file
+  is waited for before it is read. If a later file of export_order appears first, the file isn't
+  coming and is reported as missing, as Summary does. poll_seconds is the time between checks."""
+
+  def __init__(self, inputs, scenario_dir, carbon_cost, poll_seconds=poll_seconds, **options):
+    summarize.Summary.__init__(self, inputs, scenario_dir, carbon_cost, **options)
+    self.poll_seconds = poll_seconds
+    self.export_names = [ template % carbon_cost for template in export_order ]
+    self.followed_names = [ template % carbon_cost for template in followed ]
+
+  def is_complete(self, name):
+    """Whether export.run has finished writing the results file name of this carbon cost"""
+    path = os.path.join(self.results_dir, name)
+    if not os.path.isfile(path):
+      # Results are only compressed after they have been exported
+      return os.path.isfile(compressed.find(path))
+    next_path = os.path.join(self.results_dir, self.export_names[self.export_names.index(name) + 1])
+    return os.path.isfile(next_path) and os.path.getmtime(next_path) >= os.path.getmtime(path)
+
+  def wait_for(self, name, started=False):
+    """Wait until the results file name is complete, or has been started if started is set. Returns
+    its path, which doesn't exist if export.run went on to a later file instead."""
+    path = os.path.join(self.results_dir, name)
+    later_paths = [ os.path.join(self.results_dir, later_name)
+      for later_name in self.export_names[self.export_names.index(name) + 1:] ]
+    waiting = False
+    while True:
+      if os.path.isfile(compressed.find(path)):
+        if started or self.is_complete(name): return compressed.find(path)
+      elif any( os.path.isfile(compressed.find(later_path)) for later_path in later_paths ):
+        return path
+      if not waiting:
+        print "Waiting for export.run to write " + path
+        waiting = True
+      time.sleep(self.poll_seconds)
+
+  def results_path(self, name):
+    if name not in self.export_names:
+      return summarize.Summary.results_path(self, name)
+    return self.wait_for(name, started=(name in self.followed_names))
+
+  def read_records(self, path, columns):
+    name = os.path.basename(path)
+    if name not in self.followed_names or self.is_complete(name):
+      return summarize.Summary.read_records(self, path, columns)
+    return self.follow_records(path, name, columns)
+
+  def follow_records(self, path, name, columns):
+    growing_file = GrowingFile(path, lambda: self.is_complete(name), self.poll_seconds)
+    try:
+      for record in tab_reader.read_records(growing_file, columns):
+        yield record
+    finally:
+      growing_file.close()
+
+  def wait_until_complete(self, path):
+    name = os.path.basename(compressed.base_name(path))
+    while not self.is_complete(name):
+      time.sleep(self.poll_seconds)
+
+  def summarize_dispatch(self, path):
+    # The columnar engine reads the whole file at once
+    if self.engine == 'numpy': self.wait_until_complete(path)
+    summarize.Summary.summarize_dispatch(self, path)
+
+  def partition_by_period(self, path, tmp_dir):
+    self.wait_until_complete(path)
+    return summarize.Summary.partition_by_period(self, path, tmp_dir)
+
+
+def follow_export(inputs, scenario_dir, carbon_costs, poll_seconds=poll_seconds, **options):
+  """Summarize each carbon cost of a scenario while export.run writes its results, in the order of
+  carbon_costs. After each carbon cost, the combined summaries of the carbon costs that are done are
+  written to the results directory with a carbon_cost column, as with summarize.summarize_batch().
+  options are passed to Summary."""
+  results_dir = os.path.join(scenario_dir, 'results')
+  batch_dir = tempfile.mkdtemp(prefix='summarize_watch_', dir=results_dir)
+  done = []
+  try:
+    for carbon_cost in carbon_costs:
+      # export.run skips carbon costs that have no solution file
+      solution_path = os.path.join(results_dir, 'sol%s_investment_cost.sol' % carbon_cost)
+      if not os.path.isfile(solution_path) and \
+          not os.path.isfile(compressed.find(os.path.join(results_dir, 'gen_cap_%s.txt' % carbon_cost))):
+        print "Skipping carbon cost %s, which has no solution to export." % carbon_cost
+        continue
+      output_dir = os.path.join(batch_dir, carbon_cost)
+      os.mkdir(output_dir)
+      # Only the combined summaries are compressed
+      summary = WatchedSummary(inputs, scenario_dir, carbon_cost, poll_seconds, **dict(options, compression=None))
+      summary.run(output_dir, with_carbon_cost_column=True)
+      done.append(carbon_cost)
+      summarize.combine_summaries(results_dir, batch_dir, done, options.get('parquet_dir'), options.get('compression'),
+        options.get('area_net_load', False), options.get('corridors', False))
+      print "Published the summaries of carbon cost %s." % carbon_cost
+  finally:
+    shutil.rmtree(batch_dir)
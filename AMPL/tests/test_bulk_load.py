@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# Tests of switch_summary/bulk_load.py, which import_summaries.py uses to load the summaries of a
+# scenario in one transaction, on a SQLite database. Run this from the AMPL directory:
+#   python -m unittest discover tests
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+# The switch_summary helper package lives in the scenario directory, one level up
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from switch_summary import bulk_load
+
+scenario_id = 42
+
+
+class ImportScenarioTest(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.connection = sqlite3.connect(os.path.join(self.directory, 'summaries.db'))
+    self.connection.text_factory = str
+    self.gen_summary = self.write_summary('gen_summary', ['scenario_id', 'carbon_cost', 'period', 'technology', 'capacity'], [
+      [scenario_id, 0, 2016, '"Gas_Combustion_Turbine"', 1500.5],
+      [scenario_id, 0, 2016, '"Wind"', 'None'],
+      [scenario_id, 0, 2026, '"Wind"', 2200],
+    ])
+    self.ramp_summary = self.write_summary('ramp_summary', ['scenario_id', 'carbon_cost', 'period', 'source', 'up_ramp_%', 'down_ramp_%'], [
+      [scenario_id, 0, 2016, 'load', 0.25, 0.2],
+      [scenario_id, 0, 2026, 'net_load', 0.5, 'None'],
+    ])
+
+  def tearDown(self):
+    self.connection.close()
+    shutil.rmtree(self.directory)
+
+  def write_summary(self, name, columns, rows):
+    path = os.path.join(self.directory, name + '.txt')
+    f = open(path, 'w')
+    for row in [columns] + rows:
+      f.write('\t'.join( str(value) for value in row ) + '\n')
+    f.close()
+    return path
+
+  def select(self, statement):
+    cursor = self.connection.cursor()
+    cursor.execute(statement)
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+  def test_reimport_replaces_rows(self):
+    paths = [self.gen_summary, self.ramp_summary]
+    bulk_load.import_scenario(self.connection, '?', scenario_id, paths)
+    timings = bulk_load.import_scenario(self.connection, '?', scenario_id, paths)
+    self.assertEqual([ (table, rows) for (table, rows, seconds) in timings ],
+      [('summary_gen_summary', 3), ('summary_ramp_summary', 2)])
+    self.assertEqual(self.select("select count(*) from summary_gen_summary"), [(3,)])
+    self.assertEqual(self.select("select count(*) from summary_ramp_summary"), [(2,)])
+
+  def test_columns_and_values(self):
+    bulk_load.import_scenario(self.connection, '?', scenario_id, [self.gen_summary, self.ramp_summary])
+    cursor = self.connection.cursor()
+    self.assertEqual(bulk_load.existing_columns(cursor, 'summary_ramp_summary'),
+      ['scenario_id', 'carbon_cost', 'period', 'source', 'up_ramp__', 'down_ramp__'])
+    cursor.close()
+    self.assertEqual(self.select("select technology, capacity from summary_gen_summary order by period, technology"),
+      [('Gas_Combustion_Turbine', 1500.5), ('Wind', None), ('Wind', 2200)])
+    self.assertEqual(self.select("select source, up_ramp__, down_ramp__ from summary_ramp_summary order by period"),
+      [('load', 0.25, 0.2), ('net_load', 0.5, None)])
+
+  def test_failed_file_rolls_back_scenario(self):
+    bulk_load.import_scenario(self.connection, '?', scenario_id, [self.gen_summary, self.ramp_summary])
+    new_gen_summary = self.write_summary('gen_summary', ['scenario_id', 'carbon_cost', 'period', 'technology', 'capacity'], [
+      [scenario_id, 0, 2016, '"Wind"', 1],
+    ])
+    # A row of another scenario makes the count of the scenario's rows in the table come up short
+    bad_ramp_summary = self.write_summary('ramp_summary', ['scenario_id', 'carbon_cost', 'period', 'source', 'up_ramp_%', 'down_ramp_%'], [
+      [scenario_id, 0, 2016, 'load', 0.3, 0.3],
+      [scenario_id + 1, 0, 2016, 'load', 0.3, 0.3],
+    ])
+    self.assertRaises(RuntimeError, bulk_load.import_scenario, self.connection, '?', scenario_id, [new_gen_summary, bad_ramp_summary])
+    self.assertEqual(self.select("select count(*), sum(capacity) from summary_gen_summary where scenario_id = %d" % scenario_id), [(3, 3700.5)])
+    self.assertEqual(self.select("select scenario_id, up_ramp__ from summary_ramp_summary order by period"),
+      [(scenario_id, 0.25), (scenario_id, 0.5)])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# Parity of switch_summary/crunch.py with the rollups of crunch_results.sql
+# A synthetic scenario is loaded into SQLite with the LOAD DATA columns of import_results_to_mysql.sh,
+# the statements between the "rollups computed by crunch_results.py" markers of crunch_results.sql are
+# run on it, translated from MySQL to SQLite, and each of their tables is compared with the one that
+# crunch.crunch() writes to results/crunch. Run this from the AMPL directory:
+#   python -m unittest discover tests
+import os
+import re
+import sys
+import csv
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+# The switch_summary helper package lives in the scenario directory, one level up
+ampl_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(1, ampl_dir)
+from switch_summary import crunch
+from switch_summary import synthetic
+
+scenario_id = 42
+relative_tolerance = 1e-9
+
+# The results files of the tables that the rollups read
+raw_table_patterns = {
+  '_generator_and_storage_dispatch': crunch.dispatch_pattern,
+  '_gen_cap': crunch.gen_cap_pattern,
+  '_transmission_dispatch': crunch.transmission_dispatch_pattern,
+}
+# Columns of the raw tables that aren't loaded from the results files
+raw_table_extra_columns = {'_transmission_dispatch': ['month', 'hour_of_day_UTC']}
+text_columns = ['fuel', 'fuel_category', 'rps_fuel_category']
+
+
+def load_data_columns(script_path):
+  """The columns of each table that import_results_to_mysql.sh loads the fields of a results file into,
+  in order, with @junk for the fields that are skipped"""
+  script = open(script_path).read().replace('\\\n', ' ')
+  columns = {}
+  for (table, column_list) in re.findall(r'into table (\w+) ignore 1 lines\s*\(([^)]*)\)', script, re.I):
+    columns[table] = [ column.strip() for column in column_list.split(',') ]
+  return columns
+
+
+def substitute(pattern, replacement, sql, flags=0):
+  """Replace a MySQL construct with its SQLite translation, which must be found"""
+  (sql, count) = re.subn(pattern, replacement, sql, flags=flags)
+  if count == 0: raise ValueError("%s is not in the rollups of crunch_results.sql." % pattern)
+  return sql
+
+
+def sqlite_rollups(sql_path):
+  """The statements of crunch_results.sql from the first begin to the last end of the rollups computed
+  by crunch_results.py, translated to SQLite"""
+  sql = open(sql_path).read()
+  begin = sql.index('-- begin rollups computed by crunch_results.py')
+  end = sql.rindex('-- end rollups computed by crunch_results.py')
+  sql = sql[begin:end].replace('@scenario_id', str(scenario_id))
+  sql = substitute(r'convert\(left\(right\(study_hour, 6\),2\), decimal\)', 'cast(substr(cast(study_hour as integer), -6, 2) as integer)', sql)
+  sql = substitute(r'convert\(right\(study_hour, 2\), decimal\)', 'cast(substr(cast(study_hour as integer), -2) as integer)', sql)
+  sql = substitute(r'drop temporary table', 'drop table', sql)
+  sql = substitute(r'create temporary table (\w+)\n', r'create temporary table \1 as\n', sql)
+  sql = substitute(r'alter table \w+ add index .*\n', '', sql)
+  def update_from(match):
+    (table, alias, other, other_alias, assignments, conditions) = match.groups()
+    assignments = re.sub(r'\b%s\.' % alias, '', assignments)
+    conditions = re.sub(r'\b%s\.' % alias, table + '.', conditions)
+    return 'update %s\nset %s\nfrom %s %s\nwhere %s;' % (table, assignments, other, other_alias, conditions)
+  sql = substitute(r'update\s+(\w+) (\w+), (\w+) (\w+)\s+set(.*?)where(.*?);', update_from, sql, re.S)
+  sql = substitute(r'group by ([\d, ]+)\n\s*order by [\d, ]+\n\s*on duplicate key update (\w+) = \w+ \+ VALUES\(\w+\)',
+    r'group by \1 having 1\n  on conflict(scenario_id, carbon_cost, period, study_hour, area_id) do update set \2 = \2 + excluded.\2', sql)
+  return sql
+
+
+def column_definition(table, column):
+  """The SQLite definition of a column. Numbers are real, since MySQL divides integers as decimals."""
+  if column in text_columns:
+    return '%s text' % column
+  # Costs of the capacity rollups that the update doesn't set are left at the default of their table
+  if table.startswith('_gen_cap_summary') and column in crunch.cost_sums:
+    return '%s real default 0 not null' % column
+  return '%s real' % column
+
+
+class CrunchParityTest(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.results_dir = os.path.join(self.directory, 'results')
+    synthetic.make_scenario(self.directory, periods=2, carbon_costs=(0, 50), scenario_id=scenario_id)
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def load_results(self, db):
+    """Load the results files into the raw tables, as import_results_to_mysql.sh does"""
+    load_columns = load_data_columns(os.path.join(ampl_dir, 'import_results_to_mysql.sh'))
+    for (table, pattern) in sorted(raw_table_patterns.items()):
+      fields = load_columns[table]
+      columns = [ column for column in fields if column != '@junk' ] + raw_table_extra_columns.get(table, [])
+      db.execute('create table %s (%s)' % (table, ', '.join( column_definition(table, column) for column in columns )))
+      positions = [ i for (i, column) in enumerate(fields) if column != '@junk' ]
+      statement = 'insert into %s (%s) values (%s)' % (table, ', '.join( fields[i] for i in positions ), ', '.join(['?'] * len(positions)))
+      paths = crunch.results_files(self.results_dir, pattern)
+      self.assertTrue(paths, "No results files of %s." % table)
+      for path in paths:
+        rows = csv.reader(open(path, 'rb'), delimiter='\t')
+        rows.next()
+        db.executemany(statement, ( [ row[i] for i in positions ] for row in rows ))
+    db.execute('create table technologies as select distinct technology_id, fuel from _gen_cap')
+
+  def test_rollups_match_sql(self):
+    if sqlite3.sqlite_version_info < (3, 33, 0):
+      self.skipTest("The rollups need update ... from, which SQLite %s doesn't have." % sqlite3.sqlite_version)
+    db = sqlite3.connect(':memory:')
+    db.text_factory = str
+    for name in crunch.table_order:
+      definitions = [ column_definition(name, column) for column in crunch.table_columns[name] ]
+      if name == '_trans_summary':
+        definitions.append('primary key (scenario_id, carbon_cost, period, study_hour, area_id)')
+      db.execute('create table %s (%s)' % (name, ', '.join(definitions)))
+    self.load_results(db)
+    db.executescript(sqlite_rollups(os.path.join(ampl_dir, 'crunch_results.sql')))
+
+    row_counts = dict(crunch.crunch(self.results_dir))
+    self.assertEqual(sorted(row_counts), sorted(crunch.table_order))
+    for name in crunch.table_order:
+      columns = crunch.table_columns[name]
+      rows = csv.reader(open(os.path.join(self.results_dir, crunch.crunch_dir_name, name + '.txt'), 'rb'), delimiter='\t')
+      self.assertEqual(rows.next(), columns)
+      crunched = sorted( self.typed(columns, row) for row in rows )
+      expected = sorted( self.typed(columns, row) for row in db.execute('select %s from %s' % (', '.join(columns), name)) )
+      self.assertTrue(len(expected) > 0, "%s is empty." % name)
+      self.assertEqual(len(crunched), len(expected), "%s has %d rows instead of %d." % (name, len(crunched), len(expected)))
+      self.assertEqual(row_counts[name], len(expected))
+      for (crunched_row, expected_row) in zip(crunched, expected):
+        for (column, value, expected_value) in zip(columns, crunched_row, expected_row):
+          if column in text_columns:
+            self.assertEqual(value, expected_value)
+          else:
+            self.assertTrue(abs(value - expected_value) <= relative_tolerance * max(1.0, abs(expected_value)),
+              "%s.%s is %r instead of %r in %r." % (name, column, value, expected_value, crunched_row))
+
+  def typed(self, columns, row):
+    return tuple( value if column in text_columns else float(value) for (column, value) in zip(columns, row) )
+
+
+if __name__ == '__main__':
+  unittest.main()
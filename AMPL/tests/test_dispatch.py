@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# Tests of switch_summary/dispatch.py on a small dispatch directory where one test set is unsolved,
+# with results for only one of its carbon costs. Run this from the AMPL directory:
+#   python -m unittest discover tests
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+# The switch_summary helper package lives in the scenario directory, one level up
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from switch_summary import dispatch
+
+periods = [2016, 2026]
+load_areas = ['AZ_APS', 'CA_PGE']
+carbon_costs = ['0', '50']
+# The carbon costs that each test set has results for; test set 3 isn't solved
+test_set_carbon_costs = {1: carbon_costs, 2: carbon_costs, 3: ['0']}
+
+
+def write_table(path, columns, rows, ampl_header=None):
+  f = open(path, 'w')
+  if ampl_header is not None: f.write(ampl_header + '\n')
+  for row in [columns] + rows:
+    f.write('\t'.join( str(value) for value in row ) + '\n')
+  f.close()
+
+
+class SummarizeTest(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    os.makedirs(os.path.join(self.directory, 'inputs'))
+    self.write_study_hours(4383)
+    self.dispatch_dir = os.path.join(self.directory, 'dispatch')
+    os.makedirs(os.path.join(self.dispatch_dir, 'common_inputs'))
+    open(os.path.join(self.dispatch_dir, 'scenario_id.txt'), 'w').write('42\n')
+    open(os.path.join(self.dispatch_dir, 'common_inputs/misc_params.dat'), 'w').write('param num_years_per_period := 10;\n')
+    write_table(os.path.join(self.dispatch_dir, 'common_inputs/carbon_cap_targets.tab'), ['year', 'carbon_emissions_relative_to_base'],
+      [ [year, 0.9] for year in range(2016, 2036) ], 'ampl.tab 1 1')
+    for carbon_cost in carbon_costs:
+      write_table(os.path.join(self.dispatch_dir, 'common_inputs/ng_consumption_and_prices_by_period_%s.tab' % carbon_cost),
+        ['period', 'breakpoint_id', 'ng_consumption_breakpoint', 'price'], [ [period, 1, 5e6, 4] for period in periods ], 'ampl.tab 2 2')
+      write_table(os.path.join(self.dispatch_dir, 'common_inputs/biomass_consumption_and_prices_by_period_%s.tab' % carbon_cost),
+        ['load_area', 'period', 'breakpoint_id', 'breakpoint_mmbtu_per_year', 'price'],
+        [ [load_area, period, 1, 1000, 3] for load_area in load_areas for period in periods ], 'ampl.tab 3 2')
+    for (test_set, test_carbon_costs) in sorted(test_set_carbon_costs.items()):
+      results_dir = os.path.join(self.dispatch_dir, 'test_set_%03d/results' % test_set)
+      os.makedirs(results_dir)
+      for carbon_cost in test_carbon_costs:
+        write_table(os.path.join(results_dir, 'dispatch_sums_%s.txt' % carbon_cost),
+          ['period', 'hours_in_sample', 'co2_tons', 'spinning_co2_tons', 'deep_cycling_co2_tons', 'startup_co2_tons'],
+          [ [period, 1, 100 * test_set, 0, 0, 0] for period in periods ])
+        write_table(os.path.join(results_dir, 'ng_consumed_%s.txt' % carbon_cost), ['period', 'ng_consumed_mmbtu'],
+          [ [period, 1000 * test_set] for period in periods ])
+        write_table(os.path.join(results_dir, 'biomass_consumed_%s.txt' % carbon_cost), ['period', 'load_area', 'biosolid_consumed_mmbtu'],
+          [ [period, load_area, 10 * test_set] for period in periods for load_area in load_areas ])
+
+  def write_study_hours(self, hours_in_sample):
+    write_table(os.path.join(self.directory, 'inputs/study_hours.tab'), ['hour', 'period', 'date', 'hours_in_sample'],
+      [ [str(period + 4) + '0101' + hour, period, str(period + 4) + '0101', hours_in_sample] for period in periods for hour in ('00', '12') ],
+      'ampl.tab 1 3')
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def summarize(self, **options):
+    return dispatch.summarize(self.dispatch_dir, workers=1, keep_tables=True, **options)
+
+  def co2_tons(self, summaries, carbon_cost):
+    """The co2_tons of each period in emissions_summary"""
+    emissions = summaries['emissions_summary']
+    return dict( (row[emissions.columns.index('period')], row[emissions.columns.index('co2_tons')])
+      for row in emissions.rows if row[emissions.columns.index('carbon_cost')] == carbon_cost )
+
+  def test_default_summarizes_every_test_set(self):
+    summaries = self.summarize()
+    self.assertEqual(summaries['emissions_summary'].columns[-1], 'target_frac_of_1990')
+    self.assertEqual(self.co2_tons(summaries, '0'), dict( (period, 600.0) for period in periods ))
+    self.assertEqual(self.co2_tons(summaries, '50'), dict( (period, 300.0) for period in periods ))
+
+  def test_stopped_sweep_is_refused(self):
+    open(os.path.join(self.dispatch_dir, dispatch.stopped_name), 'w').write('Converged after 2 of 3 test sets.\n')
+    self.assertRaises(RuntimeError, self.summarize)
+    self.assertFalse(os.path.exists(os.path.join(self.dispatch_dir, 'emissions_summary.txt')))
+
+  def test_partial_summarizes_solved_test_sets(self):
+    open(os.path.join(self.dispatch_dir, dispatch.stopped_name), 'w').write('Converged after 2 of 3 test sets.\n')
+    summaries = self.summarize(partial=True)
+    for name in ['emissions_summary', 'ng_consumption_summary', 'biomass_consumption_summary', 'cap_shortfall_summary']:
+      header = open(os.path.join(self.dispatch_dir, name + '.txt')).readline().rstrip('\n').split('\t')
+      self.assertEqual(header[-2:], ['solved_test_sets', 'test_sets'])
+      self.assertTrue(all( row[-2:] == [2, 3] for row in summaries[name].rows ))
+    self.assertEqual(self.co2_tons(summaries, '0'), dict( (period, 300.0) for period in periods ))
+    self.assertEqual(self.co2_tons(summaries, '50'), dict( (period, 300.0) for period in periods ))
+
+  def test_partial_of_solved_sweep_is_complete(self):
+    shutil.rmtree(os.path.join(self.dispatch_dir, 'test_set_003'))
+    summaries = self.summarize(partial=True)
+    self.assertEqual(summaries['emissions_summary'].columns[-1], 'target_frac_of_1990')
+    self.assertEqual(self.co2_tons(summaries, '0'), dict( (period, 300.0) for period in periods ))
+
+  def test_periods_shorter_than_a_year(self):
+    self.write_study_hours(1)
+    self.assertEqual(dispatch.Inputs(self.dispatch_dir).periods, set(periods))
+
+
+if __name__ == '__main__':
+  unittest.main()